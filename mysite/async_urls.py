@@ -0,0 +1,16 @@
+"""
+URL configuration used when POLLS_ASYNC_VIEWS is on.
+
+Same URLs as mysite.urls, with the async polls views in front of their sync
+versions. Serve it with an ASGI server, see mysite/asgi.py.
+"""
+from django.urls import include, path
+
+from polls import urls as polls_urls
+
+from . import urls
+
+urlpatterns = [
+    path("polls/", include((polls_urls.async_urlpatterns + polls_urls.urlpatterns, polls_urls.app_name))),
+    *(pattern for pattern in urls.urlpatterns if getattr(pattern, "app_name", None) != polls_urls.app_name),
+]
@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # * First, so its total covers the other middleware too, see polls/timing.py.
+    'polls.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,9 +56,11 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'mysite.urls'
 
+# * The Django backend, whose templates add their render time to polls.timing.ServerTimingMiddleware.
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "polls.timing.TimedDjangoTemplates",
+        "NAME": "django",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -79,6 +83,19 @@ LOGS_DIR = os.path.join(BASE_DIR, 'logs')
 if not os.path.exists(LOGS_DIR):
     os.makedirs(LOGS_DIR)
 
+# Write logs from a background thread, so disk stalls and rotation never block a request, see polls/log_handlers.py.
+# Off by default; records still queued at exit are written by the listener before the process ends.
+
+POLLS_LOG_QUEUE = config('POLLS_LOG_QUEUE', default=False, cast=bool)
+
+# "text" or "json" (one JSON object per line) for the log files
+
+POLLS_LOG_FORMAT = config('POLLS_LOG_FORMAT', default='text')
+
+# Share of the INFO vote log records to keep, between 0 and 1
+
+POLLS_VOTE_LOG_SAMPLE_RATE = config('POLLS_VOTE_LOG_SAMPLE_RATE', default=1.0, cast=float)
+
 # ! LOGGERS -> entry point into the logging system.
 
 LOGGERS = (
@@ -102,6 +119,12 @@ LOGGERS = (
             "level": "INFO",
             "propagate": True,
         },
+        # * One record per vote, sampled and passed on to the django handlers.
+        "django.polls.votes": {
+            "filters": ["vote_sampling"],
+            "level": "INFO",
+            "propagate": True,
+        },
     },
 )
 
@@ -117,9 +140,21 @@ FORMATTERS = (
             "format": "{levelname} {asctime:s} {name} {module} {filename} {lineno:d} {funcName} {message}",
             "style": "{",
         },
+        "json": {
+            "()": "polls.log_handlers.JsonFormatter",
+        },
     },
 )
 
+# ! FILTERS -> decide which records a logger or handler passes on.
+
+FILTERS = {
+    "vote_sampling": {
+        "()": "polls.log_handlers.SamplingFilter",
+        "rate": POLLS_VOTE_LOG_SAMPLE_RATE,
+    },
+}
+
 # ! HANDLERS -> The handler is the engine that determines what happens to each message in a logger
 
 HANDLERS = {
@@ -150,6 +185,20 @@ HANDLERS = {
     },
 }
 
+if POLLS_LOG_FORMAT == "json":
+    HANDLERS["info_handler"]["formatter"] = HANDLERS["error_handler"]["formatter"] = "json"
+
+# * Loggers use a queued copy of each handler; "<name>_queued" sorts after "<name>", which is configured first.
+if POLLS_LOG_QUEUE:
+    for name in list(HANDLERS):
+        HANDLERS[f"{name}_queued"] = {
+            "()": "polls.log_handlers.QueueListenerHandler",
+            "handlers": [f"cfg://handlers.{name}"],
+        }
+    for logger in LOGGERS[0].values():
+        if "handlers" in logger:
+            logger["handlers"] = [f"{name}_queued" for name in logger["handlers"]]
+
 
 # ! LOGGING
 
@@ -157,6 +206,7 @@ LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,  # If set to True, it disables all loggers from previous configurations
     "formatters": FORMATTERS[0],
+    "filters": FILTERS,
     "handlers": HANDLERS,
     "loggers": LOGGERS[0],
 }
@@ -167,7 +217,8 @@ LOGGING = {
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # * Django's SQLite backend plus the BEGIN IMMEDIATE of polls/sqlite.py.
+        'ENGINE': 'polls.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
@@ -222,4 +273,74 @@ LOGIN_REDIRECT_URL = "home_redirect"
 LOGOUT_REDIRECT_URL = "home_redirect"
 
 EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
-EMAIL_FILE_PATH = BASE_DIR / "sent_emails"
\ No newline at end of file
+EMAIL_FILE_PATH = BASE_DIR / "sent_emails"
+
+# Polls
+# Half-life of the poll trend score in seconds, see polls/trending.py
+
+POLLS_TREND_HALF_LIFE = config('POLLS_TREND_HALF_LIFE', default=7 * 24 * 60 * 60, cast=int)
+
+# Number of poll cards per keyset page on the index and search pages
+
+POLLS_PAGE_SIZE = config('POLLS_PAGE_SIZE', default=24, cast=int)
+
+# Write-behind vote buffer, see polls/vote_buffer.py
+# Votes are journaled to POLLS_VOTE_BUFFER_DIR and flushed to the database every
+# POLLS_VOTE_FLUSH_INTERVAL milliseconds or POLLS_VOTE_FLUSH_SIZE votes, whichever comes first.
+
+POLLS_VOTE_WRITE_BEHIND = config('POLLS_VOTE_WRITE_BEHIND', default=False, cast=bool)
+POLLS_VOTE_BUFFER_DIR = config('POLLS_VOTE_BUFFER_DIR', default=os.path.join(BASE_DIR, 'vote_journal'))
+POLLS_VOTE_FLUSH_INTERVAL = config('POLLS_VOTE_FLUSH_INTERVAL', default=200, cast=int)
+POLLS_VOTE_FLUSH_SIZE = config('POLLS_VOTE_FLUSH_SIZE', default=500, cast=int)
+POLLS_VOTE_BUFFER_FSYNC = config('POLLS_VOTE_BUFFER_FSYNC', default=False, cast=bool)
+
+# Serve the vote, detail and results pages with async views, for ASGI deployments
+
+POLLS_ASYNC_VIEWS = config('POLLS_ASYNC_VIEWS', default=False, cast=bool)
+if POLLS_ASYNC_VIEWS:
+    ROOT_URLCONF = 'mysite.async_urls'
+
+# Seconds between keep-alive comments on the live results stream, see polls/broadcast.py
+
+POLLS_RESULTS_STREAM_KEEPALIVE = config('POLLS_RESULTS_STREAM_KEEPALIVE', default=15, cast=int)
+
+# Serve the live results stream. Each open stream holds a worker, so it is off under WSGI unless asked for
+
+POLLS_RESULTS_STREAM = config('POLLS_RESULTS_STREAM', default=POLLS_ASYNC_VIEWS, cast=bool)
+
+# Cache for the shared poll listings of the index and search pages, see polls/page_cache.py
+# Every worker process must see the same cache, or a vote in one worker leaves the pages cached by
+# the others stale. The files in POLLS_CACHE_DIR are shared by the processes of one host; use Redis or
+# Memcached when the workers run on several hosts.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('POLLS_CACHE_DIR', default=os.path.join(BASE_DIR, 'cache')),
+    }
+}
+
+# Tests run without the cache, cached pages would outlive the rows each test rolls back
+
+TEST_RUNNER = 'polls.tests.runner.PollsTestRunner'
+
+# Seconds a cached poll listing may be reused for, 0 disables the page cache
+
+POLLS_PAGE_CACHE_BUCKET = config('POLLS_PAGE_CACHE_BUCKET', default=60, cast=int)
+
+# Prometheus metrics of every worker process, served at /metrics, see polls/metrics.py
+# Each process writes to its own file in this directory; clear it when the server starts. Empty disables metrics.
+# Staff users and the comma-separated POLLS_METRICS_ALLOWED_IPS may read /metrics.
+
+POLLS_METRICS_DIR = config('POLLS_METRICS_DIR', default='')
+POLLS_METRICS_ALLOWED_IPS = config('POLLS_METRICS_ALLOWED_IPS', default='127.0.0.1, ::1', cast=Csv())
+
+# SQLite production profile, see polls/sqlite.py: WAL, synchronous=NORMAL, mmap and a larger page cache on every
+# connection, and vote writes that take the write lock up front and retry while the database is locked.
+# Opt-in; the write lock part needs the polls.backends.sqlite3 ENGINE in DATABASES.
+
+POLLS_SQLITE_TUNING = config('POLLS_SQLITE_TUNING', default=False, cast=bool)
+
+# Milliseconds a write waits for the database lock before failing with "database is locked"
+
+POLLS_SQLITE_BUSY_TIMEOUT = config('POLLS_SQLITE_BUSY_TIMEOUT', default=5000, cast=int)
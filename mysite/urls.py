@@ -3,9 +3,12 @@ from django.urls import include, path
 
 from django.views.generic import RedirectView
 
+from polls import views as polls_views
+
 urlpatterns = [
     path('', RedirectView.as_view(pattern_name='polls:index'), name='home_redirect'),
     path("polls/", include("polls.urls")),
     path('admin/', admin.site.urls),
     path("accounts/", include("django.contrib.auth.urls")),
+    path("metrics", polls_views.prometheus_metrics, name="metrics"),
 ]
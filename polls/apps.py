@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class PollsConfig(AppConfig):
@@ -7,4 +8,11 @@ class PollsConfig(AppConfig):
 
     def ready(self) -> None:
         import polls.signals
+        import polls.broadcast
+        import polls.page_cache
+        import polls.timing
+
+        # * Only time SQL when the timing middleware runs.
+        if polls.timing.MIDDLEWARE in settings.MIDDLEWARE:
+            polls.timing.install()
     
\ No newline at end of file
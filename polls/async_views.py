@@ -0,0 +1,165 @@
+"""
+Async versions of the vote and poll page views for ASGI deployments.
+
+With POLLS_ASYNC_VIEWS on, mysite.async_urls routes the detail, results,
+vote and up/down vote pages here, so a request waiting on the database does
+not hold a worker thread under an ASGI server. The other pages keep their
+sync views.
+
+Reads use the async ORM. Writes go through Vote.objects.acast() and
+SentimentVote.objects.aset_sentiment(), the async wrappers of the single
+statement upserts the sync views use. Django 4.2 has no request.auser() or
+async session API yet, so the user is resolved once with sync_to_async by
+alogin_required(). Templates are rendered the same way, since the context
+processors may touch the session.
+"""
+
+import logging
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404
+from django.shortcuts import redirect, render
+
+from . import metrics, vote_buffer
+from .broadcast import is_stream_enabled
+from .models import Question, Vote
+from .views import get_client_ip, get_results_queryset, record_sentiment
+
+logger = logging.getLogger("django")
+vote_logger = logging.getLogger("django.polls.votes")
+
+
+async def auser(request):
+    """Return request.user with the session and user already loaded."""
+    def load():
+        request.user.is_authenticated
+        return request.user
+    return await sync_to_async(load)()
+
+
+def alogin_required(view):
+    """Async counterpart of login_required."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await auser(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def aget_question(queryset, pk):
+    """Return the question `pk` from `queryset`, raise Http404 if there is none."""
+    try:
+        return await queryset.aget(pk=pk)
+    except Question.DoesNotExist:
+        raise Http404("No question matches the given query.")
+
+
+@alogin_required
+async def detail(request, pk):
+    """Async DetailView: the poll question with its choices and the user's vote."""
+    try:
+        question = await aget_question(Question.objects.active().prefetch_related("choice_set"), pk)
+    except Http404:
+        return redirect("polls:index")
+
+    choices = {choice.pk: choice for choice in question.choice_set.all()}
+    selected_choice_id = vote_buffer.buffered_choice(request.user, question.pk)
+    if selected_choice_id is None:
+        selected_choice_id = await (Vote.objects.filter(question=question, user=request.user)
+                                    .values_list("choice_id", flat=True).afirst())
+    selected_choice = choices.get(selected_choice_id)
+
+    context = {
+        "object": question,
+        "question": question,
+        "question_text": question.question_text,
+        "short_description": question.short_description,
+        "long_description": question.long_description,
+        "pub_date": question.pub_date,
+        "end_date": question.end_date,
+        "up_vote_count": question.up_vote_count,
+        "down_vote_count": question.down_vote_count,
+        "selected_choice": selected_choice,
+        "has_voted": selected_choice is not None,
+    }
+    return await sync_to_async(render)(request, "polls/detail.html", context)
+
+
+@alogin_required
+async def results(request, pk):
+    """Async ResultsView: vote counts and the user's up/down vote."""
+    question = await aget_question(get_results_queryset(request.user), pk)
+
+    voted = vote_buffer.buffered_sentiment(request.user, question.pk)
+    if voted is None:
+        voted = question.user_sentiment
+    user_voted = None if voted is None else ('upvote' if voted else 'downvote')
+
+    context = {"object": question, "question": question, "user_voted": user_voted,
+               "results_stream": is_stream_enabled()}
+    return await sync_to_async(render)(request, "polls/results.html", context)
+
+
+@alogin_required
+async def vote(request, question_id):
+    """Async counterpart of views.vote()."""
+    ip = get_client_ip(request)
+    user = request.user
+
+    if request.method == "POST":
+        try:
+            choice_id = int(request.POST["choice"])
+        except (KeyError, ValueError):
+            choice_id = None
+
+        result = None
+        if choice_id is not None:
+            if vote_buffer.is_enabled():
+                result = await sync_to_async(vote_buffer.cast)(user, question_id, choice_id)
+            else:
+                result = await Vote.objects.acast(user, question_id, choice_id)
+
+        if result is None:
+            question = await aget_question(Question.objects.all(), question_id)
+            if choice_id is None or not await question.choice_set.filter(pk=choice_id).aexists():
+                vote_logger.error("User %s (%s) didn't select choice.", user.username, ip)
+                messages.error(request, "You didn't select a choice.")
+                return redirect("polls:detail", question_id)
+            messages.error(request, "You cannot vote on this question.")
+            return redirect("polls:index")
+
+        metrics.inc("polls_votes_cast_total" if result.created else "polls_votes_changed_total")
+        if result.created:
+            vote_logger.info("User %s (%s) vote on choice %s in poll %s", user.username, ip, choice_id, question_id)
+            messages.success(request, "You voted successfully🥳")
+        else:
+            vote_logger.info("User %s (%s) update his answer to choice %s in poll %s",
+                             user.username, ip, choice_id, question_id)
+            messages.success(request, "You updated your vote🥳")
+
+        return redirect("polls:results", question_id)
+    else:
+        await aget_question(Question.objects.all(), question_id)
+        messages.error(request, "Invalid request method.")
+        return redirect("polls:index")
+
+
+@alogin_required
+async def up_down_vote(request, question_id, vote_type):
+    """Async counterpart of views.up_down_vote()."""
+    question = await aget_question(Question.objects.all(), question_id)
+
+    if request.method == "POST":
+        if vote_type == "upvote":
+            if await sync_to_async(record_sentiment)(question, request.user, True):
+                messages.success(request, "You upvoted this Poll😊")
+        elif vote_type == "downvote":
+            if await sync_to_async(record_sentiment)(question, request.user, False):
+                messages.success(request, "You downvoted this Poll😭")
+
+    return redirect("polls:results", question_id)
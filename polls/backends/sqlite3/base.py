@@ -0,0 +1,23 @@
+"""
+SQLite backend whose transactions can start with BEGIN IMMEDIATE, see polls/sqlite.py.
+
+Django 4.2 always starts a transaction with a plain BEGIN; OPTIONS
+["transaction_mode"] only arrived in Django 5.1. Set ENGINE to
+"polls.backends.sqlite3" in DATABASES to use it, everything else is the
+stock backend.
+"""
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Attributes:
+        begin_immediate (bool): Start the next transaction with BEGIN IMMEDIATE,
+            set by polls.sqlite.immediate_atomic() for one atomic block.
+    """
+
+    begin_immediate = False
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute("BEGIN IMMEDIATE" if self.begin_immediate else "BEGIN")
@@ -0,0 +1,88 @@
+"""
+Helpers shared by the benchmark management commands.
+
+Benchmarks run against a throwaway test database so they never touch real
+data. The database is a file rather than SQLite's in-memory default, so
+commits pay for the same fsyncs and locks as in production.
+
+measure_request() times one page through the test client and counts its
+SQL queries, for the budgets of bench_hot_paths.
+"""
+
+import math
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from .models import Choice, Question
+
+
+@contextmanager
+def throwaway_database():
+    """
+    Create a migrated test database for the duration of the block.
+
+    Yields:
+        str: A scratch directory that is removed together with the database.
+    """
+    setup_test_environment()
+    workdir = tempfile.TemporaryDirectory()
+    connection.settings_dict["TEST"]["NAME"] = os.path.join(workdir.name, "bench.sqlite3")
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield workdir.name
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        workdir.cleanup()
+
+
+def create_poll(label, choices=4):
+    """Create an open poll with `choices` choices, return (question, choices)."""
+    question = Question.objects.create(question_text=f"Benchmark {label}")
+    created = Choice.objects.bulk_create(
+        [Choice(question=question, choice_text=f"Choice {i}") for i in range(choices)]
+    )
+    return question, created
+
+
+def create_users(label, count):
+    """Create `count` users without passwords, for Client.force_login()."""
+    return User.objects.bulk_create([User(username=f"bench-{label}-{i}") for i in range(count)])
+
+
+def percentile(samples, fraction):
+    """Return the nearest-rank percentile of `samples`, e.g. fraction 0.95 for p95."""
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def measure_request(send, runs, warmup=3):
+    """
+    Call `send()` `runs` times after `warmup` untimed calls and measure it.
+
+    `send` makes one request and returns the response, it may vary the
+    request on every call.
+
+    Returns:
+        dict: p50_ms and p95_ms latency, and the largest number of queries
+        of a single call.
+    """
+    for _ in range(warmup):
+        send()
+    timings, queries = [], 0
+    for _ in range(runs):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = send()
+            timings.append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.request['PATH_INFO']} returned {response.status_code}")
+        queries = max(queries, len(captured))
+    return {"p50_ms": round(percentile(timings, 0.5), 1), "p95_ms": round(percentile(timings, 0.95), 1),
+            "queries": queries}
@@ -0,0 +1,240 @@
+"""
+Live results for the results page over Server-Sent Events.
+
+One ResultsBroadcaster per process fans vote changes out to every open
+results stream. When votes_changed fires for a question that has
+subscribers, its channel reads the stored counters once and publishes the
+difference to the last read as a compact "counts" event:
+
+    {"c": {"<choice id>": <delta>, ...}, "u": <up delta>, "d": <down delta>}
+
+so a thousand viewers cost one counter read per change instead of a
+thousand page renders. A new stream starts with a "snapshot" event holding
+the absolute counts in the same shape. The last STREAM_HISTORY events of a
+channel are kept in a ring buffer, so a client that reconnects with a
+Last-Event-ID gets the events it missed, or a fresh snapshot when they are
+gone.
+
+Votes written by another process do not reach this process' signal, so a
+channel also re-reads the counters when it has been quiet for
+POLLS_RESULTS_STREAM_KEEPALIVE seconds, once per channel however many
+subscribers wait on it.
+
+Under WSGI an open stream holds a worker thread until the viewer leaves, so
+a few viewers could take the whole pool. The stream is therefore only served
+with POLLS_RESULTS_STREAM, which defaults to POLLS_ASYNC_VIEWS (ASGI).
+Without it the results page is rendered without the live updates.
+"""
+
+import asyncio
+import json
+import secrets
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.dispatch import receiver
+
+from .models import Choice, Question
+from .signals import votes_changed
+
+STREAM_HISTORY = 256
+# * Milliseconds a browser waits before reconnecting a dropped stream.
+STREAM_RETRY = 3000
+
+
+def is_stream_enabled():
+    return getattr(settings, "POLLS_RESULTS_STREAM", False)
+
+
+def get_keepalive():
+    """Seconds between keep-alive comments, and between re-reads of a quiet channel."""
+    return getattr(settings, "POLLS_RESULTS_STREAM_KEEPALIVE", 15)
+
+
+def read_counts(question_id):
+    """Return the stored counters of a question as {"c": {choice id: votes}, "u": up, "d": down}."""
+    choices = Choice.objects.filter(question_id=question_id).values_list("pk", "vote_count")
+    up, down = Question.objects.filter(pk=question_id).values_list("up_votes", "down_votes").first() or (0, 0)
+    return {"c": {str(pk): votes for pk, votes in choices}, "u": up, "d": down}
+
+
+def diff_counts(old, new):
+    """Return the delta event that turns counts `old` into `new`, None if they are equal."""
+    choices = {pk: votes - old["c"].get(pk, 0) for pk, votes in new["c"].items() if votes != old["c"].get(pk, 0)}
+    delta = {"c": choices, "u": new["u"] - old["u"], "d": new["d"] - old["d"]}
+    if not (choices or delta["u"] or delta["d"]):
+        return None
+    return delta
+
+
+def format_event(event, event_id, data):
+    """Return one Server-Sent Event as text."""
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Channel:
+    """
+    The live counters of one question and the recent events sent about them.
+
+    Attributes:
+        seq (int): Number of the last event, event ids are "<epoch>-<seq>".
+        counts (dict): The counters as of the last event.
+    """
+
+    def __init__(self, question_id):
+        self.question_id = question_id
+        # * Tells event ids of an earlier channel or process apart from ours.
+        self.epoch = secrets.token_hex(4)
+        self.seq = 0
+        self.counts = None
+        self.events = deque(maxlen=STREAM_HISTORY)
+        self.subscribers = 0
+        self.checked = 0.0
+        self.condition = threading.Condition()
+        self._refresh_lock = threading.Lock()
+        self._waiters = set()
+
+    def event_id(self, seq=None):
+        return f"{self.epoch}-{self.seq if seq is None else seq}"
+
+    def refresh(self):
+        """Read the counters and publish what changed since the last read."""
+        with self._refresh_lock:
+            counts = read_counts(self.question_id)
+            with self.condition:
+                self.checked = time.monotonic()
+                if self.counts is None:
+                    self.counts = counts
+                    return
+                delta = diff_counts(self.counts, counts)
+                if delta is None:
+                    return
+                self.seq += 1
+                self.counts = counts
+                self.events.append((self.seq, delta))
+                self.condition.notify_all()
+                waiters = list(self._waiters)
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def refresh_if_quiet(self):
+        """Re-read the counters if nobody has for a keep-alive interval."""
+        if time.monotonic() - self.checked >= get_keepalive():
+            self.refresh()
+
+    def since(self, last_event_id):
+        """
+        Return the events that bring a client at `last_event_id` up to date.
+
+        Returns:
+            tuple: The seq the client is at afterwards and a list of
+            (event, event id, data) tuples.
+        """
+        with self.condition:
+            epoch, _, seq = (last_event_id or "").partition("-")
+            if epoch == self.epoch and seq.isdigit():
+                seq = int(seq)
+                oldest = self.events[0][0] if self.events else self.seq + 1
+                if seq == self.seq or oldest <= seq + 1 <= self.seq:
+                    return self.seq, [("counts", self.event_id(s), delta) for s, delta in self.events if s > seq]
+            return self.seq, [("snapshot", self.event_id(), self.counts)]
+
+    def add_waiter(self, waiter):
+        with self.condition:
+            self._waiters.add(waiter)
+
+    def remove_waiter(self, waiter):
+        with self.condition:
+            self._waiters.discard(waiter)
+
+
+class ResultsBroadcaster:
+    """Fans vote changes out to the results streams of this process."""
+
+    def __init__(self):
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def publish(self, question_id):
+        """Push the latest counters of a question to its subscribers, if it has any."""
+        channel = self._channels.get(question_id)
+        if channel is not None:
+            channel.refresh()
+
+    def _subscribe(self, question_id):
+        with self._lock:
+            channel = self._channels.get(question_id)
+            if channel is None:
+                channel = self._channels[question_id] = Channel(question_id)
+            channel.subscribers += 1
+        return channel
+
+    def _unsubscribe(self, channel):
+        with self._lock:
+            channel.subscribers -= 1
+            if channel.subscribers == 0:
+                del self._channels[channel.question_id]
+
+    def stream(self, question_id, last_event_id=None):
+        """Yield the Server-Sent Events of a question, for WSGI."""
+        channel = self._subscribe(question_id)
+        try:
+            if channel.counts is None:
+                channel.refresh()
+            yield f"retry: {STREAM_RETRY}\n\n"
+            seq, events = channel.since(last_event_id)
+            while True:
+                for event in events:
+                    yield format_event(*event)
+                with channel.condition:
+                    channel.condition.wait_for(lambda: channel.seq != seq, timeout=get_keepalive())
+                if channel.seq == seq:
+                    channel.refresh_if_quiet()
+                if channel.seq == seq:
+                    yield ": keep-alive\n\n"
+                    events = []
+                    continue
+                seq, events = channel.since(channel.event_id(seq))
+        finally:
+            self._unsubscribe(channel)
+
+    async def astream(self, question_id, last_event_id=None):
+        """Yield the Server-Sent Events of a question, for ASGI."""
+        channel = self._subscribe(question_id)
+        changed = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), changed)
+        channel.add_waiter(waiter)
+        try:
+            if channel.counts is None:
+                await sync_to_async(channel.refresh)()
+            yield f"retry: {STREAM_RETRY}\n\n"
+            seq, events = channel.since(last_event_id)
+            while True:
+                for event in events:
+                    yield format_event(*event)
+                changed.clear()
+                if channel.seq == seq:
+                    try:
+                        await asyncio.wait_for(changed.wait(), timeout=get_keepalive())
+                    except asyncio.TimeoutError:
+                        await sync_to_async(channel.refresh_if_quiet)()
+                if channel.seq == seq:
+                    yield ": keep-alive\n\n"
+                    events = []
+                    continue
+                seq, events = channel.since(channel.event_id(seq))
+        finally:
+            channel.remove_waiter(waiter)
+            self._unsubscribe(channel)
+
+
+broadcaster = ResultsBroadcaster()
+
+
+@receiver(votes_changed)
+def publish_votes_changed(sender, question_ids, **kwargs):
+    for question_id in question_ids:
+        broadcaster.publish(question_id)
@@ -0,0 +1,177 @@
+"""
+Streaming, batched loader for fixtures in Django's JSON format, see the
+bulk_loaddata command.
+
+loaddata parses a whole fixture into memory and saves every object on its
+own, with signals. Here the top-level array is parsed one object at a time
+with JSONDecoder.raw_decode() over a rolling buffer, so memory use depends
+on the batch size and not on the file. Objects are grouped by model and
+written batch_size at a time with bulk_create(). Rows whose primary key
+exists already are updated, as loaddata would, and many-to-many rows are
+inserted after their batch.
+
+Everything runs in one transaction with constraint checks deferred, so a
+vote can come before the choice it points to. Foreign keys are checked once
+at the end. bulk_create() sends no signals, so the stored vote counters and trend
+scores are rebuilt afterwards with the helpers in polls/counters.py, the
+search index is rebuilt and the page cache catalog version is bumped.
+"""
+
+import json
+import time
+from collections import defaultdict
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.core.serializers.python import Deserializer
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from . import page_cache, search
+from .counters import rebuild_choice_counts, rebuild_sentiment_counts, rebuild_trend_scores
+from .models import Choice, Question, SentimentVote, Vote
+
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_array(stream, chunk_size=CHUNK_SIZE):
+    """
+    Yield the items of the JSON array in a text stream one at a time.
+
+    Raises:
+        ValueError: If the stream is not a JSON array.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    eof = False
+
+    while True:
+        # * Skip whitespace and the separators between items.
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position == len(buffer):
+            if eof:
+                raise ValueError("Unexpected end of fixture, the array is not closed")
+            buffer, position = stream.read(chunk_size), 0
+            eof = not buffer
+            continue
+
+        if not started:
+            if buffer[position] != "[":
+                raise ValueError("A fixture must be a JSON array")
+            started = True
+            position += 1
+            continue
+        if buffer[position] == "]":
+            return
+
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # * The item runs past the buffer, or it is broken: read more and try again.
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                raise
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield item
+        position = end
+
+
+class BulkLoader:
+    """
+    Loads fixture objects in batches.
+
+    Attributes:
+        counts (dict): Number of objects loaded per model label.
+        loaded (int): Number of objects loaded in total.
+    """
+
+    def __init__(self, batch_size=5000, using=DEFAULT_DB_ALIAS, progress=None):
+        self.batch_size = batch_size
+        self.using = using
+        self.progress = progress
+        self.counts = defaultdict(int)
+        self.loaded = 0
+        self.started = None
+        self._pending = defaultdict(list)
+
+    def load(self, streams):
+        """Load every object of the fixture streams in one transaction."""
+        connection = connections[self.using]
+        self.started = time.perf_counter()
+        with transaction.atomic(using=self.using):
+            with connection.constraint_checks_disabled():
+                for stream in streams:
+                    for record in iter_json_array(stream):
+                        self.add(record)
+                for label in list(self._pending):
+                    self.flush(label)
+            # * Deferred until every batch is in, like loaddata.
+            models = [apps.get_model(label) for label in self.counts]
+            connection.check_constraints(table_names=[model._meta.db_table for model in models])
+            self.reset_sequences(models)
+            self.rebuild_counters(models)
+            search.rebuild_index(self.using)
+            transaction.on_commit(page_cache.bump_catalog_version, using=self.using)
+
+    def add(self, record):
+        label = record["model"].lower()
+        self._pending[label].append(record)
+        if len(self._pending[label]) >= self.batch_size:
+            self.flush(label)
+
+    def flush(self, label):
+        """Write the pending objects of one model."""
+        records = self._pending.pop(label, [])
+        if not records:
+            return
+        model = apps.get_model(label)
+        objects, m2m_rows = [], defaultdict(list)
+        for deserialized in Deserializer(records, using=self.using, ignorenonexistent=True):
+            objects.append(deserialized.object)
+            for name, pks in (deserialized.m2m_data or {}).items():
+                m2m_rows[name] += [(deserialized.object.pk, pk) for pk in pks]
+
+        fields = [field.name for field in model._meta.concrete_fields if not field.primary_key]
+        model._base_manager.using(self.using).bulk_create(
+            objects, update_conflicts=bool(fields), update_fields=fields or None,
+            unique_fields=[model._meta.pk.name] if fields else None,
+        )
+        for name, rows in m2m_rows.items():
+            field = model._meta.get_field(name)
+            through = field.remote_field.through
+            source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+            through._base_manager.using(self.using).bulk_create(
+                [through(**{f"{source}_id": pk, f"{target}_id": related_pk}) for pk, related_pk in rows],
+                ignore_conflicts=True,
+            )
+
+        self.counts[label] += len(objects)
+        self.loaded += len(objects)
+        if self.progress is not None:
+            self.progress(self, label, len(objects))
+
+    @property
+    def rate(self):
+        """Objects loaded per second so far."""
+        elapsed = time.perf_counter() - self.started
+        return self.loaded / elapsed if elapsed else 0
+
+    def reset_sequences(self, models):
+        """Move the id sequences past the loaded primary keys, where the backend has them."""
+        connection = connections[self.using]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def rebuild_counters(self, models):
+        """Rebuild the stored vote counters and trend scores the loaded rows affect."""
+        if Choice in models or Vote in models:
+            rebuild_choice_counts()
+        if Question in models or SentimentVote in models:
+            rebuild_sentiment_counts()
+        if Question in models or SentimentVote in models or Vote in models:
+            rebuild_trend_scores()
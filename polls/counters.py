@@ -0,0 +1,129 @@
+"""
+Helpers that keep the stored vote counters in line with the vote tables.
+
+The counters on Choice and the up/down tallies on Question are updated
+incrementally when users vote. These functions rebuild them from scratch with
+set-based queries, which is what we need after bulk imports or fixture loads
+that bypass the vote() view and Question.upvote()/downvote().
+"""
+
+import time
+
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Choice, Question, SentimentVote, Vote
+
+
+def _choice_vote_total():
+    """Correlated subquery counting the Vote rows of the outer Choice."""
+    totals = (Vote.objects.filter(choice=OuterRef('pk'))
+              .values('choice')
+              .annotate(total=Count('pk'))
+              .values('total'))
+    return Coalesce(Subquery(totals), Value(0))
+
+
+def _sentiment_total(vote_types):
+    """Correlated subquery counting the up or down SentimentVote rows of the outer Question."""
+    totals = (SentimentVote.objects.filter(question=OuterRef('pk'), vote_types=vote_types)
+              .values('question')
+              .annotate(total=Count('pk'))
+              .values('total'))
+    return Coalesce(Subquery(totals), Value(0))
+
+
+def rebuild_choice_counts(question_ids=None):
+    """
+    Recompute Choice.vote_count from the Vote table in one UPDATE and bump
+    Question.stats_version of the questions involved.
+
+    Args:
+        question_ids (iterable of int): Only rebuild choices of these questions.
+            Rebuild every choice when None.
+
+    Returns:
+        int: The number of choices updated.
+    """
+    choices = Choice.objects.all()
+    questions = Question.objects.all()
+    if question_ids is not None:
+        choices = choices.filter(question_id__in=question_ids)
+        questions = questions.filter(pk__in=question_ids)
+    updated = choices.update(vote_count=_choice_vote_total())
+    questions.update(stats_version=F('stats_version') + 1)
+    return updated
+
+
+def rebuild_sentiment_counts(question_ids=None):
+    """
+    Recompute Question.up_votes and Question.down_votes from SentimentVote in one UPDATE.
+
+    Args:
+        question_ids (iterable of int): Only rebuild these questions.
+            Rebuild every question when None.
+
+    Returns:
+        int: The number of questions updated.
+    """
+    questions = Question.objects.all()
+    if question_ids is not None:
+        questions = questions.filter(pk__in=question_ids)
+    return questions.update(up_votes=_sentiment_total(True), down_votes=_sentiment_total(False),
+                            stats_version=F('stats_version') + 1)
+
+
+def rebuild_trend_scores(question_ids=None, batch_size=1000):
+    """
+    Recompute Question.trend_score from the stored tallies and the Vote table,
+    as if every vote had been cast now, see Question.trending_score().
+
+    The decay depends on each pub_date, so scores are computed in Python and
+    written back with bulk_update(), batch_size questions at a time.
+
+    Args:
+        question_ids (iterable of int): Only rebuild these questions.
+            Rebuild every question when None.
+
+    Returns:
+        int: The number of questions updated.
+    """
+    now = time.time()
+    questions = Question.objects.with_stats().only("pk", "pub_date", "up_votes", "down_votes")
+    if question_ids is not None:
+        questions = questions.filter(pk__in=question_ids)
+    updated, batch = 0, []
+    for question in questions.iterator(chunk_size=batch_size):
+        question.trend_score = question.trending_score(now=now)
+        # * A poll scheduled for later keeps its fresh score until it opens, like start_trend().
+        question.trend_updated = max(now, question.pub_date.timestamp())
+        batch.append(question)
+        if len(batch) >= batch_size:
+            updated += Question.objects.bulk_update(batch, ["trend_score", "trend_updated"])
+            batch = []
+    return updated + Question.objects.bulk_update(batch, ["trend_score", "trend_updated"])
+
+
+def find_choice_count_drift():
+    """
+    Return choices whose stored counter disagrees with the Vote table.
+
+    Each choice in the result carries an ``actual_votes`` attribute holding the
+    real number of Vote rows.
+    """
+    return (Choice.objects.annotate(actual_votes=Count('vote'))
+            .exclude(vote_count=F('actual_votes'))
+            .order_by('question_id', 'pk'))
+
+
+def find_sentiment_count_drift():
+    """
+    Return questions whose stored up/down tallies disagree with the SentimentVote table.
+
+    Each question in the result carries ``actual_up`` and ``actual_down`` attributes.
+    """
+    return (Question.objects
+            .annotate(actual_up=Count('sentimentvote', filter=Q(sentimentvote__vote_types=True)),
+                      actual_down=Count('sentimentvote', filter=Q(sentimentvote__vote_types=False)))
+            .exclude(up_votes=F('actual_up'), down_votes=F('actual_down'))
+            .order_by('pk'))
@@ -31,7 +31,7 @@ class SignUpForm(UserCreationForm):
 
         if commit:
             user.save()
-            self.logger.info(f"User registered with username: {user.username}")
+            self.logger.info("User registered with username: %s", user.username)
 
         return user
 
@@ -0,0 +1,151 @@
+"""
+Batch import of polls from JSON lines or CSV, see the import_polls command.
+
+Every record is one poll:
+
+    {"question_text": "...", "pub_date": "2024-01-01T10:00:00+07:00", "end_date": null,
+     "short_description": "...", "long_description": "...",
+     "choices": ["Yes", "No"], "tags": ["Sports"]}
+
+In CSV the columns have the same names and choices and tags are separated
+by CSV_SEPARATOR. Only question_text is required.
+
+Records are read lazily and written batch_size at a time, each batch in one
+transaction with one bulk INSERT per table, so a large file never sits in
+memory and a bad record leaves no half-imported poll behind. Tags are looked
+up through a tag text -> id map that is loaded once and grows as new tags
+are created.
+
+bulk_create() skips save() and the model signals, so the trend score is set
+with Question.start_trend() and the page cache is told about the new polls
+with bump_catalog_version().
+"""
+
+import csv
+import json
+import time
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import metrics, page_cache
+from .models import Choice, Question, Tag
+
+CSV_SEPARATOR = "|"
+# * Optional, the model defaults apply when a record leaves them out.
+DESCRIPTIONS = ("short_description", "long_description")
+
+
+def read_jsonl(stream):
+    """Yield one record per non-empty line of a JSON lines stream."""
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(stream):
+    """Yield one record per CSV row, with choices and tags split into lists."""
+    for row in csv.DictReader(stream):
+        for column in ("choices", "tags"):
+            row[column] = (row.get(column) or "").split(CSV_SEPARATOR)
+        yield row
+
+
+def parse_when(value):
+    """Return an aware datetime from an ISO date or datetime string, None if it is empty."""
+    if not value:
+        return None
+    when = parse_datetime(value)
+    if when is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date: {value!r}")
+        when = timezone.datetime.combine(day, timezone.datetime.min.time())
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when)
+    return when
+
+
+def clean_texts(values):
+    """Strip `values` and drop empty and repeated ones, keeping their order."""
+    return list(dict.fromkeys(value.strip() for value in values or [] if value and value.strip()))
+
+
+class PollImporter:
+    """
+    Writes poll records to the database in batches.
+
+    Attributes:
+        polls (int): Number of polls imported so far.
+        choices (int): Number of choices imported so far.
+        new_tags (int): Number of tags created so far.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.polls = self.choices = self.new_tags = 0
+        # * The first tag with a text wins, as Tag texts are not unique.
+        self.tag_ids = {}
+        for pk, tag_text in Tag.objects.order_by("-pk").values_list("pk", "tag_text"):
+            self.tag_ids[tag_text] = pk
+
+    def build_question(self, record, now):
+        if not isinstance(record, dict):
+            raise ValueError(f"expected an object, got {type(record).__name__}")
+        question_text = (record.get("question_text") or "").strip()
+        if not question_text:
+            raise ValueError("question_text is required")
+        fields = {name: record[name] for name in DESCRIPTIONS if record.get(name)}
+        question = Question(question_text=question_text, pub_date=parse_when(record.get("pub_date")) or timezone.now(),
+                            end_date=parse_when(record.get("end_date")), **fields)
+        question.start_trend(now)
+        return question
+
+    def import_records(self, records):
+        """Import every record of an iterable, one batch at a time."""
+        records = iter(records)
+        while True:
+            batch = list(islice(records, self.batch_size))
+            if not batch:
+                return
+            self.import_batch(batch)
+
+    def import_batch(self, records):
+        """
+        Import a list of records in one transaction.
+
+        Raises:
+            ValueError: If a record is invalid, nothing of the batch is written.
+        """
+        now = time.time()
+        questions = []
+        for number, record in enumerate(records, start=self.polls + 1):
+            try:
+                questions.append(self.build_question(record, now))
+            except (ValueError, TypeError) as error:
+                raise ValueError(f"Record {number}: {error}") from error
+        choice_texts = [clean_texts(record.get("choices")) for record in records]
+        tag_texts = [clean_texts(record.get("tags")) for record in records]
+
+        with transaction.atomic():
+            Question.objects.bulk_create(questions)
+
+            missing = list(dict.fromkeys(text for texts in tag_texts for text in texts if text not in self.tag_ids))
+            for tag in Tag.objects.bulk_create([Tag(tag_text=text) for text in missing]):
+                self.tag_ids[tag.tag_text] = tag.pk
+
+            choices = [Choice(question=question, choice_text=text)
+                       for question, texts in zip(questions, choice_texts) for text in texts]
+            Choice.objects.bulk_create(choices)
+            Question.tags.through.objects.bulk_create([
+                Question.tags.through(question_id=question.pk, tag_id=self.tag_ids[text])
+                for question, texts in zip(questions, tag_texts) for text in texts
+            ])
+            transaction.on_commit(page_cache.bump_catalog_version)
+
+        metrics.inc("polls_polls_created_total", len(questions), source="import")
+        self.polls += len(questions)
+        self.choices += len(choices)
+        self.new_tags += len(missing)
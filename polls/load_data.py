@@ -0,0 +1,189 @@
+"""
+Synthetic, production-like data for benchmarks, see the generate_load_data command.
+
+Real poll traffic is skewed: a few hot polls get most of the votes. Here
+votes and up/down votes are spread over the questions, and over the choices
+of a question, with Zipf weights 1 / rank ** skew. A skew of 0 gives a
+uniform spread and larger values make the hot polls hotter. Every draw comes
+from one random.Random(seed), so the same options always give the same
+database, apart from the dates being relative to now.
+
+Usernames and tag texts start with the run label, by default "load-<seed>",
+so runs with different seeds or labels can fill the same database. A run
+whose label is taken already stops before writing anything.
+
+Rows are written with bulk_create() in batches and only the votes of one
+batch are kept in memory. The counts per question are drawn up front, so
+the up/down tallies and trend scores are written with the questions. The
+choice counters are rebuilt with one UPDATE at the end.
+"""
+
+import random
+import time
+from collections import Counter
+from itertools import accumulate
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import page_cache, trending
+from .counters import rebuild_choice_counts
+from .models import Choice, Question, SentimentVote, Tag, Vote
+
+
+def zipf_weights(count, skew):
+    """Return cumulative Zipf weights for `count` ranks, for random.choices(cum_weights=...)."""
+    return list(accumulate(1 / rank ** skew for rank in range(1, count + 1)))
+
+
+class LoadDataGenerator:
+    """
+    Generates users, tagged questions with choices, votes and up/down votes.
+
+    Attributes:
+        counts (Counter): Number of rows written per model name.
+        dropped (Counter): Number of votes and up/down votes not written, because
+            every poll already held one from each user.
+    """
+
+    def __init__(self, users=10_000, questions=1_000, votes=100_000, sentiments=50_000, tags=50, choices=4,
+                 skew=1.1, seed=0, batch_size=10_000, progress=None, label=None):
+        self.users = users
+        self.questions = questions
+        self.votes = votes
+        self.sentiments = sentiments
+        self.tags = tags
+        self.choices = choices
+        self.skew = skew
+        self.batch_size = batch_size
+        self.progress = progress
+        self.label = label or f"load-{seed}"
+        self.rng = random.Random(seed)
+        self.counts = Counter()
+        self.dropped = Counter()
+
+    def generate(self):
+        """
+        Write everything in one transaction.
+
+        Raises:
+            ValueError: If users of this run's label exist already.
+        """
+        if User.objects.filter(username__startswith=f"{self.label}-").exists():
+            raise ValueError(f"Users named {self.label}-<n> exist already, choose another seed or label.")
+        with transaction.atomic():
+            user_ids = self.create_users()
+            tag_ids = self.create_tags()
+            vote_totals = self.draw_totals(self.votes, "votes")
+            sentiment_totals = self.draw_totals(self.sentiments, "sentiments")
+            ups = []
+            for total in sentiment_totals:
+                # * Each poll has its own share of up votes.
+                share = self.rng.random()
+                ups.append(sum(self.rng.random() < share for _ in range(total)))
+            questions = self.create_questions(vote_totals, sentiment_totals, ups)
+            self.create_question_tags(questions, tag_ids)
+            choices = self.create_choices(questions)
+            self.create_votes(questions, choices, vote_totals, user_ids)
+            self.create_sentiments(questions, sentiment_totals, ups, user_ids)
+            rebuild_choice_counts([question.pk for question in questions])
+            transaction.on_commit(page_cache.bump_catalog_version)
+        return self.counts
+
+    def write(self, model, objects, **kwargs):
+        """bulk_create `objects` and report them."""
+        created = model.objects.bulk_create(objects, batch_size=self.batch_size, **kwargs)
+        self.counts[model.__name__] += len(objects)
+        if self.progress is not None:
+            self.progress(model.__name__, self.counts[model.__name__])
+        return created
+
+    def draw_totals(self, total, name):
+        """
+        Spread `total` rows over the questions with Zipf weights.
+
+        A user votes once per question, so a question holds at most one row per
+        user. The overflow of the hottest polls spills over to the next ones,
+        what is left after the last one is counted in dropped[name].
+        """
+        weights = zipf_weights(self.questions, self.skew)
+        drawn = Counter(self.rng.choices(range(self.questions), cum_weights=weights, k=total))
+        totals, spill = [], 0
+        for rank in range(self.questions):
+            totals.append(min(drawn[rank] + spill, self.users))
+            spill += drawn[rank] - totals[-1]
+        self.dropped[name] += spill
+        return totals
+
+    def create_users(self):
+        # * "!" is an unusable password, log in with Client.force_login().
+        users = [User(username=f"{self.label}-{i}", password="!") for i in range(self.users)]
+        return [user.pk for user in self.write(User, users)]
+
+    def create_tags(self):
+        tags = [Tag(tag_text=f"{self.label} tag {i}") for i in range(self.tags)]
+        return [tag.pk for tag in self.write(Tag, tags)]
+
+    def create_questions(self, vote_totals, sentiment_totals, ups):
+        """Create the questions, hottest first, with their tallies and trend scores."""
+        now = time.time()
+        questions = []
+        for rank in range(self.questions):
+            pub_date = timezone.now() - timezone.timedelta(seconds=self.rng.uniform(0, 30 * 24 * 60 * 60))
+            # * Most polls are open, some have no end date and some are closed.
+            end = self.rng.random()
+            end_date = (None if end < 0.2 else
+                        pub_date + timezone.timedelta(days=self.rng.uniform(1, 60)) if end < 0.9 else
+                        timezone.now() - timezone.timedelta(days=self.rng.uniform(0, 1)))
+            up, down = ups[rank], sentiment_totals[rank] - ups[rank]
+            question = Question(question_text=f"Load poll {rank}?", pub_date=pub_date, end_date=end_date,
+                                up_votes=up, down_votes=down)
+            question.start_trend(now)
+            question.trend_score += (up * trending.UPVOTE_WEIGHT + down * trending.DOWNVOTE_WEIGHT
+                                     + vote_totals[rank] * trending.CHOICE_VOTE_WEIGHT)
+            questions.append(question)
+        return self.write(Question, questions)
+
+    def create_question_tags(self, questions, tag_ids):
+        if not tag_ids:
+            return
+        weights = zipf_weights(len(tag_ids), self.skew)
+        through = Question.tags.through
+        rows = []
+        for question in questions:
+            for tag_id in set(self.rng.choices(tag_ids, cum_weights=weights, k=self.rng.randint(0, 3))):
+                rows.append(through(question_id=question.pk, tag_id=tag_id))
+        self.write(through, rows)
+
+    def create_choices(self, questions):
+        """Return the choice ids of every question, in question order."""
+        choices = [Choice(question_id=question.pk, choice_text=f"Choice {i}")
+                   for question in questions for i in range(self.rng.randint(2, max(self.choices, 2)))]
+        choice_ids = {}
+        for choice in self.write(Choice, choices):
+            choice_ids.setdefault(choice.question_id, []).append(choice.pk)
+        return [choice_ids[question.pk] for question in questions]
+
+    def create_votes(self, questions, choices, vote_totals, user_ids):
+        batch = []
+        for question, choice_ids, total in zip(questions, choices, vote_totals):
+            # * Choices are skewed too, a poll usually has a favourite.
+            weights = zipf_weights(len(choice_ids), self.skew)
+            picked = self.rng.choices(choice_ids, cum_weights=weights, k=total)
+            for user_id, choice_id in zip(self.rng.sample(user_ids, total), picked):
+                batch.append(Vote(question_id=question.pk, user_id=user_id, choice_id=choice_id))
+            if len(batch) >= self.batch_size:
+                self.write(Vote, batch)
+                batch = []
+        self.write(Vote, batch)
+
+    def create_sentiments(self, questions, sentiment_totals, ups, user_ids):
+        batch = []
+        for question, total, up in zip(questions, sentiment_totals, ups):
+            for i, user_id in enumerate(self.rng.sample(user_ids, total)):
+                batch.append(SentimentVote(question_id=question.pk, user_id=user_id, vote_types=i < up))
+            if len(batch) >= self.batch_size:
+                self.write(SentimentVote, batch)
+                batch = []
+        self.write(SentimentVote, batch)
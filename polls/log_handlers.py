@@ -0,0 +1,164 @@
+"""
+Logging pieces that keep disk I/O off the request thread, see LOGGING in mysite/settings.py.
+
+With POLLS_LOG_QUEUE on, every handler a logger uses is wrapped in a
+QueueListenerHandler. Logging a record then only puts it on an in-memory
+queue; a QueueListener thread writes it to the wrapped handlers, so a slow
+disk or a log rotation never stalls a request. When the queue is full, which
+only happens when the disk falls far behind, records below WARNING are
+dropped and counted in the polls_log_records_dropped_total metric instead
+of blocking; warnings and errors are written from the request thread.
+The listeners are stopped at exit, which writes the queued records first;
+records logged after that are written from the calling thread.
+
+JsonFormatter writes one JSON object per line for log shippers, and
+SamplingFilter keeps a share of the high-volume INFO records of a logger,
+such as the vote log.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import weakref
+from logging.handlers import QueueHandler, QueueListener
+
+from . import metrics
+
+QUEUE_SIZE = 10_000
+
+# * Every live handler, for the exit and fork hooks registered once below.
+_handlers = weakref.WeakSet()
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # * Waits for room, records queued before stop() are still written.
+        self.queue.put(self._sentinel)
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    Queues records for the wrapped handlers, which a background thread writes.
+
+    `handlers` are handler objects, or "cfg://handlers.<name>" references in
+    a dictConfig. A referenced handler must sort before this one by name, so
+    it is configured first.
+
+    Attributes:
+        dropped (int): Number of records dropped because the queue was full.
+    """
+
+    def __init__(self, handlers, queue_size=QUEUE_SIZE):
+        super().__init__(queue.Queue(queue_size))
+        # * Indexing resolves the cfg:// references of a dictConfig ConvertingList.
+        self.targets = [handlers[i] for i in range(len(handlers))]
+        for target in self.targets:
+            if not isinstance(target, logging.Handler):
+                raise ValueError(f"{target!r} is not a configured handler")
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.listener = _Listener(self.queue, *self.targets, respect_handler_level=True)
+        self.listener.start()
+        _handlers.add(self)
+
+    def prepare(self, record):
+        """
+        Merge the arguments into the message before the record changes threads,
+        and keep the traceback as text so the target formatters can place it.
+        """
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.listener._thread is None:
+            # * Stopped, e.g. by another exit hook logging after _stop_all.
+            self._write(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno >= logging.WARNING:
+                # * Never lose a warning or an error, write it here like an unqueued handler would.
+                self._write(record)
+                return
+            self.dropped += 1
+            metrics.inc("polls_log_records_dropped_total", handler=self.name or "unnamed")
+
+    def _write(self, record):
+        for target in self.targets:
+            if record.levelno >= target.level:
+                target.handle(record)
+
+    def _restart(self):
+        """Start a new listener in a forked child, threads do not survive fork()."""
+        self.queue = queue.Queue(self.queue_size)
+        self.listener = _Listener(self.queue, *self.targets, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        """Write the queued records and stop the listener thread."""
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def close(self):
+        self.stop()
+        _handlers.discard(self)
+        super().close()
+
+
+def _stop_all():
+    for handler in list(_handlers):
+        handler.stop()
+
+
+def _restart_all():
+    for handler in list(_handlers):
+        handler._restart()
+
+
+atexit.register(_stop_all)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_all)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one line of JSON."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "line": record.lineno,
+            "process": record.process,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Lets through `rate` (0 to 1) of the records below WARNING, and every WARNING and above."""
+
+    def __init__(self, rate=1.0, name=""):
+        super().__init__(name)
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+        return random.random() < self.rate
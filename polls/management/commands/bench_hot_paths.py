@@ -0,0 +1,87 @@
+import json
+from itertools import count
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from polls.benchmarks import measure_request, throwaway_database
+from polls.load_data import LoadDataGenerator
+from polls.models import Question
+
+BASELINES = settings.BASE_DIR / "polls" / "bench_baselines.json"
+# * Listings are measured uncached, a cache hit would hide an N+1 on a miss.
+NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+def hot_paths(client, question, choice_ids):
+    """Return {name: send()} for the pages to measure, on the hottest poll."""
+    turn = count()
+    return {
+        "index": lambda: client.get(reverse("polls:index")),
+        "detail": lambda: client.get(reverse("polls:detail", args=(question.id,))),
+        "results": lambda: client.get(reverse("polls:results", args=(question.id,))),
+        "search": lambda: client.get(reverse("polls:search_poll"), {"q": "poll"}),
+        # * Alternate so every vote changes something.
+        "vote": lambda: client.post(reverse("polls:vote", args=(question.id,)),
+                                    {"choice": choice_ids[next(turn) % len(choice_ids)]}),
+        "up_down_vote": lambda: client.post(reverse(("polls:upvote", "polls:downvote")[next(turn) % 2],
+                                                    args=(question.id,))),
+    }
+
+
+class Command(BaseCommand):
+    help = ("Measure p50/p95 latency and SQL queries of the index, detail, results, search, vote and up/down "
+            "vote pages on a generated dataset, and fail when a page goes over its budget in "
+            "polls/bench_baselines.json. Runs against a throwaway test database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=50, help="Timed requests per page.")
+        parser.add_argument("--users", type=int, default=2_000)
+        parser.add_argument("--questions", type=int, default=500)
+        parser.add_argument("--votes", type=int, default=50_000)
+        parser.add_argument("--sentiments", type=int, default=20_000)
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the generated dataset.")
+        parser.add_argument("--tolerance", type=float, default=1.5,
+                            help="Allowed factor over the baseline p95 latency. Query counts allow none.")
+        parser.add_argument("--baselines", default=str(BASELINES), help="JSON file with the budgets.")
+        parser.add_argument("--update", action="store_true", help="Write the measured values as the new budgets.")
+
+    def handle(self, *args, **options):
+        with throwaway_database(), override_settings(CACHES=NO_CACHE):
+            LoadDataGenerator(users=options["users"], questions=options["questions"], votes=options["votes"],
+                              sentiments=options["sentiments"], seed=options["seed"]).generate()
+            question = Question.objects.active().order_by("-trend_score").first()
+            choice_ids = list(question.choice_set.values_list("pk", flat=True))
+            client = Client()
+            client.force_login(question.vote_set.first().user)
+            results = {name: measure_request(send, options["runs"])
+                       for name, send in hot_paths(client, question, choice_ids).items()}
+
+        if options["update"]:
+            with open(options["baselines"], "w") as stream:
+                json.dump(results, stream, indent=2, sort_keys=True)
+                stream.write("\n")
+            self.stdout.write(self.style.SUCCESS(f"Wrote budgets to {options['baselines']}"))
+            baselines = results
+        else:
+            with open(options["baselines"]) as stream:
+                baselines = json.load(stream)
+
+        failures = []
+        self.stdout.write(f"{'page':<14}{'p50 ms':>9}{'p95 ms':>9}{'budget':>9}{'queries':>9}{'budget':>8}")
+        for name, result in results.items():
+            budget = baselines.get(name, {})
+            p95_budget = budget.get("p95_ms", float("inf")) * options["tolerance"]
+            query_budget = budget.get("queries", float("inf"))
+            self.stdout.write(f"{name:<14}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{p95_budget:>9.1f}"
+                              f"{result['queries']:>9}{query_budget:>8}")
+            if result["queries"] > query_budget:
+                failures.append(f"{name} ran {result['queries']} queries, the budget is {query_budget}")
+            if result["p95_ms"] > p95_budget:
+                failures.append(f"{name} p95 is {result['p95_ms']:.1f}ms, the budget is {p95_budget:.1f}ms")
+
+        if failures:
+            raise CommandError("Over budget:\n" + "\n".join(failures))
+        self.stdout.write(self.style.SUCCESS("Every page is within its budget."))
@@ -0,0 +1,111 @@
+import random
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from polls.benchmarks import create_poll, create_users, throwaway_database
+from polls.models import Vote
+
+
+class Command(BaseCommand):
+    help = ("Compare vote throughput and errors of concurrent writers, with readers on the results page, "
+            "between SQLite's defaults and the tuned profile of polls/sqlite.py. Each profile runs on its own "
+            "throwaway test database, your data is not touched.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Number of concurrent voters.")
+        parser.add_argument("--votes", type=int, default=200, help="Votes per voter thread, one user each.")
+        parser.add_argument("--readers", type=int, default=2, help="Threads reading the results page meanwhile.")
+        parser.add_argument("--seed", type=int, default=0, help="Seed for the random choices.")
+
+    def handle(self, *args, **options):
+        results = {}
+        for label, tuned in (("default", False), ("tuned", True)):
+            with override_settings(POLLS_SQLITE_TUNING=tuned), throwaway_database():
+                with connection.cursor() as cursor:
+                    cursor.execute("PRAGMA journal_mode")
+                    journal_mode = cursor.fetchone()[0]
+                results[label] = self.run_votes(label, options)
+                self.stdout.write(f"  journal_mode={journal_mode}")
+
+        default, tuned = results["default"], results["tuned"]
+        self.stdout.write(self.style.SUCCESS(
+            f"tuned profile: {tuned / default:.1f}x the votes per second of the defaults" if default
+            else "tuned profile: the defaults stored no votes"
+        ))
+
+    def run_votes(self, label, options):
+        """Vote from concurrent clients while others read, return stored votes per second."""
+        question, choices = create_poll(label)
+        users = create_users(label, options["threads"] * options["votes"])
+        vote_url = reverse("polls:vote", args=(question.id,))
+        results_url = reverse("polls:results", args=(question.id,))
+        rng = random.Random(options["seed"])
+
+        # * Log in before the clock starts, only the requests are timed.
+        requests = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            # * One in four requests is an up/down vote, the rest pick a choice.
+            if rng.random() < 0.25:
+                requests.append((client, reverse(rng.choice(("polls:upvote", "polls:downvote")),
+                                                 args=(question.id,)), {}))
+            else:
+                requests.append((client, vote_url, {"choice": rng.choice(choices).id}))
+
+        errors = Counter()
+        reads = []
+        writing = threading.Event()
+        writing.set()
+
+        def writer(batch):
+            try:
+                for client, url, data in batch:
+                    try:
+                        client.post(url, data)
+                    except Exception as error:
+                        errors[str(error)] += 1
+            finally:
+                connections.close_all()
+
+        def reader():
+            client, count = Client(), 0
+            try:
+                while writing.is_set():
+                    try:
+                        client.get(results_url)
+                        count += 1
+                    except Exception as error:
+                        errors[f"read: {error}"] += 1
+            finally:
+                reads.append(count)
+                connections.close_all()
+
+        batches = [requests[i::options["threads"]] for i in range(options["threads"])]
+        writers = [threading.Thread(target=writer, args=(batch,)) for batch in batches]
+        readers = [threading.Thread(target=reader) for _ in range(options["readers"])]
+        start = time.perf_counter()
+        for thread in writers + readers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        writing.clear()
+        for thread in readers:
+            thread.join()
+
+        stored = Vote.objects.filter(question=question).count() + question.sentimentvote_set.count()
+        rate = stored / elapsed
+        self.stdout.write(
+            f"{label}: {stored}/{len(requests)} votes stored in {elapsed:.2f}s, {rate:.0f} votes/s, "
+            f"{sum(reads) / elapsed:.0f} reads/s, {sum(errors.values())} error(s)"
+        )
+        for message, count in errors.most_common(3):
+            self.stdout.write(f"  {count} x {message}")
+        return rate
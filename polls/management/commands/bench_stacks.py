@@ -0,0 +1,100 @@
+import asyncio
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from polls.benchmarks import create_poll, create_users, throwaway_database
+
+
+class Command(BaseCommand):
+    help = ("Compare requests per second of the WSGI stack with the sync views and the ASGI stack with the "
+            "async views, at the same number of concurrent connections. Requests go through Django's WSGI "
+            "and ASGI handlers in-process, on a throwaway test database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=16, help="Number of concurrent connections.")
+        parser.add_argument("--visits", type=int, default=25,
+                            help="Visits per connection, a visit is detail, vote, results and up/down vote.")
+        parser.add_argument("--seed", type=int, default=0, help="Seed for the random choices.")
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            wsgi = self.run_stack("wsgi", Client, self.run_wsgi, options)
+            with override_settings(ROOT_URLCONF="mysite.async_urls"):
+                asgi = self.run_stack("asgi", AsyncClient, self.run_asgi, options)
+
+        self.stdout.write(self.style.SUCCESS(f"ASGI is {asgi / wsgi:.2f}x the WSGI stack"))
+
+    def run_stack(self, label, client_class, runner, options):
+        """Log a client in per connection, run the visits and return requests per second."""
+        question, choices = create_poll(label)
+        rng = random.Random(options["seed"])
+        plans = []
+        for user in create_users(label, options["connections"]):
+            client = client_class()
+            client.force_login(user)
+            plans.append((client, self.visits(question, choices, rng, options["visits"])))
+
+        errors = []
+        start = time.perf_counter()
+        runner(plans, errors)
+        elapsed = time.perf_counter() - start
+
+        total = sum(len(requests) for _, requests in plans)
+        rate = total / elapsed
+        self.stdout.write(f"{label}: {total} requests in {elapsed:.2f}s, {rate:.0f} requests/s, "
+                          f"{len(errors)} failed")
+        return rate
+
+    def visits(self, question, choices, rng, count):
+        """Return the (method, url, data) requests of `count` visits to `question`."""
+        requests = []
+        for _ in range(count):
+            requests += [
+                ("get", reverse("polls:detail", args=(question.id,)), None),
+                ("post", reverse("polls:vote", args=(question.id,)), {"choice": rng.choice(choices).id}),
+                ("get", reverse("polls:results", args=(question.id,)), None),
+                ("post", reverse(rng.choice(["polls:upvote", "polls:downvote"]), args=(question.id,)), None),
+            ]
+        return requests
+
+    def run_wsgi(self, plans, errors):
+        """One thread per connection, as a threaded WSGI server would run them."""
+        def connection(client, requests):
+            try:
+                for method, url, data in requests:
+                    try:
+                        response = getattr(client, method)(url, data)
+                        if response.status_code >= 400:
+                            errors.append(response.status_code)
+                    except Exception as error:
+                        errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=connection, args=plan) for plan in plans]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run_asgi(self, plans, errors):
+        """One task per connection on a single event loop, as an ASGI server would run them."""
+        async def connection(client, requests):
+            for method, url, data in requests:
+                try:
+                    response = await getattr(client, method)(url, data)
+                    if response.status_code >= 400:
+                        errors.append(response.status_code)
+                except Exception as error:
+                    errors.append(error)
+
+        async def main():
+            await asyncio.gather(*(connection(client, requests) for client, requests in plans))
+
+        asyncio.run(main())
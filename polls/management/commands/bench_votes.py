@@ -0,0 +1,77 @@
+import os
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from polls.benchmarks import create_poll, create_users, throwaway_database
+from polls.models import Vote
+from polls.vote_buffer import get_buffer
+
+
+class Command(BaseCommand):
+    help = ("Compare votes per second through the vote view with and without the write-behind buffer. "
+            "Runs against a throwaway test database, your data is not touched.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--votes", type=int, default=2000, help="Number of votes per run (one user each).")
+        parser.add_argument("--threads", type=int, default=8, help="Number of concurrent clients.")
+        parser.add_argument("--seed", type=int, default=0, help="Seed for the random choices.")
+
+    def handle(self, *args, **options):
+        with throwaway_database() as workdir:
+            sync = self.run_votes("synchronous", options)
+            with override_settings(POLLS_VOTE_WRITE_BEHIND=True,
+                                   POLLS_VOTE_BUFFER_DIR=os.path.join(workdir, "journal")):
+                buffered = self.run_votes("write-behind", options)
+
+        self.stdout.write(self.style.SUCCESS(f"write-behind is {buffered / sync:.1f}x the synchronous path"))
+
+    def run_votes(self, label, options):
+        """Cast one vote per user from concurrent clients, return votes per second."""
+        question, choices = create_poll(label)
+        users = create_users(label, options["votes"])
+        url = reverse("polls:vote", args=(question.id,))
+        rng = random.Random(options["seed"])
+
+        # * Log in before the clock starts, only the vote requests are timed.
+        requests = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            requests.append((client, rng.choice(choices).id))
+
+        errors = []
+        batches = [requests[i::options["threads"]] for i in range(options["threads"])]
+
+        def worker(batch):
+            try:
+                for client, choice_id in batch:
+                    try:
+                        client.post(url, {"choice": choice_id})
+                    except Exception as error:
+                        errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(batch,)) for batch in batches]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if label == "write-behind":
+            get_buffer().flush()
+        elapsed = time.perf_counter() - start
+
+        stored = Vote.objects.filter(question=question).count()
+        rate = stored / elapsed
+        self.stdout.write(
+            f"{label}: {stored}/{len(users)} votes stored in {elapsed:.2f}s, "
+            f"{rate:.0f} votes/s, {len(errors)} failed request(s)"
+        )
+        return rate
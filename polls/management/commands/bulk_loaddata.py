@@ -0,0 +1,37 @@
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, IntegrityError
+
+from polls.bulk_loader import BulkLoader
+
+
+class Command(BaseCommand):
+    help = ("Load JSON fixtures such as data/*.json like loaddata, but streamed and written in batches with "
+            "bulk_create. Meant for large dumps, see polls/bulk_loader.py.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("fixtures", nargs="+", help="Paths of the JSON fixture files, loaded in this order.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Objects per bulk insert and model.")
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS, help="Database to load into.")
+
+    def handle(self, *args, **options):
+        loader = BulkLoader(batch_size=options["batch_size"], using=options["database"], progress=self.report)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                streams = [stack.enter_context(open(path, encoding="utf-8")) for path in options["fixtures"]]
+                loader.load(streams)
+        except (OSError, ValueError, LookupError, IntegrityError, DatabaseError) as error:
+            raise CommandError(f"Nothing was loaded: {error}")
+        elapsed = time.perf_counter() - started
+
+        for label, count in sorted(loader.counts.items()):
+            self.stdout.write(f"  {label}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {loader.loaded} object(s) in {elapsed:.2f}s, {loader.loaded / elapsed:.0f} objects/s."
+        ))
+
+    def report(self, loader, label, count):
+        self.stdout.write(f"{label}: +{count}, {loader.loaded} object(s) so far, {loader.rate:.0f} objects/s")
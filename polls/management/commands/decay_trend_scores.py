@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls import trending
+from polls.models import Question
+
+
+class Command(BaseCommand):
+    help = "Decay every stored trend score to the current time with one UPDATE. Run it periodically, e.g. from cron."
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        updated = Question.objects.update(**trending.decayed_updates())
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Decayed {updated} trend score(s) in {elapsed:.3f}s."))
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.load_data import LoadDataGenerator
+
+
+class Command(BaseCommand):
+    help = ("Fill the database with synthetic users, tagged polls, votes and up/down votes for benchmarks. "
+            "Votes go to a few hot polls following a Zipf distribution, and the same seed gives the same data. "
+            "See polls/load_data.py.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10_000, help="Number of users.")
+        parser.add_argument("--questions", type=int, default=1_000, help="Number of polls.")
+        parser.add_argument("--votes", type=int, default=100_000,
+                            help="Number of votes, polls hold at most one vote per user.")
+        parser.add_argument("--sentiments", type=int, default=50_000, help="Number of up/down votes.")
+        parser.add_argument("--tags", type=int, default=50, help="Number of tags.")
+        parser.add_argument("--choices", type=int, default=4, help="Largest number of choices per poll.")
+        parser.add_argument("--skew", type=float, default=1.1,
+                            help="Zipf exponent of the vote spread, 0 spreads votes evenly.")
+        parser.add_argument("--seed", type=int, default=0, help="Seed for every random draw.")
+        parser.add_argument("--label", help='Prefix of the usernames and tag texts, "load-<seed>" by default.')
+        parser.add_argument("--batch-size", type=int, default=10_000, help="Rows per bulk insert.")
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        generator = LoadDataGenerator(
+            users=options["users"], questions=options["questions"], votes=options["votes"],
+            sentiments=options["sentiments"], tags=options["tags"], choices=options["choices"],
+            skew=options["skew"], seed=options["seed"], batch_size=options["batch_size"], progress=self.report,
+            label=options["label"],
+        )
+        started = time.perf_counter()
+        try:
+            counts = generator.generate()
+        except ValueError as error:
+            raise CommandError(error) from error
+        elapsed = time.perf_counter() - started
+
+        rows = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {rows} row(s) in {elapsed:.2f}s, {rows / elapsed:.0f} rows/s: "
+            + ", ".join(f"{count} {name}" for name, count in counts.items())
+        ))
+        for name, dropped in generator.dropped.items():
+            if dropped:
+                self.stdout.write(self.style.WARNING(
+                    f"Skipped {dropped} of --{name} {options[name]}: a poll holds at most one per user, "
+                    f"raise --users ({options['users']}) to generate them all."
+                ))
+
+    def report(self, name, count):
+        if self.verbosity > 1:
+            self.stdout.write(f"{name}: {count}")
@@ -0,0 +1,43 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.importer import CSV_SEPARATOR, PollImporter, read_csv, read_jsonl
+
+READERS = {"jsonl": read_jsonl, "csv": read_csv}
+
+
+class Command(BaseCommand):
+    help = ("Import polls with their choices and tags from a JSON lines or CSV file, in batches. "
+            f"CSV files have question_text, pub_date, end_date, short_description, long_description, choices and "
+            f"tags columns, with choices and tags separated by '{CSV_SEPARATOR}'. See polls/importer.py.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import.")
+        parser.add_argument("--format", choices=sorted(READERS),
+                            help="File format, guessed from the file extension by default.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Polls per transaction.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or os.path.splitext(path)[1].lstrip(".").lower()
+        if file_format == "json":
+            file_format = "jsonl"
+        if file_format not in READERS:
+            raise CommandError(f"Cannot tell the format of {path}, pass --format.")
+
+        importer = PollImporter(batch_size=options["batch_size"])
+        started = time.perf_counter()
+        try:
+            with open(path, newline="", encoding="utf-8") as stream:
+                importer.import_records(READERS[file_format](stream))
+        except (OSError, ValueError) as error:
+            raise CommandError(f"{error}. {importer.polls} poll(s) were imported before it.")
+        elapsed = time.perf_counter() - started
+
+        rate = importer.polls / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {importer.polls} poll(s), {importer.choices} choice(s) and {importer.new_tags} new tag(s) "
+            f"in {elapsed:.2f}s, {rate:.0f} polls/s."
+        ))
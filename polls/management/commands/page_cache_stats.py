@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from polls import page_cache
+
+
+class Command(BaseCommand):
+    help = "Show the hit and miss counters of the index and search page cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Reset the counters after printing them.")
+
+    def handle(self, *args, **options):
+        stats = page_cache.get_stats()
+        total = stats["hits"] + stats["misses"]
+        ratio = stats["hits"] / total if total else 0
+        self.stdout.write(f"hits: {stats['hits']}, misses: {stats['misses']}, hit ratio: {ratio:.1%}, "
+                          f"catalog version: {page_cache.get_catalog_version()}")
+        if options["reset"]:
+            page_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
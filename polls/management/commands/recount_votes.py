@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from polls import search
+from polls.counters import (find_choice_count_drift, find_sentiment_count_drift,
+                            rebuild_choice_counts, rebuild_sentiment_counts)
+
+
+class Command(BaseCommand):
+    help = "Rebuild the stored vote counters and up/down tallies from the vote tables and report any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report counters that disagree with the vote tables, exit with an error if any do.",
+        )
+
+    def handle(self, *args, **options):
+        choice_drift = list(find_choice_count_drift())
+        for choice in choice_drift:
+            self.stdout.write(
+                f"Question {choice.question_id} choice {choice.pk} ({choice.choice_text}): "
+                f"stored {choice.vote_count}, actual {choice.actual_votes}"
+            )
+
+        sentiment_drift = list(find_sentiment_count_drift())
+        for question in sentiment_drift:
+            self.stdout.write(
+                f"Question {question.pk} ({question.question_text}): "
+                f"stored {question.up_votes} up / {question.down_votes} down, "
+                f"actual {question.actual_up} up / {question.actual_down} down"
+            )
+
+        drift = len(choice_drift) + len(sentiment_drift)
+        if options["check"]:
+            if drift:
+                raise CommandError(f"{drift} counter(s) out of date, run recount_votes to fix them.")
+            self.stdout.write(self.style.SUCCESS("All counters match the vote tables."))
+            return
+
+        with transaction.atomic():
+            choices = rebuild_choice_counts()
+            questions = rebuild_sentiment_counts()
+            # * Cheap next to the counters, and it repairs an index that missed a write.
+            search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {choices} choice counter(s) and {questions} up/down tally(s), fixed {drift}, "
+            "and the search index."
+        ))
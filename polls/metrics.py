@@ -0,0 +1,254 @@
+"""
+Prometheus metrics that add up over every worker process, see the /metrics view.
+
+Gunicorn and uWSGI run several processes, and a scrape only reaches one of
+them, so counters kept in memory would report that process alone. Here
+every process writes its values to its own memory-mapped file in
+POLLS_METRICS_DIR, named after the process id, and a scrape reads and sums
+the files of every process, including the ones that have exited. Delete the
+directory when the server is (re)started to start from zero.
+
+A file is a used-size header followed by entries of a length-prefixed JSON
+key, [family, sample suffix, labels], and a float64 value. Only its own
+process writes a file: new entries are written before the header is moved
+past them, so a reader never sees a half-written key, and an 8-byte aligned
+value is updated in place. Increments take a per-process lock, the values
+are read and written without system calls.
+
+Histograms are stored cumulatively, so observing one duration adds to every
+bucket at or above it.
+
+Metrics are off until POLLS_METRICS_DIR is set. The /metrics view answers
+staff users and the addresses in POLLS_METRICS_ALLOWED_IPS, by default only
+the server itself, where the Prometheus agent usually runs.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# * Seconds, the Prometheus client defaults.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+SUFFIXES = ("", "_bucket", "_sum", "_count")
+INITIAL_SIZE = 64 * 1024
+
+HEADER = struct.Struct("<Q")
+KEY_LENGTH = struct.Struct("<I")
+VALUE = struct.Struct("<d")
+
+FAMILIES = {
+    "polls_votes_cast_total": ("counter", "Votes cast on a poll for the first time."),
+    "polls_votes_changed_total": ("counter", "Votes moved to another choice."),
+    "polls_sentiment_votes_total": ("counter", "Up and down votes recorded, by type."),
+    "polls_polls_created_total": ("counter", "Polls created, by the form or an import."),
+    "polls_request_duration_seconds": ("histogram", "Request latency by URL name."),
+    "polls_db_queries_total": ("counter", "SQL queries run by requests, by URL name."),
+    "polls_db_query_seconds_total": ("counter", "Time spent in SQL queries by requests, by URL name."),
+    "polls_page_cache_requests_total": ("counter", "Page cache lookups of the poll listings, by result."),
+    "polls_log_records_dropped_total": ("counter", "Log records below WARNING dropped by a full log queue."),
+}
+
+
+def _entry_size(encoded):
+    """Bytes taken by an entry: key length, key padded to 8 bytes, value."""
+    return (KEY_LENGTH.size + len(encoded) + 7) // 8 * 8 + VALUE.size
+
+
+def read_entries(data):
+    """Yield (JSON key, value offset) for every complete entry of a metrics file's bytes."""
+    used = min(HEADER.unpack_from(data)[0], len(data)) if len(data) >= HEADER.size else 0
+    position = HEADER.size
+    while position < used:
+        (length,) = KEY_LENGTH.unpack_from(data, position)
+        key = data[position + KEY_LENGTH.size:position + KEY_LENGTH.size + length]
+        size = _entry_size(key)
+        yield key.decode(), position + size - VALUE.size
+        position += size
+
+
+class MetricsFile:
+    """The values of one process, in a memory-mapped file only that process writes."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.pid = os.getpid()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a+b")
+        if os.fstat(self._file.fileno()).st_size < HEADER.size:
+            self._file.truncate(INITIAL_SIZE)
+        self._map = mmap.mmap(self._file.fileno(), os.fstat(self._file.fileno()).st_size)
+        self._used = max(HEADER.unpack_from(self._map)[0], HEADER.size)
+        # * A file left by an earlier process with our pid is carried on.
+        self._offsets = dict(read_entries(self._map))
+        self._lock = threading.Lock()
+
+    def _offset(self, key):
+        offset = self._offsets.get(key)
+        if offset is not None:
+            return offset
+        encoded = key.encode()
+        size = _entry_size(encoded)
+        if self._used + size > len(self._map):
+            self._grow(self._used + size)
+        KEY_LENGTH.pack_into(self._map, self._used, len(encoded))
+        self._map[self._used + KEY_LENGTH.size:self._used + KEY_LENGTH.size + len(encoded)] = encoded
+        offset = self._used + size - VALUE.size
+        VALUE.pack_into(self._map, offset, 0.0)
+        # * Published last, readers stop at the old size until the entry is whole.
+        self._used += size
+        HEADER.pack_into(self._map, 0, self._used)
+        self._offsets[key] = offset
+        return offset
+
+    def _grow(self, needed):
+        size = len(self._map)
+        while size < needed:
+            size *= 2
+        self._map.close()
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+
+    def add(self, amounts):
+        """Add to several values at once, `amounts` is an iterable of (JSON key, amount)."""
+        with self._lock:
+            for key, amount in amounts:
+                offset = self._offset(key)
+                VALUE.pack_into(self._map, offset, VALUE.unpack_from(self._map, offset)[0] + amount)
+
+    def close(self):
+        with self._lock:
+            self._map.close()
+            self._file.close()
+
+
+def get_directory():
+    """Return the metrics directory, None when metrics are off."""
+    return getattr(settings, "POLLS_METRICS_DIR", None) or None
+
+
+def can_scrape(request):
+    """
+    Return True when `request` may read the metrics.
+
+    The peer address is used, not X-Forwarded-For, which any client can set.
+    """
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    return request.META.get("REMOTE_ADDR") in getattr(settings, "POLLS_METRICS_ALLOWED_IPS", ())
+
+
+_file = None
+_file_lock = threading.Lock()
+
+
+def get_file():
+    """Return the metrics file of this process, None when metrics are off."""
+    global _file
+    directory = get_directory()
+    if directory is None:
+        return None
+    # * A worker forked from a master that already had a file needs its own.
+    if _file is None or _file.pid != os.getpid():
+        with _file_lock:
+            if _file is None or _file.pid != os.getpid():
+                _file = MetricsFile(Path(directory) / f"metrics-{os.getpid()}.db")
+    return _file
+
+
+@receiver(setting_changed)
+def _reset_file(setting, **kwargs):
+    """Drop the file when the tests change the directory."""
+    global _file
+    if setting == "POLLS_METRICS_DIR" and _file is not None:
+        _file.close()
+        _file = None
+
+
+def make_key(family, suffix, labels):
+    """Return the JSON key of a sample, `labels` is a dict."""
+    return json.dumps([family, suffix, sorted([name, str(value)] for name, value in labels.items())])
+
+
+def inc(family, amount=1, **labels):
+    """Add `amount` to a counter."""
+    metrics_file = get_file()
+    if metrics_file is not None:
+        metrics_file.add([(make_key(family, "", labels), amount)])
+
+
+def observe(family, value, **labels):
+    """Record one value, e.g. a duration in seconds, in a histogram."""
+    metrics_file = get_file()
+    if metrics_file is None:
+        return
+    # * Every bucket is written, so the buckets below the first duration show up as 0.
+    amounts = [(make_key(family, "_bucket", {**labels, "le": _format_bound(bound)}), int(value <= bound))
+               for bound in BUCKETS]
+    amounts += [(make_key(family, "_sum", labels), value), (make_key(family, "_count", labels), 1)]
+    metrics_file.add(amounts)
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def collect(directory=None):
+    """Return {(family, suffix, labels): value} summed over the files of every process."""
+    directory = directory or get_directory()
+    values = defaultdict(float)
+    if directory is None or not Path(directory).is_dir():
+        return values
+    for path in Path(directory).glob("metrics-*.db"):
+        data = path.read_bytes()
+        for key, offset in read_entries(data):
+            family, suffix, labels = json.loads(key)
+            values[(family, suffix, tuple(map(tuple, labels)))] += VALUE.unpack_from(data, offset)[0]
+    return values
+
+
+def _sort_key(item):
+    (family, suffix, labels), value = item
+    bound = dict(labels).get("le")
+    return ([label for label in labels if label[0] != "le"], SUFFIXES.index(suffix),
+            float(bound) if bound else 0.0)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def render(values=None):
+    """Return the metrics in the Prometheus text format."""
+    values = collect() if values is None else values
+    by_family = defaultdict(list)
+    for item in values.items():
+        by_family[item[0][0]].append(item)
+
+    lines = []
+    for family, (kind, help_text) in FAMILIES.items():
+        lines += [f"# HELP {family} {help_text}", f"# TYPE {family} {kind}"]
+        for (_, suffix, labels), value in sorted(by_family[family], key=_sort_key):
+            label_text = ",".join(f'{name}="{_escape(label)}"' for name, label in labels)
+            lines.append(f"{family}{suffix}{{{label_text}}} {_format_value(value)}" if label_text
+                         else f"{family}{suffix} {_format_value(value)}")
+
+    # * Derived here, a ratio cannot be summed over processes.
+    hits = values.get(("polls_page_cache_requests_total", "", (("result", "hit"),)), 0.0)
+    misses = values.get(("polls_page_cache_requests_total", "", (("result", "miss"),)), 0.0)
+    lines += ["# HELP polls_page_cache_hit_ratio Share of page cache lookups served from the cache.",
+              "# TYPE polls_page_cache_hit_ratio gauge",
+              f"polls_page_cache_hit_ratio {_format_value(hits / (hits + misses) if hits + misses else 0.0)}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:52
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_sentiment_tallies(apps, schema_editor):
+    """Seed the new tallies from the SentimentVote rows that already exist."""
+    Question = apps.get_model('polls', 'Question')
+    SentimentVote = apps.get_model('polls', 'SentimentVote')
+
+    def tally(vote_types):
+        counts = (SentimentVote.objects.filter(question=OuterRef('pk'), vote_types=vote_types)
+                  .values('question').annotate(total=Count('pk')).values('total'))
+        return Coalesce(Subquery(counts), Value(0))
+
+    Question.objects.update(up_votes=tally(True), down_votes=tally(False))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0016_choice_vote_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='down_votes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='up_votes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_sentiment_tallies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:53
+
+from django.conf import settings
+from django.db import migrations, models
+import time
+
+# * Frozen from polls/trending.py as of this migration, later changes must not rewrite history.
+TREND_HALF_LIFE = getattr(settings, "POLLS_TREND_HALF_LIFE", 7 * 24 * 60 * 60)
+FRESH_SCORE = 100.0
+UPVOTE_WEIGHT = 20.0
+DOWNVOTE_WEIGHT = -20.0
+
+
+def initial_score(pub_date, now):
+    return FRESH_SCORE * 0.5 ** (max(now - pub_date.timestamp(), 0.0) / TREND_HALF_LIFE)
+
+
+def rebuild_trend_scores(apps, schema_editor):
+    """
+    Replace the scores frozen at creation time with ones from the trend engine:
+    decayed freshness plus the weight of the current up and down tallies.
+    """
+    Question = apps.get_model('polls', 'Question')
+    now = time.time()
+    batch = []
+    for question in Question.objects.only('pk', 'pub_date', 'up_votes', 'down_votes').iterator():
+        question.trend_score = (initial_score(question.pub_date, now)
+                                + question.up_votes * UPVOTE_WEIGHT
+                                + question.down_votes * DOWNVOTE_WEIGHT)
+        question.trend_updated = max(now, question.pub_date.timestamp())
+        batch.append(question)
+        if len(batch) >= 1000:
+            Question.objects.bulk_update(batch, ['trend_score', 'trend_updated'])
+            batch = []
+    Question.objects.bulk_update(batch, ['trend_score', 'trend_updated'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0017_question_up_votes_down_votes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='trend_updated',
+            field=models.FloatField(default=time.time, editable=False),
+        ),
+        migrations.RunPython(rebuild_trend_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:55
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_votes(apps, schema_editor):
+    """
+    Keep only the latest vote of each user on each question so the unique
+    constraint can be created, then rebuild the choice counters if needed.
+    """
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    duplicates = (Vote.objects.values('question', 'user')
+                  .annotate(total=Count('pk'), latest=Max('pk'))
+                  .filter(total__gt=1))
+    removed = 0
+    for row in duplicates.iterator():
+        removed += (Vote.objects.filter(question=row['question'], user=row['user'])
+                    .exclude(pk=row['latest']).delete()[0])
+    if removed:
+        counts = Vote.objects.filter(choice=OuterRef('pk')).values('choice').annotate(total=Count('pk')).values('total')
+        Choice.objects.update(vote_count=Coalesce(Subquery(counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0018_question_trend_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_votes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['pub_date', 'end_date'], name='polls_question_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('trend_score__gte', 100.0)), fields=['-trend_score'], name='polls_question_trend_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('question', 'user'), name='polls_vote_unique_question_user'),
+        ),
+    ]
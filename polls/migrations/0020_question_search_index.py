@@ -0,0 +1,86 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+import polls.search
+
+TAG_TEXT = (
+    "(SELECT COALESCE(group_concat(t.tag_text, ' '), '') FROM polls_tag t "
+    "JOIN polls_question_tags qt ON qt.tag_id = t.id WHERE qt.question_id = {question_id})"
+)
+
+CREATE_FTS = [
+    # * bm25 weights: question_text, short_description, long_description, tags.
+    "CREATE VIRTUAL TABLE polls_question_fts USING fts5("
+    "question_text, short_description, long_description, tags, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO polls_question_fts(polls_question_fts, rank) VALUES ('rank', 'bm25(10.0, 4.0, 1.0, 6.0)')",
+    "INSERT INTO polls_question_fts(rowid, question_text, short_description, long_description, tags) "
+    "SELECT q.id, q.question_text, q.short_description, q.long_description, "
+    + TAG_TEXT.format(question_id="q.id") + " FROM polls_question q",
+    "CREATE TRIGGER polls_question_fts_insert AFTER INSERT ON polls_question BEGIN "
+    "INSERT INTO polls_question_fts(rowid, question_text, short_description, long_description, tags) "
+    "VALUES (new.id, new.question_text, new.short_description, new.long_description, ''); END",
+    # * Only text columns, so vote counter and trend updates don't rewrite the index.
+    "CREATE TRIGGER polls_question_fts_update AFTER UPDATE OF question_text, short_description, long_description "
+    "ON polls_question BEGIN "
+    "UPDATE polls_question_fts SET question_text = new.question_text, short_description = new.short_description, "
+    "long_description = new.long_description WHERE rowid = new.id; END",
+    "CREATE TRIGGER polls_question_fts_delete AFTER DELETE ON polls_question BEGIN "
+    "DELETE FROM polls_question_fts WHERE rowid = old.id; END",
+    "CREATE TRIGGER polls_question_tags_fts_insert AFTER INSERT ON polls_question_tags BEGIN "
+    "UPDATE polls_question_fts SET tags = " + TAG_TEXT.format(question_id="new.question_id")
+    + " WHERE rowid = new.question_id; END",
+    "CREATE TRIGGER polls_question_tags_fts_delete AFTER DELETE ON polls_question_tags BEGIN "
+    "UPDATE polls_question_fts SET tags = " + TAG_TEXT.format(question_id="old.question_id")
+    + " WHERE rowid = old.question_id; END",
+    "CREATE TRIGGER polls_tag_fts_update AFTER UPDATE OF tag_text ON polls_tag BEGIN "
+    "UPDATE polls_question_fts SET tags = " + TAG_TEXT.format(question_id="polls_question_fts.rowid")
+    + " WHERE rowid IN (SELECT question_id FROM polls_question_tags WHERE tag_id = new.id); END",
+]
+
+DROP_FTS = [
+    "DROP TRIGGER IF EXISTS polls_tag_fts_update",
+    "DROP TRIGGER IF EXISTS polls_question_tags_fts_delete",
+    "DROP TRIGGER IF EXISTS polls_question_tags_fts_insert",
+    "DROP TRIGGER IF EXISTS polls_question_fts_delete",
+    "DROP TRIGGER IF EXISTS polls_question_fts_update",
+    "DROP TRIGGER IF EXISTS polls_question_fts_insert",
+    "DROP TABLE IF EXISTS polls_question_fts",
+]
+
+
+def run_on_sqlite(statements):
+    """The search table is SQLite only, other backends fall back to icontains."""
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement, params=None)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0019_vote_unique_question_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionSearchIndex',
+            fields=[
+                ('question', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='polls.question')),
+                ('question_text', models.TextField()),
+                ('short_description', models.TextField()),
+                ('long_description', models.TextField()),
+                ('tags', models.TextField()),
+                ('document', polls.search.FullTextField(db_column='polls_question_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'polls_question_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(run_on_sqlite(CREATE_FTS), run_on_sqlite(DROP_FTS)),
+    ]
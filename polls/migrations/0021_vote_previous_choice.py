@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0020_question_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='previous_choice',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='polls.choice'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0021_vote_previous_choice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sentimentvote',
+            name='previous_vote_types',
+            field=models.BooleanField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:18
+
+from django.db import migrations, models
+
+# * SQLite adds the column by rebuilding polls_question, which drops the triggers
+# * that keep polls_question_fts in sync (see 0020), so they are created again.
+QUESTION_FTS_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS polls_question_fts_insert",
+    "DROP TRIGGER IF EXISTS polls_question_fts_update",
+    "DROP TRIGGER IF EXISTS polls_question_fts_delete",
+    "CREATE TRIGGER polls_question_fts_insert AFTER INSERT ON polls_question BEGIN "
+    "INSERT INTO polls_question_fts(rowid, question_text, short_description, long_description, tags) "
+    "VALUES (new.id, new.question_text, new.short_description, new.long_description, ''); END",
+    "CREATE TRIGGER polls_question_fts_update AFTER UPDATE OF question_text, short_description, long_description "
+    "ON polls_question BEGIN "
+    "UPDATE polls_question_fts SET question_text = new.question_text, short_description = new.short_description, "
+    "long_description = new.long_description WHERE rowid = new.id; END",
+    "CREATE TRIGGER polls_question_fts_delete AFTER DELETE ON polls_question BEGIN "
+    "DELETE FROM polls_question_fts WHERE rowid = old.id; END",
+]
+
+
+def restore_question_fts_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in QUESTION_FTS_TRIGGERS:
+        schema_editor.execute(statement, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0022_sentimentvote_previous_vote_types'),
+    ]
+
+    operations = [
+        # * Runs again after RemoveField when migrating backwards.
+        migrations.RunPython(migrations.RunPython.noop, restore_question_fts_triggers),
+        migrations.AddField(
+            model_name='question',
+            name='stats_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(restore_question_fts_triggers, migrations.RunPython.noop),
+    ]
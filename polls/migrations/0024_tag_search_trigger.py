@@ -0,0 +1,49 @@
+from django.db import migrations
+
+TAG_TEXT = (
+    "(SELECT COALESCE(group_concat(t.tag_text, ' '), '') FROM polls_tag t "
+    "JOIN polls_question_tags qt ON qt.tag_id = t.id WHERE qt.question_id = {question_id})"
+)
+
+# * Fixtures link questions to tags before the tags exist, so the tag text is
+# * filled in when a tag is inserted, and a question picks up links made before it.
+FORWARD = [
+    "DROP TRIGGER IF EXISTS polls_question_fts_insert",
+    "CREATE TRIGGER polls_question_fts_insert AFTER INSERT ON polls_question BEGIN "
+    "INSERT INTO polls_question_fts(rowid, question_text, short_description, long_description, tags) "
+    "VALUES (new.id, new.question_text, new.short_description, new.long_description, "
+    + TAG_TEXT.format(question_id="new.id") + "); END",
+    "CREATE TRIGGER IF NOT EXISTS polls_tag_fts_insert AFTER INSERT ON polls_tag BEGIN "
+    "UPDATE polls_question_fts SET tags = " + TAG_TEXT.format(question_id="polls_question_fts.rowid")
+    + " WHERE rowid IN (SELECT question_id FROM polls_question_tags WHERE tag_id = new.id); END",
+    # * Databases loaded before this migration have empty tag text.
+    "UPDATE polls_question_fts SET tags = " + TAG_TEXT.format(question_id="polls_question_fts.rowid"),
+]
+
+BACKWARD = [
+    "DROP TRIGGER IF EXISTS polls_tag_fts_insert",
+    "DROP TRIGGER IF EXISTS polls_question_fts_insert",
+    "CREATE TRIGGER polls_question_fts_insert AFTER INSERT ON polls_question BEGIN "
+    "INSERT INTO polls_question_fts(rowid, question_text, short_description, long_description, tags) "
+    "VALUES (new.id, new.question_text, new.short_description, new.long_description, ''); END",
+]
+
+
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement, params=None)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0023_question_stats_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(FORWARD), run_on_sqlite(BACKWARD)),
+    ]
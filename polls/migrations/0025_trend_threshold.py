@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 21:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0024_tag_search_trigger'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='question',
+            name='polls_question_trend_idx',
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('trend_score__gte', 50.0)), fields=['-trend_score'], name='polls_question_trend_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.db import migrations, models
+import time
+
+# * Frozen from polls/trending.py as of this migration, later changes must not rewrite history.
+TREND_HALF_LIFE = getattr(settings, "POLLS_TREND_HALF_LIFE", 7 * 24 * 60 * 60)
+FRESH_SCORE = 100.0
+UPVOTE_WEIGHT = 20.0
+DOWNVOTE_WEIGHT = -20.0
+CHOICE_VOTE_WEIGHT = 10.0
+
+
+def initial_score(pub_date, now):
+    return FRESH_SCORE * 0.5 ** (max(now - pub_date.timestamp(), 0.0) / TREND_HALF_LIFE)
+
+
+def rebuild_trend_scores(apps, schema_editor):
+    """
+    Rebuild the scores of 0018 with the weight of the choice votes too, which
+    it left out: decayed freshness plus the up, down and choice votes.
+    """
+    Question = apps.get_model('polls', 'Question')
+    now = time.time()
+    batch = []
+    questions = (Question.objects.only('pk', 'pub_date', 'up_votes', 'down_votes')
+                 .annotate(choice_votes=models.Count('vote')))
+    for question in questions.iterator():
+        question.trend_score = (initial_score(question.pub_date, now)
+                                + question.up_votes * UPVOTE_WEIGHT
+                                + question.down_votes * DOWNVOTE_WEIGHT
+                                + question.choice_votes * CHOICE_VOTE_WEIGHT)
+        question.trend_updated = max(now, question.pub_date.timestamp())
+        batch.append(question)
+        if len(batch) >= 1000:
+            Question.objects.bulk_update(batch, ['trend_score', 'trend_updated'])
+            batch = []
+    Question.objects.bulk_update(batch, ['trend_score', 'trend_updated'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0026_trend_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_trend_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 21:21
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0027_rebuild_trend_scores'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='vote',
+            name='previous_choice',
+        ),
+    ]
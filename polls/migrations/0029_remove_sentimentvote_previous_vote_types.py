@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 21:24
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0028_remove_vote_previous_choice'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='sentimentvote',
+            name='previous_vote_types',
+        ),
+    ]
@@ -9,11 +9,29 @@ Attributes:
     None
 """
 
-from django.db import models, IntegrityError
+import time
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError, connections, models, transaction
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.contrib import admin
 from django.contrib.auth.models import User
 
+from . import trending
+from .search import FullTextField
+from .sqlite import write_transaction
+from .signals import votes_changed
+
+
+def notify_votes_changed(question_ids, using=None):
+    """Send votes_changed for `question_ids` once the current transaction commits."""
+    question_ids = frozenset(question_ids)
+    if question_ids:
+        transaction.on_commit(lambda: votes_changed.send(sender=Question, question_ids=question_ids), using=using)
+
 
 class Tag(models.Model):
     """
@@ -25,6 +43,44 @@ class Tag(models.Model):
         return self.tag_text
 
 
+class QuestionQuerySet(models.QuerySet):
+    """
+    QuerySet with the filters and annotations shared by the poll listings.
+    """
+
+    def active(self, now=None):
+        """
+        Return questions that are published and haven't ended yet.
+        """
+        now = now or timezone.now()
+        return self.filter(
+            models.Q(pub_date__lte=now) & (models.Q(end_date__gte=now) | models.Q(end_date=None))
+        )
+
+    def with_stats(self):
+        """
+        Annotate each question with participant_count so listing templates
+        don't run a COUNT per card. Up and down tallies are stored columns
+        already and need no annotation.
+        """
+        participants = (Vote.objects.filter(question=OuterRef("pk"))
+                        .values("question")
+                        .annotate(total=models.Count("pk"))
+                        .values("total"))
+        return self.annotate(participant_count=Coalesce(Subquery(participants), Value(0)))
+
+    def shift_sentiment(self, up=0, down=0):
+        """
+        Apply a delta to the stored up/down tallies and the trend score with a single UPDATE.
+        """
+        return self.update(
+            up_votes=models.F("up_votes") + up,
+            down_votes=models.F("down_votes") + down,
+            stats_version=models.F("stats_version") + 1,
+            **trending.decayed_updates(weight=up * trending.UPVOTE_WEIGHT + down * trending.DOWNVOTE_WEIGHT),
+        )
+
+
 class Question(models.Model):
     """
     Represents a poll question.
@@ -35,6 +91,11 @@ class Question(models.Model):
         end_date (datetime): The date and time when the question will end.
         long_description (str): The long description of the poll question.
         short_description (str): The short description of the poll question.
+        trend_score (float): Time-decayed activity score, see polls.trending.
+        trend_updated (float): Unix time trend_score was last decayed to.
+        up_votes (int): Stored number of up votes, maintained by SentimentVote.objects.set_sentiment().
+        down_votes (int): Stored number of down votes, maintained by SentimentVote.objects.set_sentiment().
+        stats_version (int): Bumped whenever a vote counter of the question changes, used as ETag.
         up_vote_count (int): The number of up votes the question has received.
         down_vote_count (int): The number of down votes the question has received.
         participant_count (int): The number of participants in the poll.
@@ -46,8 +107,22 @@ class Question(models.Model):
     short_description = models.CharField(max_length=200, default="Cool kids have polls")
     long_description = models.TextField(max_length=2000, default="No description provide for this poll.")
     trend_score = models.FloatField(default=0.0, null=False, blank=False)
+    trend_updated = models.FloatField(default=time.time, editable=False)
+    up_votes = models.PositiveIntegerField(default=0, editable=False)
+    down_votes = models.PositiveIntegerField(default=0, editable=False)
+    stats_version = models.PositiveBigIntegerField(default=0, editable=False)
     tags = models.ManyToManyField(Tag, blank=True)
 
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # * Active-window listings filter on pub_date and end_date and order by pub_date.
+            models.Index(fields=["pub_date", "end_date"], name="polls_question_window_idx"),
+            # * The trending block reads the range above the threshold, see polls.trending.
+            models.Index(fields=["-trend_score"], name="polls_question_trend_idx"),
+        ]
+
     def was_published_recently(self):
         """
         Checks if the question was published recently or not.
@@ -155,86 +230,79 @@ class Question(models.Model):
     def participants(self):
         """
         Calculate the number of participants based on the number of votes.
+        Use the participant_count annotation from with_stats() when present.
         """
+        if hasattr(self, "participant_count"):
+            return self.participant_count
         return self.vote_set.count()
 
-    # ! Most of the code from https://stackoverflow.com/a/70869267
+    def _set_sentiment(self, user, up):
+        """Record the user's up (True) or down (False) vote, return False if it was already that vote."""
+        previous = SentimentVote.objects.set_sentiment(user, self.pk, up)
+        up_delta, down_delta = sentiment_delta(previous, up)
+        self.up_votes += up_delta
+        self.down_votes += down_delta
+        return previous is not up
+
     def upvote(self, user):
-        """create new SentimentVote object that represent upvote (vote_types=True)
+        """create or switch the SentimentVote of user to an upvote (vote_types=True)
         return True if user change the vote or vote for the first time else return False
         """
-        try:
-            self.sentimentvote_set.create(user=user, question=self, vote_types=True)
-            self.save()
-        except IntegrityError:
-            vote = self.sentimentvote_set.filter(user=user)
-            if vote[0].vote_types is False:
-                vote.update(vote_types=True)
-                self.save()
-            else:
-                return False
-        return True
+        return self._set_sentiment(user, True)
 
     def downvote(self, user):
-        """create new SentimentVote object that represent downvote (vote_types=False)
+        """create or switch the SentimentVote of user to a downvote (vote_types=False)
         return True if user change the vote or vote for the first time else return False
         """
-        try:
-            self.sentimentvote_set.create(user=user, question=self, vote_types=False)
-            self.save()
-        except IntegrityError:
-            vote = self.sentimentvote_set.filter(user=user)
-            if vote[0].vote_types is True:
-                vote.update(vote_types=False)
-                self.save()
-            else:
-                return False
-        return True
+        return self._set_sentiment(user, False)
 
     @property
     def up_vote_count(self):
-        """Count up vote of Question"""
-        return self.sentimentvote_set.filter(question=self, vote_types=True).count()
+        """Return the stored up vote tally of Question"""
+        return self.up_votes
 
     @property
     def down_vote_count(self):
-        """Count down vote of Question"""
-        return self.sentimentvote_set.filter(question=self, vote_types=False).count()
-
-    def trending_score(self, up=None, down=None):
-        """Return trend score base on the criteria below"""
-        published_date_duration = timezone.now() - self.pub_date
-        score = 0
-
-        if (published_date_duration.seconds < 259200):  # Second unit
-            score += 100
-        elif (published_date_duration.seconds < 604800):
-            score += 75
-        elif (published_date_duration.seconds < 2592000):
-            score += 50
-        else:
-            score += 25
+        """Return the stored down vote tally of Question"""
+        return self.down_votes
 
+    def trending_score(self, up=None, down=None, votes=None, now=None):
+        """
+        Return the trend score rebuilt from scratch: the decayed freshness of
+        the poll at `now` plus the weight of its up, down and choice votes.
+        """
         if (up is None) and (down is None):
-            score += ((self.up_vote_count/5) - (self.down_vote_count/5)) * 100
-        else:
-            score += ((up/5) - (down/5)) * 100
-
-        return score
+            up, down = self.up_vote_count, self.down_vote_count
+        if votes is None:
+            votes = self.participants
+        return (trending.initial_score(self.pub_date, now)
+                + up * trending.UPVOTE_WEIGHT + down * trending.DOWNVOTE_WEIGHT
+                + votes * trending.CHOICE_VOTE_WEIGHT)
 
     def get_tags(self, *args, **kwargs):
         return "-".join([tag.tag_text for tag in self.tags.all()])
 
+    def start_trend(self, now=None):
+        """Give a new question its fresh trend score, also used by bulk imports that skip save()."""
+        now = time.time() if now is None else now
+        self.trend_score = trending.initial_score(self.pub_date, now)
+        # * A poll scheduled for later keeps its fresh score until it opens.
+        self.trend_updated = max(now, self.pub_date.timestamp())
+
     def save(self, *args, **kwargs):
         """Modify save method of Question object"""
         # to-be-added instance
         # * https://github.com/django/django/blob/866122690dbe233c054d06f6afbc2f3cc6aea2f2/django/db/models/base.py#L447
         if self._state.adding:
-            try:
-                self.trend_score = self.trending_score()
-            except ValueError:
-                self.trend_score = self.trending_score(up=0, down=0)
+            self.start_trend()
+        else:
+            # * An edit makes the cached card and results ETag of this poll stale, bump in SQL so no vote is lost.
+            self.stats_version = models.F("stats_version") + 1
+            if kwargs.get("update_fields"):
+                kwargs["update_fields"] = {*kwargs["update_fields"], "stats_version"}
         super(Question, self).save(*args, **kwargs)
+        if isinstance(self.stats_version, models.Expression):
+            self.refresh_from_db(fields=["stats_version"])
 
 
 class Choice(models.Model):
@@ -244,15 +312,18 @@ class Choice(models.Model):
     Attributes:
         question (Question): The poll question to which the choice belongs.
         choice_text (str): The text of the choice.
+        vote_count (int): Stored number of votes, maintained when users vote.
         votes (int): The number of votes the choice has received.
     """
 
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
+    vote_count = models.PositiveIntegerField(default=0, editable=False)
 
     @property
     def votes(self):
-        return self.vote_set.count()
+        """Return the stored vote counter instead of counting Vote rows."""
+        return self.vote_count
 
     def __str__(self):
         """
@@ -261,6 +332,110 @@ class Choice(models.Model):
         return f"{self.choice_text} get ({self.votes})"
 
 
+CastResult = namedtuple("CastResult", ["vote_id", "created", "previous_choice_id"])
+
+
+class VoteManager(models.Manager):
+    """
+    Manager with the write path of the vote() view.
+    """
+
+    def cast(self, user, question_id, choice_id, now=None):
+        """
+        Record that `user` picked `choice_id` in `question_id` and update the choice counters.
+
+        The user's current vote is read first, locked where the backend can.
+        A changed vote is one UPDATE that only matches while the choice belongs
+        to the question and the question is open. A new vote is one
+        INSERT ... SELECT ... ON CONFLICT DO NOTHING, whose SELECT does the same
+        checks, so nothing else needs to be loaded. When a concurrent first
+        vote of the same user wins the insert, the vote is read again and
+        changed instead.
+
+        On SQLite the transaction is retried while the database is locked, see
+        polls/sqlite.py.
+
+        Returns:
+            CastResult: The vote id, whether it was created and the replaced choice
+            id (None when created). None if the choice or question is not valid.
+        """
+        now = now or timezone.now()
+        connection = connections[self.db]
+
+        def write():
+            result = self._write(connection, user, question_id, choice_id, now)
+            if result is not None:
+                self._update_counters(question_id, choice_id, result)
+            return result
+
+        return write_transaction(write, using=self.db)
+
+    async def acast(self, user, question_id, choice_id, now=None):
+        return await sync_to_async(self.cast)(user, question_id, choice_id, now)
+
+    def _write(self, connection, user, question_id, choice_id, now):
+        open_choice = (Choice.objects.filter(pk=choice_id, question_id=question_id, question__pub_date__lte=now)
+                       .filter(models.Q(question__end_date=None) | models.Q(question__end_date__gte=now)))
+        # * The second round only runs when a concurrent first vote won the insert.
+        for _ in range(2):
+            current = (self.select_for_update().filter(user=user, question_id=question_id)
+                       .values_list("pk", "choice_id").first())
+            if current is not None:
+                vote_id, previous_choice_id = current
+                if not self.filter(pk=vote_id).filter(models.Exists(open_choice)).update(choice_id=choice_id):
+                    return None
+                return CastResult(vote_id, False, previous_choice_id)
+            if (connection.features.supports_update_conflicts_with_target
+                    and connection.features.can_return_columns_from_insert):
+                vote_id = self._insert(connection, user, question_id, choice_id, now)
+            elif open_choice.exists():
+                vote_id = self.create(user=user, question_id=question_id, choice_id=choice_id).pk
+            else:
+                return None
+            if vote_id is not None:
+                return CastResult(vote_id, True, None)
+        return None
+
+    def _insert(self, connection, user, question_id, choice_id, now):
+        """Insert a new vote if the choice is valid, return its id or None."""
+        qn = connection.ops.quote_name
+        sql = (
+            f"INSERT INTO {qn(self.model._meta.db_table)} (choice_id, user_id, question_id) "
+            f"SELECT c.id, %s, c.question_id FROM {qn(Choice._meta.db_table)} c "
+            f"INNER JOIN {qn(Question._meta.db_table)} q ON q.id = c.question_id "
+            "WHERE c.id = %s AND c.question_id = %s AND q.pub_date <= %s "
+            "AND (q.end_date IS NULL OR q.end_date >= %s) "
+            "ON CONFLICT (question_id, user_id) DO NOTHING "
+            "RETURNING id"
+        )
+        now = connection.ops.adapt_datetimefield_value(now)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user.pk, choice_id, question_id, now, now])
+            row = cursor.fetchone()
+        return None if row is None else row[0]
+
+    def _update_counters(self, question_id, choice_id, result):
+        """Keep Choice.vote_count and the trend score in step with the vote just written."""
+        if result.created:
+            Choice.objects.filter(pk=choice_id).update(vote_count=models.F("vote_count") + 1)
+            Question.objects.filter(pk=question_id).update(
+                stats_version=models.F("stats_version") + 1,
+                **trending.decayed_updates(weight=trending.CHOICE_VOTE_WEIGHT),
+            )
+        elif result.previous_choice_id != choice_id:
+            # * Move the vote: decrement the old choice, increment the new one.
+            Choice.objects.filter(pk__in=[result.previous_choice_id, choice_id]).update(
+                vote_count=models.F("vote_count") + models.Case(
+                    models.When(pk=choice_id, then=Value(1)),
+                    default=Value(-1),
+                )
+            )
+            Question.objects.filter(pk=question_id).update(stats_version=models.F("stats_version") + 1)
+        else:
+            return
+        notify_votes_changed([question_id], using=self.db)
+
+
 class Vote(models.Model):
     """Represent Vote of User for a poll question."""
 
@@ -268,9 +443,162 @@ class Vote(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
 
+    objects = VoteManager()
+
     def __str__(self):
         return f"{self.user} voted for {self.choice} in {self.question}"
 
+    class Meta:
+        constraints = [
+            # * One vote per user per question, also serves the (question, user) lookups.
+            models.UniqueConstraint(fields=["question", "user"], name="polls_vote_unique_question_user"),
+        ]
+
+
+class QuestionSearchIndex(models.Model):
+    """
+    Read-only view of the SQLite FTS5 table polls_question_fts used by search.
+
+    Attributes:
+        question (Question): The indexed question, stored as the FTS rowid.
+        document (str): The hidden column used as the left operand of MATCH.
+        rank (float): BM25 rank of the row for the current MATCH, lower is better.
+
+    Note:
+        - Database triggers keep the table in sync with Question and its tags.
+        - The table only exists on SQLite, see polls/search.py.
+    """
+    question = models.OneToOneField(Question, primary_key=True, db_column="rowid",
+                                    on_delete=models.DO_NOTHING, related_name="search_index")
+    question_text = models.TextField()
+    short_description = models.TextField()
+    long_description = models.TextField()
+    tags = models.TextField()
+    document = FullTextField(db_column="polls_question_fts")
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "polls_question_fts"
+
+
+def sentiment_delta(previous, up):
+    """
+    Return the (up, down) tally delta of turning the `previous` vote into `up`.
+
+    `previous` is None when the user had not voted yet.
+    """
+    if previous is up:
+        return 0, 0
+    if previous is None:
+        return (1, 0) if up else (0, 1)
+    return (1, -1) if up else (-1, 1)
+
+
+class SentimentVoteManager(models.Manager):
+    """
+    Manager with the write path of up and down votes.
+    """
+
+    def set_sentiment(self, user, question_id, up):
+        """
+        Make the vote of `user` on `question_id` an up (True) or down (False) vote.
+
+        The current vote is read first, locked where the backend can, in the
+        same transaction as the write. An unchanged vote writes nothing, a
+        changed one is one UPDATE and a new one is an INSERT ... ON CONFLICT DO
+        NOTHING; when a concurrent first vote of the same user wins the insert,
+        the vote is read again. The tallies and trend score of the question get
+        the resulting delta.
+
+        Returns:
+            bool: The previous vote, None if the user had not voted yet.
+        """
+        connection = connections[self.db]
+
+        def write():
+            previous = self._write(connection, user, question_id, up)
+            up_delta, down_delta = sentiment_delta(previous, up)
+            if up_delta or down_delta:
+                Question.objects.filter(pk=question_id).shift_sentiment(up_delta, down_delta)
+                notify_votes_changed([question_id], using=self.db)
+            return previous
+
+        return write_transaction(write, using=self.db)
+
+    async def aset_sentiment(self, user, question_id, up):
+        return await sync_to_async(self.set_sentiment)(user, question_id, up)
+
+    def _write(self, connection, user, question_id, up):
+        """Write the vote and return the one it replaced, None if it is new."""
+        # * The second round only runs when a concurrent first vote won the insert.
+        for _ in range(2):
+            current = (self.select_for_update().filter(user=user, question_id=question_id)
+                       .values_list("pk", "vote_types").first())
+            if current is not None:
+                vote_id, previous = current
+                if previous is not up:
+                    self.filter(pk=vote_id).update(vote_types=up)
+                return previous
+            if not connection.features.supports_update_conflicts_with_target:
+                self.create(user=user, question_id=question_id, vote_types=up)
+                return None
+            if self._insert(connection, user, question_id, up):
+                return None
+        raise DatabaseError("The sentiment vote was neither found nor inserted.")
+
+    def _insert(self, connection, user, question_id, up):
+        """Insert a new vote unless the user already has one, return whether it did."""
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        sql = (
+            f"INSERT INTO {table} (user_id, question_id, vote_types) "
+            "VALUES (%s, %s, %s) "
+            "ON CONFLICT (user_id, question_id) DO NOTHING"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user.pk, question_id, up])
+            return cursor.rowcount == 1
+
+    def bulk_set_sentiment(self, votes, batch_size=500):
+        """
+        Set many up/down votes at once, for imports and the write-behind buffer.
+
+        Existing votes are read with one query, new and changed votes are
+        written with bulk upserts and every question gets one tally UPDATE.
+        Run it where no other writer touches the same votes, or rebuild the
+        tallies with recount_votes afterwards.
+
+        Args:
+            votes (iterable): (question_id, user_id, up) tuples, the last one wins
+                when a user appears twice for a question.
+
+        Returns:
+            int: The number of votes that were created or changed.
+        """
+        votes = {(question_id, user_id): up for question_id, user_id, up in votes}
+        if not votes:
+            return 0
+        with transaction.atomic(using=self.db):
+            existing = {(question_id, user_id): vote_types for question_id, user_id, vote_types in
+                        self.filter(question_id__in={q for q, _ in votes}, user_id__in={u for _, u in votes})
+                        .values_list("question_id", "user_id", "vote_types")}
+            deltas = {}
+            changed = []
+            for (question_id, user_id), up in votes.items():
+                previous = existing.get((question_id, user_id))
+                up_delta, down_delta = sentiment_delta(previous, up)
+                if not (up_delta or down_delta):
+                    continue
+                total = deltas.get(question_id, (0, 0))
+                deltas[question_id] = (total[0] + up_delta, total[1] + down_delta)
+                changed.append(self.model(question_id=question_id, user_id=user_id, vote_types=up))
+            self.bulk_create(changed, batch_size=batch_size, update_conflicts=True,
+                             unique_fields=["user", "question"], update_fields=["vote_types"])
+            for question_id, (up_delta, down_delta) in deltas.items():
+                Question.objects.filter(pk=question_id).shift_sentiment(up_delta, down_delta)
+            notify_votes_changed(deltas, using=self.db)
+        return len(changed)
+
 
 # ! Most of the code from https://stackoverflow.com/a/70869267
 class SentimentVote(models.Model):
@@ -290,6 +618,8 @@ class SentimentVote(models.Model):
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     vote_types = models.BooleanField()
 
+    objects = SentimentVoteManager()
+
     class Meta:
         """
         unique_together (list of str): Ensures that a user can only cast one sentiment vote (upvote or downvote)
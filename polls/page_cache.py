@@ -0,0 +1,165 @@
+"""
+Versioned cache for the rendered poll listings of the index and search pages.
+
+The poll sections of these pages look the same for every visitor, so they
+are rendered once and shared. A cache key is made of:
+
+- the poll catalog version, a counter in the cache that is bumped when a
+  poll, choice or tag is saved or deleted, when tags are added or removed
+  and when vote counters change (votes_changed);
+- a time bucket of POLLS_PAGE_CACHE_BUCKET seconds, so polls that open or
+  close at pub_date / end_date show up within a bucket, and the "time left"
+  on the cards stays roughly current;
+- the request path, the query parameters the listings read (LISTING_PARAMS)
+  and whether infinite scroll asked for the cards alone. Other parameters,
+  such as tracking tags, don't change the listing and share its entry.
+
+Bumping the version never deletes anything, old entries are simply not read
+any more and expire at the end of their bucket. Sections are rendered with
+render_to_string() and no request, so no context processor can leak the
+user, messages or CSRF token of one visitor into the shared HTML. The page
+around them is rendered per request.
+
+Each poll card inside a listing is cached on its own as well, keyed by the
+question and its stats_version, which votes, edits and tag changes bump.
+A vote then re-renders one card and every other card is read from the
+cache.
+
+Hits and misses are counted in the cache too, see get_stats() and the
+page_cache_stats command. Set POLLS_PAGE_CACHE_BUCKET to 0 to disable the
+cache.
+"""
+
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils.safestring import mark_safe
+
+from . import metrics
+from .models import Choice, Question, Tag
+from .signals import votes_changed
+
+VERSION_KEY = "polls:catalog-version"
+HITS_KEY = "polls:page-cache:hits"
+MISSES_KEY = "polls:page-cache:misses"
+# * Everything the index and search listings read from the query string.
+LISTING_PARAMS = ("cursor", "q")
+
+
+def get_bucket_size():
+    return getattr(settings, "POLLS_PAGE_CACHE_BUCKET", 60)
+
+
+def get_catalog_version():
+    """Return the current poll catalog version."""
+    cache.add(VERSION_KEY, 1, timeout=None)
+    return cache.get(VERSION_KEY, 1)
+
+
+def bump_catalog_version():
+    """Make every cached listing stale."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, timeout=None)
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_stats():
+    """Return the number of cache hits and misses as a dict."""
+    return {"hits": cache.get(HITS_KEY, 0), "misses": cache.get(MISSES_KEY, 0)}
+
+
+def reset_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+def get_listing_params(request):
+    """Return the (name, value) pairs of LISTING_PARAMS in the query string, in a fixed order."""
+    return [(param, value) for param in LISTING_PARAMS for value in request.GET.getlist(param)]
+
+
+def make_key(name, request, now=None):
+    """Return the cache key of the `name` listing for this request, and seconds left in its bucket."""
+    now = time.time() if now is None else now
+    size = get_bucket_size()
+    bucket = int(now // size)
+    fragment = request.headers.get("X-Requested-With") == "XMLHttpRequest"
+    query = urlencode(get_listing_params(request))
+    page = hashlib.md5(f"{request.path}?{query}|{fragment}".encode()).hexdigest()
+    key = f"polls:page:{name}:{get_catalog_version()}:{bucket}:{page}"
+    return key, (bucket + 1) * size - now
+
+
+def cached_render(request, name, render):
+    """
+    Return the shared HTML of the `name` listing for this request.
+
+    `render` is called on a miss and must build the HTML without the request.
+    """
+    if not get_bucket_size():
+        return render()
+    # * The key is taken before rendering, a bump while we render leaves our entry unread.
+    key, timeout = make_key(name, request)
+    html = cache.get(key)
+    if html is not None:
+        _count(HITS_KEY)
+        metrics.inc("polls_page_cache_requests_total", result="hit")
+        return mark_safe(html)
+    _count(MISSES_KEY)
+    metrics.inc("polls_page_cache_requests_total", result="miss")
+    html = render()
+    cache.set(key, str(html), timeout=max(int(timeout), 1))
+    return html
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(m2m_changed, sender=Question.tags.through)
+def catalog_changed(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(votes_changed)
+def votes_changed_catalog(sender, **kwargs):
+    bump_catalog_version()
+
+
+def bump_question_versions(questions):
+    """Make the cached poll cards of `questions` stale, see includes/poll_card.html."""
+    questions.update(stats_version=F("stats_version") + 1)
+
+
+@receiver(post_save, sender=Tag)
+def tag_renamed(sender, instance, created, raw=False, **kwargs):
+    if not (created or raw):
+        bump_question_versions(Question.objects.filter(tags=instance))
+
+
+@receiver(m2m_changed, sender=Question.tags.through)
+def question_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Bump the questions whose tags change. A clear is caught before it runs, when the rows are still there."""
+    if action in ("post_add", "post_remove"):
+        pks = pk_set if reverse else [instance.pk]
+    elif action == "pre_clear":
+        pks = instance.question_set.values("pk") if reverse else [instance.pk]
+    else:
+        return
+    bump_question_versions(Question.objects.filter(pk__in=pks))
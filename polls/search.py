@@ -0,0 +1,195 @@
+"""
+Full-text search over poll questions.
+
+On SQLite the polls_question_fts FTS5 table mirrors question_text,
+short_description, long_description and the tag text of every question. It
+is kept in sync by database triggers (see migration 0020), so every write
+path, bulk ones included, updates it. Searches match every word of the query
+as a prefix and order the results by weighted BM25 rank. Other database
+backends fall back to case-insensitive substring matching.
+
+paginate_search() returns one page of the ranked results. Like the poll
+listings (see polls/pagination.py) it is a keyset page: the cursor holds the
+(rank, id) of the last result shown, and the next page starts after it.
+
+SQLite rebuilds polls_question for most column changes, which drops its
+triggers. install_triggers() creates any missing trigger after every
+migrate, so such a rebuild cannot leave the index behind for good.
+rebuild_index() fills the table again from scratch, for bulk loads and
+recount_votes.
+"""
+
+import re
+
+from django.core import signing
+from django.db import DEFAULT_DB_ALIAS, connections, models
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+
+from .pagination import KeysetPage, paginate_keyset
+
+TABLE = "polls_question_fts"
+CURSOR_SALT = "polls.search.cursor"
+TAG_TEXT = (
+    "(SELECT COALESCE(group_concat(t.tag_text, ' '), '') FROM polls_tag t "
+    "JOIN polls_question_tags qt ON qt.tag_id = t.id WHERE qt.question_id = {question_id})"
+)
+TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS polls_question_fts_insert AFTER INSERT ON polls_question BEGIN "
+    "INSERT INTO polls_question_fts(rowid, question_text, short_description, long_description, tags) "
+    "VALUES (new.id, new.question_text, new.short_description, new.long_description, "
+    + TAG_TEXT.format(question_id="new.id") + "); END",
+    # * Only text columns, so vote counter and trend updates don't rewrite the index.
+    "CREATE TRIGGER IF NOT EXISTS polls_question_fts_update "
+    "AFTER UPDATE OF question_text, short_description, long_description ON polls_question BEGIN "
+    "UPDATE polls_question_fts SET question_text = new.question_text, short_description = new.short_description, "
+    "long_description = new.long_description WHERE rowid = new.id; END",
+    "CREATE TRIGGER IF NOT EXISTS polls_question_fts_delete AFTER DELETE ON polls_question BEGIN "
+    "DELETE FROM polls_question_fts WHERE rowid = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS polls_question_tags_fts_insert AFTER INSERT ON polls_question_tags BEGIN "
+    "UPDATE polls_question_fts SET tags = " + TAG_TEXT.format(question_id="new.question_id")
+    + " WHERE rowid = new.question_id; END",
+    "CREATE TRIGGER IF NOT EXISTS polls_question_tags_fts_delete AFTER DELETE ON polls_question_tags BEGIN "
+    "UPDATE polls_question_fts SET tags = " + TAG_TEXT.format(question_id="old.question_id")
+    + " WHERE rowid = old.question_id; END",
+    # * Fixtures link questions to tags before the tags exist, the text arrives with the tag.
+    "CREATE TRIGGER IF NOT EXISTS polls_tag_fts_insert AFTER INSERT ON polls_tag BEGIN "
+    "UPDATE polls_question_fts SET tags = " + TAG_TEXT.format(question_id="polls_question_fts.rowid")
+    + " WHERE rowid IN (SELECT question_id FROM polls_question_tags WHERE tag_id = new.id); END",
+    "CREATE TRIGGER IF NOT EXISTS polls_tag_fts_update AFTER UPDATE OF tag_text ON polls_tag BEGIN "
+    "UPDATE polls_question_fts SET tags = " + TAG_TEXT.format(question_id="polls_question_fts.rowid")
+    + " WHERE rowid IN (SELECT question_id FROM polls_question_tags WHERE tag_id = new.id); END",
+]
+
+
+def has_index(connection):
+    return connection.vendor == "sqlite" and TABLE in connection.introspection.table_names()
+
+
+def install_triggers(using=DEFAULT_DB_ALIAS):
+    """Create the sync triggers that are missing, return False when there is no search table."""
+    connection = connections[using]
+    if not has_index(connection):
+        return False
+    with connection.cursor() as cursor:
+        for statement in TRIGGERS:
+            cursor.execute(statement)
+    return True
+
+
+def rebuild_index(using=DEFAULT_DB_ALIAS):
+    """Fill the search table again from polls_question and the tags, return False when there is none."""
+    connection = connections[using]
+    if not has_index(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+        cursor.execute(
+            f"INSERT INTO {TABLE}(rowid, question_text, short_description, long_description, tags) "
+            "SELECT q.id, q.question_text, q.short_description, q.long_description, "
+            + TAG_TEXT.format(question_id="q.id") + " FROM polls_question q"
+        )
+    return True
+
+
+@receiver(post_migrate)
+def restore_triggers(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    if sender.name == "polls":
+        install_triggers(using)
+
+
+class FullTextField(models.TextField):
+    """The hidden FTS5 column named after its table, the left operand of MATCH."""
+
+
+@FullTextField.register_lookup
+class Match(models.Lookup):
+    """`document__match=expression` compiles to `<fts table> MATCH expression`."""
+
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", lhs_params + rhs_params
+
+
+def build_match_expression(q):
+    """
+    Turn free text into an FTS5 query that matches every word as a prefix.
+
+    Each word is quoted so FTS5 operators and punctuation in user input are
+    taken literally. Returns an empty string when `q` holds no words.
+    """
+    words = re.findall(r"\w+", q)
+    return " ".join('"{}"*'.format(word) for word in words)
+
+
+def search_questions(queryset, q):
+    """
+    Filter a Question queryset down to questions matching `q`.
+
+    Results are ordered by relevance on SQLite and left in their original
+    order elsewhere.
+    """
+    if connections[queryset.db].vendor != "sqlite":
+        return queryset.filter(
+            models.Q(question_text__icontains=q)
+            | models.Q(short_description__icontains=q)
+            | models.Q(long_description__icontains=q)
+            | models.Q(tags__tag_text__icontains=q)
+        ).distinct()
+
+    expression = build_match_expression(q)
+    if not expression:
+        return queryset.none()
+    return queryset.filter(search_index__document__match=expression).order_by("search_index__rank")
+
+
+def encode_cursor(question):
+    """Return an opaque token pointing just past the ranked `question`."""
+    return signing.dumps([question.search_rank, question.pk], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token):
+    """
+    Return the (rank, pk) position stored in `token`.
+
+    Raises:
+        ValueError: If the token is malformed or has been tampered with.
+    """
+    try:
+        rank, pk = signing.loads(token, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError) as error:
+        raise ValueError("Invalid cursor") from error
+    if not isinstance(rank, (int, float)) or not isinstance(pk, int):
+        raise ValueError("Invalid cursor")
+    return rank, pk
+
+
+def paginate_search(queryset, q, cursor, per_page):
+    """
+    Return the page of questions matching `q` that follows `cursor`.
+
+    On SQLite pages are ordered by rank then id, elsewhere newest first like
+    the listings. An empty or invalid cursor returns the first page.
+    """
+    if connections[queryset.db].vendor != "sqlite":
+        return paginate_keyset(search_questions(queryset, q), cursor, per_page)
+
+    queryset = search_questions(queryset, q).annotate(
+        search_rank=models.F("search_index__rank")
+    ).order_by("search_rank", "pk")
+    if cursor:
+        try:
+            rank, pk = decode_cursor(cursor)
+        except ValueError:
+            pass
+        else:
+            queryset = queryset.filter(
+                models.Q(search_rank__gt=rank) | models.Q(search_rank=rank, pk__gt=pk)
+            )
+
+    items = list(queryset[:per_page + 1])
+    next_cursor = encode_cursor(items[per_page - 1]) if len(items) > per_page else None
+    return KeysetPage(items[:per_page], next_cursor)
@@ -1,9 +1,12 @@
 import logging
 from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed
-from django.dispatch import receiver
+from django.dispatch import Signal, receiver
 
 log = logging.getLogger("django")
 
+# * Sent after commit when the stored vote counters of questions change, with a question_ids argument.
+votes_changed = Signal()
+
 
 def get_client_ip(request):
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -19,24 +22,16 @@ def get_client_ip(request):
 def user_logged_in_callback(sender, request, user, **kwargs):
     ip = get_client_ip(request)
 
-    log.info('Login User: {user} via ip: {ip}'.format(
-        user=user,
-        ip=ip
-    ))
+    log.info('Login User: %s via ip: %s', user, ip)
 
 
 @receiver(user_logged_out)
 def user_logged_out_callback(sender, request, user, **kwargs):
     ip = get_client_ip(request)
 
-    log.info('Logout User: {user} via ip: {ip}'.format(
-        user=user,
-        ip=ip
-    ))
+    log.info('Logout User: %s via ip: %s', user, ip)
 
 
 @receiver(user_login_failed)
 def user_login_failed_callback(sender, credentials, **kwargs):
-    log.warning('Login Failed for: {credentials}'.format(
-        credentials=credentials,
-    ))
+    log.warning('Login Failed for: %s', credentials)
@@ -0,0 +1,116 @@
+"""
+SQLite production profile: connection PRAGMAs and a locking-aware write path.
+
+SQLite's defaults suit a single writer. With the rollback journal a writer
+locks out every reader, and two transactions that both read first and then
+try to write can only be resolved by failing one with "database is locked",
+without waiting for busy_timeout. With POLLS_SQLITE_TUNING on, every new
+connection gets:
+
+- journal_mode=WAL, so readers never block the writer and vice versa;
+- synchronous=NORMAL, which in WAL mode is still safe against corruption and
+  only risks the last commits on a power loss, without an fsync per commit;
+- busy_timeout, how long a writer waits for the lock before giving up;
+- mmap_size, cache_size and temp_store=MEMORY, so reads come from memory.
+
+Vote writes go through write_transaction(): the transaction starts with
+BEGIN IMMEDIATE, taking the write lock up front so it waits in busy_timeout
+instead of failing halfway, and a transaction that still finds the database
+locked is retried with exponential backoff. Django 4.2 has no setting for
+the BEGIN mode (transaction_mode arrived in 5.1), so the database ENGINE
+must be polls.backends.sqlite3, whose BEGIN immediate_atomic() switches for
+one atomic block.
+
+Other backends, including Django's own SQLite one, are left alone; there
+both helpers are plain atomic blocks.
+"""
+
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .backends.sqlite3.base import DatabaseWrapper
+
+# * Negative cache_size is in KiB.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,
+    "temp_store": "MEMORY",
+}
+RETRIES = 5
+RETRY_DELAY = 0.01
+
+
+def is_enabled():
+    return getattr(settings, "POLLS_SQLITE_TUNING", False)
+
+
+def get_pragmas():
+    """Return the PRAGMAs set on every new connection, in order."""
+    return {"busy_timeout": getattr(settings, "POLLS_SQLITE_BUSY_TIMEOUT", 5000), **PRAGMAS}
+
+
+@receiver(connection_created)
+def tune_connection(sender, connection, **kwargs):
+    if connection.vendor != "sqlite" or not is_enabled():
+        return
+    with connection.cursor() as cursor:
+        for name, value in get_pragmas().items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def is_lock_error(error):
+    message = str(error).lower()
+    return "database is locked" in message or "database table is locked" in message
+
+
+@contextmanager
+def immediate_atomic(using=None):
+    """
+    transaction.atomic() that starts with BEGIN IMMEDIATE on SQLite.
+
+    Inside another atomic block this is a savepoint like atomic(), the outer
+    transaction has started already.
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    if not isinstance(connection, DatabaseWrapper) or not is_enabled() or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+    connection.begin_immediate = True
+    try:
+        with transaction.atomic(using=using):
+            # * Only this block's BEGIN, nested blocks use savepoints.
+            connection.begin_immediate = False
+            yield
+    finally:
+        connection.begin_immediate = False
+
+
+def write_transaction(write, using=None, retries=RETRIES, delay=RETRY_DELAY):
+    """
+    Call `write()` in immediate_atomic() and return its result.
+
+    A transaction that fails because the database is locked is run again up
+    to `retries` times, waiting about delay, 2 * delay, 4 * delay, ... in
+    between. Inside an outer atomic block the error is raised, as only the
+    whole outer transaction could be retried. Without POLLS_SQLITE_TUNING
+    nothing is retried.
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    retries = retries if is_enabled() else 0
+    for attempt in range(retries + 1):
+        try:
+            with immediate_atomic(using):
+                return write()
+        except OperationalError as error:
+            if attempt == retries or not is_lock_error(error) or connection.in_atomic_block:
+                raise
+        time.sleep(delay * 2 ** attempt * random.uniform(0.5, 1.5))
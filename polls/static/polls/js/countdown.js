@@ -0,0 +1,31 @@
+// Time left on poll cards.
+// Cards are cached until their poll changes, so the server-rendered time left can be
+// old. This renders it again from data-end-date, the same way Question.time_left does.
+const formatTimeLeft = endDate => {
+  const left = (endDate - Date.now()) / 1000;
+  if (left >= 86400) {
+    return `${Math.floor(left / 86400)} Days`;
+  }
+  if (left >= 3600) {
+    return `${Math.floor(left / 3600)} Hours`;
+  }
+  if (left >= 60) {
+    return `${Math.floor(left / 60)} Mins`;
+  }
+  if (left >= 1) {
+    return `${Math.floor(left)} Sec`;
+  }
+  return "";
+};
+
+const renderCountdowns = () => {
+  document.querySelectorAll("[data-end-date]").forEach(element => {
+    element.textContent = formatTimeLeft(Date.parse(element.dataset.endDate));
+  });
+};
+
+document.addEventListener("DOMContentLoaded", () => {
+  renderCountdowns();
+  // * Also picks up cards added by infinite scroll.
+  setInterval(renderCountdowns, 1000);
+});
@@ -0,0 +1,40 @@
+// Infinite scroll for keyset-paginated poll lists.
+// The "Load more polls" link still works without JavaScript, this only fetches
+// the next page of cards in place when the link scrolls into view.
+const loadNextPage = async (list, link) => {
+  const observer = list.pollObserver;
+  observer.unobserve(link);
+
+  const response = await fetch(link.href, { headers: { "X-Requested-With": "XMLHttpRequest" } });
+  if (!response.ok) {
+    observer.observe(link);
+    return;
+  }
+
+  const fragment = document.createElement("template");
+  fragment.innerHTML = await response.text();
+  link.remove();
+  list.append(fragment.content);
+
+  const nextLink = list.querySelector("[data-next-page]");
+  if (nextLink !== null) {
+    observer.observe(nextLink);
+  }
+};
+
+document.addEventListener("DOMContentLoaded", () => {
+  if (!("IntersectionObserver" in window)) {
+    return;
+  }
+
+  document.querySelectorAll("[data-poll-list]").forEach(list => {
+    list.pollObserver = new IntersectionObserver(entries => {
+      entries.filter(entry => entry.isIntersecting).forEach(entry => loadNextPage(list, entry.target));
+    }, { rootMargin: "400px" });
+
+    const link = list.querySelector("[data-next-page]");
+    if (link !== null) {
+      list.pollObserver.observe(link);
+    }
+  });
+});
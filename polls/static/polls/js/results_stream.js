@@ -0,0 +1,55 @@
+// Live results over Server-Sent Events, see polls/broadcast.py.
+// A "snapshot" event carries the absolute counts, "counts" events carry deltas:
+// {"c": {"<choice id>": delta}, "u": up delta, "d": down delta}.
+const startResultsStream = page => {
+  const rows = Array.from(page.querySelectorAll("[data-choice-id]"));
+  const up = page.querySelector("[data-up-percentage]");
+  const down = page.querySelector("[data-down-percentage]");
+  const participants = page.querySelector("[data-participants]");
+
+  const render = () => {
+    const votes = rows.map(row => Number(row.dataset.votes));
+    rows.forEach((row, index) => {
+      row.querySelector("[data-vote-count]").textContent = `👍 ${votes[index]}`;
+      row.querySelector("[data-vote-bar]").style.width = `${votes[index]}%`;
+    });
+    participants.textContent = `${votes.reduce((sum, count) => sum + count, 0)} Participants 👤`;
+
+    const upVotes = Number(up.dataset.votes);
+    const downVotes = Number(down.dataset.votes);
+    const total = upVotes + downVotes;
+    up.textContent = `👍 ${total ? Math.floor(upVotes / total * 100) : 0}% `;
+    down.textContent = `👎 ${total ? Math.floor(downVotes / total * 100) : 0}% `;
+
+    [window.percentageChart, window.voteCountChart].forEach(chart => {
+      chart.data.datasets[0].data = votes;
+      chart.update();
+    });
+  };
+
+  const apply = (data, absolute) => {
+    rows.forEach(row => {
+      const count = data.c[row.dataset.choiceId];
+      if (count !== undefined) {
+        row.dataset.votes = absolute ? count : Number(row.dataset.votes) + count;
+      }
+    });
+    up.dataset.votes = absolute ? data.u : Number(up.dataset.votes) + data.u;
+    down.dataset.votes = absolute ? data.d : Number(down.dataset.votes) + data.d;
+    render();
+  };
+
+  const source = new EventSource(page.dataset.resultsStream);
+  source.addEventListener("snapshot", event => apply(JSON.parse(event.data), true));
+  source.addEventListener("counts", event => apply(JSON.parse(event.data), false));
+};
+
+document.addEventListener("DOMContentLoaded", () => {
+  if (!("EventSource" in window)) {
+    return;
+  }
+  const page = document.querySelector("[data-results-stream]");
+  if (page !== null) {
+    startResultsStream(page);
+  }
+});
@@ -0,0 +1,22 @@
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+# * Cached listings and poll cards would outlive the rolled back rows of a test.
+NO_CACHES = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "polls-tests"}}
+
+# * For the tests of the caches themselves, clear the cache in setUp.
+with_cache = override_settings(CACHES=LOCMEM_CACHES)
+
+
+class PollsTestRunner(DiscoverRunner):
+    """Runs the tests with the cache turned off, see with_cache for tests that need one."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.no_caches = override_settings(CACHES=NO_CACHES)
+        self.no_caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.no_caches.disable()
+        super().teardown_test_environment(**kwargs)
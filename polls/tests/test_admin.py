@@ -0,0 +1,82 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .base import create_question
+from .. import pagination
+from ..models import Question, Tag
+from ..pagination import EstimatedCountPaginator
+
+
+class QuestionAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="poll_admin", password="aaa123321aaa")
+        cls.tag = Tag.objects.create(tag_text="Admin")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def create_questions(self, count):
+        for i in range(count):
+            question = create_question(f"Admin question {i}", day=-1)
+            question.tags.add(self.tag)
+            question.choice_set.create(choice_text="Choice")
+
+    def changelist_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("admin:polls_question_changelist"))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """A changelist page costs the same number of queries for 2 or 20 questions."""
+        self.create_questions(2)
+        few = self.changelist_queries()
+        self.create_questions(18)
+        self.assertEqual(self.changelist_queries(), few)
+
+    def test_changelist_shows_stored_columns(self):
+        """The stored trend score, participants and tags are listed."""
+        self.create_questions(1)
+        response = self.client.get(reverse("admin:polls_question_changelist"))
+        self.assertContains(response, "column-trend_score")
+        self.assertContains(response, "column-participants")
+        self.assertContains(response, "Admin")
+
+    def test_change_form_inline_shows_counter(self):
+        """Inline choices show the stored vote counter without counting votes."""
+        self.create_questions(1)
+        question = Question.objects.get()
+        response = self.client.get(reverse("admin:polls_question_change", args=(question.id,)))
+        self.assertContains(response, "field-vote_count")
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            create_question(f"Counted question {i}", day=-1)
+
+    def test_small_table_is_counted(self):
+        """Below the threshold the exact count is used."""
+        self.assertEqual(EstimatedCountPaginator(Question.objects.order_by("pk"), 2).count, 3)
+
+    def test_large_unfiltered_table_is_estimated(self):
+        """Above the threshold an unfiltered table is estimated without COUNT(*)."""
+        with mock.patch.object(pagination, "estimate_count", return_value=2_000_000):
+            paginator = EstimatedCountPaginator(Question.objects.order_by("pk"), 100)
+            self.assertEqual(paginator.count, 2_000_000)
+            self.assertEqual(paginator.num_pages, 20_000)
+            filtered = EstimatedCountPaginator(Question.objects.filter(question_text__contains="1").order_by("pk"), 100)
+            self.assertEqual(filtered.count, 1)
+
+    def test_exact_count_without_statistics(self):
+        """SQLite has no row estimate, so even a large table is counted exactly."""
+        self.assertIsNone(pagination.estimate_count(Question))
+        with mock.patch.object(pagination, "ESTIMATE_THRESHOLD", 1):
+            self.assertEqual(EstimatedCountPaginator(Question.objects.order_by("pk"), 2).count, 3)
@@ -0,0 +1,65 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from ..models import Choice, Question, Vote
+from .base import create_question
+
+
+@override_settings(ROOT_URLCONF="mysite.async_urls")
+class AsyncViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.question = create_question(question_text="Async Question", day=-1)
+        cls.choice1 = Choice.objects.create(question=cls.question, choice_text="Async Choice 1")
+        cls.choice2 = Choice.objects.create(question=cls.question, choice_text="Async Choice 2")
+        cls.user = User.objects.create_user(username="async_user", password="aaa123321aaa")
+
+    def setUp(self):
+        self.async_client.force_login(self.user)
+
+    async def test_anonymous_user_is_redirected_to_login(self):
+        self.async_client.cookies.clear()
+        response = await self.async_client.get(reverse("polls:detail", args=(self.question.id,)))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse("login"), response.url)
+
+    async def test_vote_and_see_it_on_detail(self):
+        """An async vote is stored and the detail page shows it as selected."""
+        response = await self.async_client.post(reverse("polls:vote", args=(self.question.id,)),
+                                                {"choice": self.choice2.id})
+        self.assertRedirects(response, reverse("polls:results", args=(self.question.id,)),
+                             fetch_redirect_response=False)
+        vote = await Vote.objects.aget(user=self.user, question=self.question)
+        self.assertEqual(vote.choice_id, self.choice2.id)
+
+        response = await self.async_client.get(reverse("polls:detail", args=(self.question.id,)))
+        self.assertEqual(response.context["selected_choice"], self.choice2)
+        self.assertTrue(response.context["has_voted"])
+
+    async def test_vote_without_choice(self):
+        response = await self.async_client.post(reverse("polls:vote", args=(self.question.id,)))
+        self.assertRedirects(response, reverse("polls:detail", args=(self.question.id,)),
+                             fetch_redirect_response=False)
+        self.assertFalse(await Vote.objects.aexists())
+
+    async def test_unknown_question_is_redirected_to_index(self):
+        response = await self.async_client.get(reverse("polls:detail", args=(self.question.id + 100,)))
+        self.assertRedirects(response, reverse("polls:index"), fetch_redirect_response=False)
+
+    async def test_upvote_and_see_it_on_results(self):
+        await self.async_client.post(reverse("polls:upvote", args=(self.question.id,)))
+        question = await Question.objects.aget(pk=self.question.pk)
+        self.assertEqual(question.up_vote_count, 1)
+
+        response = await self.async_client.get(reverse("polls:results", args=(self.question.id,)))
+        self.assertEqual(response.context["user_voted"], "upvote")
+
+    async def test_results_use_the_stats_queryset(self):
+        """The async results page loads the same annotations as ResultsView."""
+        await self.async_client.post(reverse("polls:vote", args=(self.question.id,)), {"choice": self.choice1.id})
+        response = await self.async_client.get(reverse("polls:results", args=(self.question.id,)))
+        question = response.context["question"]
+        self.assertEqual(question.participant_count, 1)
+        self.assertIn("choice_set", question._prefetched_objects_cache)
+        self.assertIsNone(response.context["user_voted"])
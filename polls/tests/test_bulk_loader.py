@@ -0,0 +1,78 @@
+import io
+import json
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from ..bulk_loader import iter_json_array
+from ..models import Choice, Question, SentimentVote, Tag, Vote
+from ..counters import find_choice_count_drift, find_sentiment_count_drift
+
+ALLDATA = settings.BASE_DIR / "data" / "alldata.json"
+
+
+class IterJsonArrayTest(TestCase):
+    def test_items_split_across_chunks(self):
+        """Items are yielded whole whatever the chunk boundaries."""
+        items = [{"model": "polls.tag", "fields": {"tag_text": "a ] , [ b"}}, {"n": [1, 2, {"x": "}"}]}, {}]
+        text = json.dumps(items, indent=2)
+        for chunk_size in (1, 3, 7, 1024):
+            self.assertEqual(list(iter_json_array(io.StringIO(text), chunk_size)), items)
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array(io.StringIO(" [ ] "))), [])
+
+    def test_not_an_array(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('{"model": "polls.tag"}')))
+
+    def test_unclosed_array(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('[{"model": "polls.tag"},'), 4))
+
+
+class BulkLoadDataTest(TestCase):
+    def load(self, *args):
+        out = StringIO()
+        call_command("bulk_loaddata", *args, stdout=out)
+        return out.getvalue()
+
+    def test_load_alldata(self):
+        """The seed dump loads in batches, with its relations and rebuilt counters."""
+        output = self.load(str(ALLDATA), "--batch-size", "10")
+
+        self.assertIn("Loaded 135 object(s)", output)
+        self.assertIn("objects/s", output)
+        self.assertEqual(User.objects.count(), 7)
+        self.assertEqual(Question.objects.count(), 9)
+        self.assertEqual(Choice.objects.count(), 58)
+        self.assertEqual(Vote.objects.count(), 29)
+        self.assertEqual(SentimentVote.objects.count(), 26)
+        self.assertEqual(list(Question.objects.get(pk=1).tags.all()), [Tag.objects.get(pk=7)])
+        self.assertEqual(list(find_choice_count_drift()), [])
+        self.assertEqual(list(find_sentiment_count_drift()), [])
+
+    def test_trend_scores_are_rebuilt(self):
+        """Fixture scores are replaced by ones built from the loaded votes."""
+        self.load(str(ALLDATA))
+        for question in Question.objects.with_stats():
+            self.assertAlmostEqual(question.trend_score, question.trending_score(), places=2)
+
+    def test_reload_updates_rows(self):
+        """Loading the same dump twice updates the rows instead of failing."""
+        self.load(str(ALLDATA))
+        Question.objects.filter(pk=1).update(question_text="Changed")
+        self.load(str(ALLDATA))
+        self.assertEqual(Question.objects.count(), 9)
+        self.assertNotEqual(Question.objects.get(pk=1).question_text, "Changed")
+
+    def test_broken_reference_loads_nothing(self):
+        """A vote pointing at a missing choice rolls the whole load back."""
+        votes = settings.BASE_DIR / "data" / "vote.json"
+        with self.assertRaises(CommandError):
+            self.load(str(settings.BASE_DIR / "data" / "users.json"), str(votes))
+        self.assertFalse(User.objects.exists())
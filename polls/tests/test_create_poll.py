@@ -0,0 +1,41 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Choice, Question, Tag
+
+
+class CreatePollTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="poll_creator", password="aaa123321aaa")
+        cls.tag = Tag.objects.create(tag_text="Food")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.data = {
+            "question_text": "What should we eat today?",
+            "pub_date": "2024-01-01",
+            "end_date": "2099-01-01",
+            "short_description": "Lunch",
+            "long_description": "Pick one",
+            "user_choice": "Rice, Noodles,,Bread",
+            "tags": [self.tag.id],
+        }
+
+    def test_create_poll(self):
+        """The poll, its non-empty choices and its tags are created."""
+        response = self.client.post(reverse("polls:create_poll"), self.data)
+        self.assertRedirects(response, reverse("polls:index"))
+        question = Question.objects.get()
+        self.assertEqual(list(question.choice_set.values_list("choice_text", flat=True)), ["Rice", "Noodles", "Bread"])
+        self.assertEqual(list(question.tags.all()), [self.tag])
+
+    def test_failure_leaves_no_partial_poll(self):
+        """If a choice cannot be written, the question is not created either."""
+        with mock.patch.object(Choice.objects, "bulk_create", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(reverse("polls:create_poll"), self.data)
+        self.assertFalse(Question.objects.exists())
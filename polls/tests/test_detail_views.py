@@ -3,6 +3,7 @@ from django.urls import reverse
 from django.contrib.auth.models import User
 
 from .base import create_question
+from ..models import SentimentVote, Vote
 
 
 class QuestionDetailViewTests(TestCase):
@@ -40,3 +41,40 @@ class QuestionDetailViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
 
         self.assertContains(response, past_question.question_text)
+
+
+class DetailResultsQueryTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="query_user", password="aaa123321aaa")
+        cls.question = create_question(question_text="Query budget question.", day=-1)
+        cls.choices = [cls.question.choice_set.create(choice_text=f"Choice {i}") for i in range(5)]
+        Vote.objects.cast(cls.user, cls.question.id, cls.choices[2].id)
+        SentimentVote.objects.set_sentiment(cls.user, cls.question.id, False)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_detail_query_budget(self):
+        """Session, user, the question with the user's vote, and the choices."""
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("polls:detail", args=(self.question.id,)))
+        self.assertEqual(response.context["selected_choice"], self.choices[2])
+        self.assertTrue(response.context["has_voted"])
+
+    def test_results_query_budget(self):
+        """Session, user, the question with participants and the user's up/down vote, and the choices."""
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("polls:results", args=(self.question.id,)))
+        self.assertEqual(response.context["user_voted"], "downvote")
+        self.assertContains(response, "1 Participants")
+
+    def test_no_vote(self):
+        """A user who has not voted has no selected choice or up/down vote."""
+        other = User.objects.create_user(username="query_other", password="aaa123321aaa")
+        self.client.force_login(other)
+        response = self.client.get(reverse("polls:detail", args=(self.question.id,)))
+        self.assertIsNone(response.context["selected_choice"])
+        self.assertFalse(response.context["has_voted"])
+        response = self.client.get(reverse("polls:results", args=(self.question.id,)))
+        self.assertIsNone(response.context["user_voted"])
@@ -0,0 +1,32 @@
+import json
+
+from django.test import TestCase, override_settings
+
+from ..benchmarks import measure_request
+from ..load_data import LoadDataGenerator
+from ..management.commands.bench_hot_paths import BASELINES, NO_CACHE, hot_paths
+from ..models import Question
+
+
+@override_settings(CACHES=NO_CACHE)
+class HotPathQueryBudgetTest(TestCase):
+    """
+    The query budgets of bench_hot_paths on a small dataset, so an N+1 fails
+    the test suite and not only the benchmark. Latency is left to the benchmark.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        LoadDataGenerator(users=40, questions=30, votes=600, sentiments=200, tags=5).generate()
+        cls.question = Question.objects.active().order_by("-trend_score").first()
+        cls.choice_ids = list(cls.question.choice_set.values_list("pk", flat=True))
+        cls.user = cls.question.vote_set.first().user
+        with open(BASELINES) as stream:
+            cls.baselines = json.load(stream)
+
+    def test_query_budgets(self):
+        self.client.force_login(self.user)
+        for name, send in hot_paths(self.client, self.question, self.choice_ids).items():
+            with self.subTest(page=name):
+                result = measure_request(send, runs=2, warmup=1)
+                self.assertLessEqual(result["queries"], self.baselines[name]["queries"])
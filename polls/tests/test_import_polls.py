@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from .runner import with_cache
+from .. import page_cache
+from ..importer import PollImporter
+from ..models import Choice, Question, Tag
+
+
+class ImportPollsTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w", encoding="utf-8") as stream:
+            stream.write(text)
+        return path
+
+    def import_file(self, path, *args):
+        out = StringIO()
+        call_command("import_polls", path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_jsonl(self):
+        """Polls, choices and tags are imported and reported."""
+        records = [
+            {"question_text": f"Imported poll {i}?", "pub_date": "2024-01-01", "choices": ["Yes", "No"],
+             "tags": ["Sports", "Fun"]}
+            for i in range(5)
+        ]
+        path = self.write("polls.jsonl", "\n".join(json.dumps(record) for record in records))
+        output = self.import_file(path, "--batch-size", "2")
+
+        self.assertIn("Imported 5 poll(s), 10 choice(s) and 2 new tag(s)", output)
+        self.assertIn("polls/s", output)
+        self.assertEqual(Question.objects.count(), 5)
+        self.assertEqual(Choice.objects.count(), 10)
+        self.assertEqual(Tag.objects.count(), 2)
+        question = Question.objects.get(question_text="Imported poll 3?")
+        self.assertEqual(sorted(question.tags.values_list("tag_text", flat=True)), ["Fun", "Sports"])
+        self.assertAlmostEqual(question.trend_score / question.trending_score(), 1, places=5)
+
+    def test_import_csv_reuses_tags(self):
+        """Existing tags are found by text, CSV choices and tags are split on '|'."""
+        tag = Tag.objects.create(tag_text="Sports")
+        path = self.write("polls.csv", "question_text,choices,tags\n"
+                                       "Who wins the cup?,Red|Blue| Blue ,Sports|New\n")
+        self.import_file(path)
+
+        question = Question.objects.get()
+        self.assertEqual(list(question.choice_set.values_list("choice_text", flat=True)), ["Red", "Blue"])
+        self.assertIn(tag, question.tags.all())
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_bad_record_rolls_back_its_batch(self):
+        """A bad record leaves earlier batches in place and nothing of its own batch."""
+        lines = [json.dumps({"question_text": "Good poll?"}), json.dumps({"question_text": "Second poll?"}),
+                 json.dumps({"question_text": "Third poll?"}), json.dumps({"pub_date": "2024-01-01"})]
+        path = self.write("polls.jsonl", "\n".join(lines))
+        with self.assertRaisesMessage(CommandError, "Record 4: question_text is required"):
+            self.import_file(path, "--batch-size", "2")
+        self.assertEqual(Question.objects.count(), 2)
+
+    def test_record_must_be_an_object(self):
+        """A JSON line that is not an object is reported like any other invalid record."""
+        path = self.write("polls.jsonl", json.dumps({"question_text": "Good poll?"}) + '\n["Bad poll?"]\n')
+        with self.assertRaisesMessage(CommandError, "Record 2: expected an object, got list"):
+            self.import_file(path)
+        self.assertEqual(Question.objects.count(), 0)
+
+    @with_cache
+    def test_import_bumps_catalog_version(self):
+        """bulk_create sends no signals, the importer bumps the page cache itself."""
+        version = page_cache.get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            PollImporter().import_records([{"question_text": "Cached poll?"}])
+        self.assertGreater(page_cache.get_catalog_version(), version)
+
+    def test_unknown_format(self):
+        path = self.write("polls.txt", "")
+        with self.assertRaisesMessage(CommandError, "pass --format"):
+            self.import_file(path)
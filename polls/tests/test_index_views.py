@@ -75,3 +75,18 @@ class QuestionIndexViewTests(TestCase):
             response.context["latest_question_list"]["all_poll"],
             [question2, question1],
         )
+
+    def test_query_count_is_constant(self):
+        """
+        The index page runs the same number of queries however many polls are open.
+        """
+        # * The listing and the trending block, each with its tag prefetch, new polls are trending.
+        Question.objects.create(question_text="Open question 0.")
+        with self.assertNumQueries(4):
+            self.client.get(reverse("polls:index"))
+
+        for i in range(1, 6):
+            Question.objects.create(question_text=f"Open question {i}.")
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("polls:index"))
+        self.assertEqual(len(response.context["latest_question_list"]["all_poll"]), 6)
@@ -0,0 +1,69 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count
+from django.test import TestCase
+
+from ..counters import find_choice_count_drift, find_sentiment_count_drift
+from ..load_data import LoadDataGenerator
+from ..models import Question, SentimentVote, Vote
+
+
+class GenerateLoadDataTest(TestCase):
+    options = dict(users=50, questions=20, votes=400, sentiments=200, tags=5, choices=4, batch_size=64)
+
+    def snapshot(self):
+        """Return the votes by text, ids differ between runs."""
+        return list(Vote.objects.order_by("pk").values_list("question__question_text", "user__username",
+                                                            "choice__choice_text"))
+
+    def test_generate(self):
+        """Every requested row is written and the stored counters match the vote tables."""
+        out = StringIO()
+        call_command("generate_load_data", "--users", "50", "--questions", "20", "--votes", "400",
+                     "--sentiments", "200", "--tags", "5", stdout=out)
+        self.assertIn("rows/s", out.getvalue())
+        self.assertEqual(User.objects.count(), 50)
+        self.assertEqual(Question.objects.count(), 20)
+        self.assertEqual(Vote.objects.count(), 400)
+        self.assertEqual(SentimentVote.objects.count(), 200)
+        self.assertEqual(list(find_choice_count_drift()), [])
+        self.assertEqual(list(find_sentiment_count_drift()), [])
+
+    def test_hot_polls(self):
+        """With a skew the first poll is the hottest, no poll gets two votes from one user."""
+        LoadDataGenerator(skew=1.5, **self.options).generate()
+        totals = list(Question.objects.order_by("pk").annotate(votes=Count("vote")).values_list("votes", flat=True))
+        self.assertEqual(totals[0], 50)
+        self.assertGreater(totals[0], totals[-1])
+        self.assertEqual(sum(totals), 400)
+
+    def test_same_seed_same_data(self):
+        """The same seed draws the same votes."""
+        LoadDataGenerator(seed=7, **self.options).generate()
+        first = self.snapshot()
+        for model in (Vote, SentimentVote, Question, User):
+            model.objects.all().delete()
+        LoadDataGenerator(seed=7, **self.options).generate()
+        self.assertEqual(self.snapshot(), first)
+        self.assertNotEqual(first, [])
+
+    def test_runs_with_other_seeds_add_up(self):
+        """A second run needs another seed or label, a taken one fails before writing."""
+        LoadDataGenerator(seed=1, **self.options).generate()
+        LoadDataGenerator(seed=2, **self.options).generate()
+        self.assertEqual(User.objects.count(), 100)
+        with self.assertRaisesMessage(CommandError, "Users named load-1-<n> exist already"):
+            call_command("generate_load_data", "--seed", "1", "--users", "5", "--questions", "2", stdout=StringIO())
+        self.assertEqual(User.objects.count(), 100)
+
+    def test_dropped_votes_are_reported(self):
+        """Votes beyond one per user and poll are skipped and reported."""
+        out = StringIO()
+        call_command("generate_load_data", "--users", "5", "--questions", "2", "--votes", "15",
+                     "--sentiments", "4", "--tags", "1", stdout=out)
+        self.assertEqual(Vote.objects.count(), 10)
+        self.assertIn("Skipped 5 of --votes 15", out.getvalue())
+        self.assertNotIn("--sentiments", out.getvalue())
@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .base import create_question
+from .. import metrics
+from ..log_handlers import JsonFormatter, QueueListenerHandler, SamplingFilter
+
+
+class SlowHandler(logging.Handler):
+    """Collects records, taking as long as a stalled disk."""
+
+    def __init__(self, delay=0.2):
+        super().__init__()
+        self.delay = delay
+        self.released = threading.Event()
+        self.records = []
+
+    def emit(self, record):
+        self.released.wait(self.delay)
+        self.records.append(record)
+
+
+class StalledHandler(SlowHandler):
+    """A SlowHandler that only stalls the listener thread, records written by the caller go through."""
+
+    def __init__(self):
+        super().__init__(delay=10)
+        self.caller = threading.get_ident()
+        self.taken = threading.Event()
+
+    def createLock(self):
+        # * No lock, so the caller is not held up behind the stalled listener.
+        self.lock = None
+
+    def emit(self, record):
+        if threading.get_ident() != self.caller:
+            self.taken.set()
+            self.released.wait(self.delay)
+        self.records.append(record)
+
+
+def make_record(msg, *args, level=logging.INFO, exc_info=None):
+    return logging.LogRecord("django.polls.votes", level, __file__, 1, msg, args, exc_info)
+
+
+class QueueListenerHandlerTest(SimpleTestCase):
+    def test_slow_handler_does_not_block(self):
+        target = SlowHandler()
+        handler = QueueListenerHandler([target])
+        started = time.perf_counter()
+        for number in range(5):
+            handler.handle(make_record("vote %d", number))
+        self.assertLess(time.perf_counter() - started, target.delay)
+        target.released.set()
+        handler.close()
+        self.assertEqual([record.getMessage() for record in target.records], [f"vote {n}" for n in range(5)])
+
+    def test_full_queue_drops(self):
+        target = SlowHandler(delay=10)
+        handler = QueueListenerHandler([target], queue_size=1)
+        for number in range(5):
+            handler.handle(make_record("vote %d", number))
+        # * One record is being written, one waits in the queue.
+        self.assertGreaterEqual(handler.dropped, 3)
+        target.released.set()
+        handler.close()
+
+    def test_full_queue_writes_warnings(self):
+        """Warnings and errors are written from the calling thread instead of being dropped."""
+        target = StalledHandler()
+        handler = QueueListenerHandler([target], queue_size=1)
+        handler.handle(make_record("vote 0"))
+        # * The listener is stuck writing "vote 0", the next record fills the queue.
+        self.assertTrue(target.taken.wait(5))
+        for number in (1, 2):
+            handler.handle(make_record("vote %d", number))
+        handler.handle(make_record("flush failed", level=logging.ERROR))
+        self.assertEqual([record.getMessage() for record in target.records], ["flush failed"])
+        self.assertEqual(handler.dropped, 1)
+        target.released.set()
+        handler.close()
+        self.assertEqual([record.getMessage() for record in target.records], ["flush failed", "vote 0", "vote 1"])
+
+    def test_stopped_handler_writes_directly(self):
+        """Records logged after the listener stopped, e.g. by another exit hook, are not lost."""
+        target = SlowHandler(delay=0)
+        handler = QueueListenerHandler([target])
+        handler.stop()
+        handler.handle(make_record("late"))
+        handler.close()
+        self.assertEqual([record.getMessage() for record in target.records], ["late"])
+
+    def test_queued_records_are_written_at_exit(self):
+        """The exit hook stops the listener, which writes every queued record before the process ends."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "polls.log")
+        script = (
+            "import logging, time\n"
+            "from polls.log_handlers import QueueListenerHandler\n"
+            "class Slow(logging.FileHandler):\n"
+            "    def emit(self, record):\n"
+            "        time.sleep(0.001)\n"
+            "        super().emit(record)\n"
+            f"handler = QueueListenerHandler([Slow({path!r})])\n"
+            "logger = logging.getLogger('exit')\n"
+            "logger.addHandler(handler)\n"
+            "logger.setLevel(logging.INFO)\n"
+            "for number in range(200):\n"
+            "    logger.info('record %d', number)\n"
+        )
+        subprocess.run([sys.executable, "-c", script], check=True, timeout=30,
+                       cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        with open(path) as stream:
+            self.assertEqual(len(stream.read().splitlines()), 200)
+
+    def test_dropped_records_are_counted_in_metrics(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        target = SlowHandler(delay=10)
+        handler = QueueListenerHandler([target], queue_size=1)
+        handler.name = "file_queued"
+        with override_settings(POLLS_METRICS_DIR=directory.name):
+            for number in range(5):
+                handler.handle(make_record("vote %d", number))
+            target.released.set()
+            handler.close()
+            key = ("polls_log_records_dropped_total", "", (("handler", "file_queued"),))
+            self.assertEqual(metrics.collect().get(key), handler.dropped)
+
+    def test_target_levels_are_respected(self):
+        target = SlowHandler(delay=0)
+        target.setLevel(logging.WARNING)
+        handler = QueueListenerHandler([target])
+        handler.handle(make_record("info"))
+        handler.handle(make_record("warning", level=logging.WARNING))
+        handler.close()
+        self.assertEqual([record.getMessage() for record in target.records], ["warning"])
+
+    def test_rejects_unconfigured_targets(self):
+        with self.assertRaises(ValueError):
+            QueueListenerHandler([{"class": "logging.StreamHandler"}])
+
+    def test_traceback_is_kept_as_text(self):
+        handler = QueueListenerHandler([SlowHandler(delay=0)])
+        self.addCleanup(handler.close)
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError as error:
+            record = handler.prepare(make_record("failed %s", "flush", exc_info=(type(error), error, None)))
+        self.assertEqual(record.msg, "failed flush")
+        self.assertIsNone(record.args)
+        self.assertIsNone(record.exc_info)
+        self.assertIn("RuntimeError: boom", record.exc_text)
+
+
+class JsonFormatterTest(SimpleTestCase):
+    def test_one_object_per_line(self):
+        line = JsonFormatter().format(make_record("User %s voted", "voter"))
+        self.assertNotIn("\n", line)
+        entry = json.loads(line)
+        self.assertEqual(entry["message"], "User voter voted")
+        self.assertEqual(entry["level"], "INFO")
+        self.assertEqual(entry["logger"], "django.polls.votes")
+
+
+class SamplingFilterTest(SimpleTestCase):
+    def test_rate(self):
+        self.assertTrue(SamplingFilter(1).filter(make_record("vote")))
+        self.assertFalse(SamplingFilter(0).filter(make_record("vote")))
+        self.assertTrue(SamplingFilter(0).filter(make_record("error", level=logging.ERROR)))
+
+
+class VoteLogTest(TestCase):
+    def test_votes_log_to_the_sampled_logger(self):
+        question = create_question("Logged?", day=-1)
+        choice = question.choice_set.create(choice_text="Yes")
+        self.client.force_login(User.objects.create_user(username="voter", password="secret"))
+        with self.assertLogs("django.polls.votes", logging.INFO) as logs:
+            self.client.post(reverse("polls:vote", args=(question.id,)), {"choice": choice.id})
+        self.assertEqual(logs.records[0].args, ("voter", "127.0.0.1", choice.id, question.id))
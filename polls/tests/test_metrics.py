@@ -0,0 +1,150 @@
+import os
+import tempfile
+import unittest
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .base import create_question
+from .. import metrics
+from ..models import Tag
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = override_settings(POLLS_METRICS_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def value(self, family, suffix="", **labels):
+        labels = tuple(sorted((name, str(label)) for name, label in labels.items()))
+        return metrics.collect().get((family, suffix, labels), 0.0)
+
+
+class MetricsFileTest(MetricsTestCase):
+    def test_counters_add_up(self):
+        metrics.inc("polls_votes_cast_total")
+        metrics.inc("polls_votes_cast_total", 2)
+        metrics.inc("polls_sentiment_votes_total", type="up")
+        self.assertEqual(self.value("polls_votes_cast_total"), 3)
+        self.assertEqual(self.value("polls_sentiment_votes_total", type="up"), 1)
+
+    def test_histogram_is_cumulative(self):
+        metrics.observe("polls_request_duration_seconds", 0.02, view="polls:index")
+        metrics.observe("polls_request_duration_seconds", 3, view="polls:index")
+        self.assertEqual(self.value("polls_request_duration_seconds", "_bucket", le="0.01", view="polls:index"), 0)
+        self.assertEqual(self.value("polls_request_duration_seconds", "_bucket", le="0.025", view="polls:index"), 1)
+        self.assertEqual(self.value("polls_request_duration_seconds", "_bucket", le="+Inf", view="polls:index"), 2)
+        self.assertEqual(self.value("polls_request_duration_seconds", "_count", view="polls:index"), 2)
+        self.assertAlmostEqual(self.value("polls_request_duration_seconds", "_sum", view="polls:index"), 3.02)
+
+    def test_files_of_every_process_are_summed(self):
+        """A file left by another process, alive or not, counts too."""
+        other = metrics.MetricsFile(os.path.join(self.directory, "metrics-999999.db"))
+        other.add([(metrics.make_key("polls_votes_cast_total", "", {}), 5)])
+        other.close()
+        metrics.inc("polls_votes_cast_total")
+        self.assertEqual(self.value("polls_votes_cast_total"), 6)
+
+    def test_reopened_file_carries_on(self):
+        path = os.path.join(self.directory, "metrics-999999.db")
+        first = metrics.MetricsFile(path)
+        first.add([(metrics.make_key("polls_votes_cast_total", "", {}), 1)])
+        first.close()
+        second = metrics.MetricsFile(path)
+        second.add([(metrics.make_key("polls_votes_cast_total", "", {}), 1)])
+        second.close()
+        self.assertEqual(self.value("polls_votes_cast_total"), 2)
+
+    def test_file_grows(self):
+        for number in range(2000):
+            metrics.inc("polls_db_queries_total", view=f"view-{number}")
+        self.assertEqual(self.value("polls_db_queries_total", view="view-1999"), 1)
+        self.assertEqual(sum(metrics.collect().values()), 2000)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs os.fork")
+    def test_forked_process_writes_its_own_file(self):
+        metrics.inc("polls_votes_cast_total")
+        pid = os.fork()
+        if pid == 0:
+            try:
+                metrics.inc("polls_votes_cast_total", 10)
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+        self.assertEqual(self.value("polls_votes_cast_total"), 11)
+
+    @override_settings(POLLS_METRICS_DIR="")
+    def test_disabled(self):
+        metrics.inc("polls_votes_cast_total")
+        self.assertEqual(metrics.collect(), {})
+
+
+class MetricsViewTest(MetricsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="voter", password="secret")
+        self.client.force_login(self.user)
+
+    def test_exposition_format(self):
+        metrics.inc("polls_page_cache_requests_total", result="hit")
+        metrics.inc("polls_page_cache_requests_total", result="hit")
+        metrics.inc("polls_page_cache_requests_total", result="hit")
+        metrics.inc("polls_page_cache_requests_total", result="miss")
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+        body = response.content.decode()
+        self.assertIn("# TYPE polls_votes_cast_total counter\n", body)
+        self.assertIn("# TYPE polls_request_duration_seconds histogram\n", body)
+        self.assertIn('polls_page_cache_requests_total{result="hit"} 3\n', body)
+        self.assertIn("polls_page_cache_hit_ratio 0.75\n", body)
+
+    def test_votes_and_requests_are_counted(self):
+        question = create_question("Metrics?", day=-1)
+        first, second = question.choice_set.create(choice_text="A"), question.choice_set.create(choice_text="B")
+        self.client.post(reverse("polls:vote", args=(question.id,)), {"choice": first.id})
+        self.client.post(reverse("polls:vote", args=(question.id,)), {"choice": second.id})
+        self.client.post(reverse("polls:upvote", args=(question.id,)))
+        self.client.post(reverse("polls:upvote", args=(question.id,)))
+        self.client.get(reverse("polls:index"))
+
+        self.assertEqual(self.value("polls_votes_cast_total"), 1)
+        self.assertEqual(self.value("polls_votes_changed_total"), 1)
+        # * The second upvote changes nothing.
+        self.assertEqual(self.value("polls_sentiment_votes_total", type="up"), 1)
+        self.assertEqual(self.value("polls_request_duration_seconds", "_count", view="polls:index"), 1)
+        self.assertGreater(self.value("polls_db_queries_total", view="polls:vote"), 0)
+        self.assertEqual(self.value("polls_page_cache_requests_total", result="miss"), 1)
+
+    def test_created_polls_are_counted(self):
+        self.client.post(reverse("polls:create_poll"), {
+            "question_text": "Is this a new poll?", "pub_date": "2024-01-01", "end_date": "2099-01-01",
+            "short_description": "New", "long_description": "New", "user_choice": "Yes, No",
+            "tags": [Tag.objects.create(tag_text="New").id],
+        })
+        self.assertEqual(self.value("polls_polls_created_total", source="form"), 1)
+
+
+class MetricsAccessTest(MetricsTestCase):
+    def test_other_addresses_are_refused(self):
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="203.0.113.5", HTTP_X_FORWARDED_FOR="127.0.0.1")
+        self.assertEqual(response.status_code, 403)
+
+    def test_staff_may_scrape_from_anywhere(self):
+        self.client.force_login(User.objects.create_user(username="admin", password="secret", is_staff=True))
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="203.0.113.5")
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(POLLS_METRICS_ALLOWED_IPS=["203.0.113.5"])
+    def test_allowed_address(self):
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="203.0.113.5")
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(POLLS_METRICS_DIR="")
+    def test_disabled_metrics_are_not_found(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
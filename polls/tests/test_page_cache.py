@@ -0,0 +1,170 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .base import create_question
+from .runner import with_cache
+from .. import page_cache
+from ..models import Question, Tag, Vote
+
+
+@with_cache
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="cache_user", password="aaa123321aaa")
+        cls.question = create_question("Cached question", day=-1)
+        cls.choice = cls.question.choice_set.create(choice_text="Cached choice")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_second_request_is_a_hit(self):
+        """The poll listing is read from the cache on the second request."""
+        self.client.get(reverse("polls:index"))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("polls:index"))
+        self.assertContains(response, "Cached question")
+        self.assertEqual(page_cache.get_stats(), {"hits": 1, "misses": 1})
+
+    def test_search_is_cached(self):
+        """Search results are cached per query."""
+        self.client.get(reverse("polls:search_poll"), {"q": "cached"})
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("polls:search_poll"), {"q": "cached"})
+        self.assertContains(response, "Found 1 Polls!")
+        response = self.client.get(reverse("polls:search_poll"), {"q": "nothing"})
+        self.assertContains(response, "Found 0 Polls!")
+
+    def test_question_change_invalidates(self):
+        """Saving a question shows up on the next request."""
+        self.client.get(reverse("polls:index"))
+        self.question.question_text = "Renamed question"
+        self.question.save()
+        response = self.client.get(reverse("polls:index"))
+        self.assertContains(response, "Renamed question")
+        self.assertEqual(page_cache.get_stats()["misses"], 2)
+
+    def test_vote_invalidates(self):
+        """A vote bumps the catalog version so participant counts stay current."""
+        self.client.get(reverse("polls:index"))
+        version = page_cache.get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            Vote.objects.cast(self.user, self.question.id, self.choice.id)
+        self.assertGreater(page_cache.get_catalog_version(), version)
+        response = self.client.get(reverse("polls:index"))
+        self.assertContains(response, "1 Participants")
+
+    def test_user_is_not_cached(self):
+        """The navbar is rendered per request, only the poll sections are shared."""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("polls:index"))
+        self.assertContains(response, "Hi! cache_user")
+        self.client.logout()
+        response = self.client.get(reverse("polls:index"))
+        self.assertNotContains(response, "cache_user")
+        self.assertContains(response, "Cached question")
+        self.assertEqual(page_cache.get_stats()["hits"], 1)
+
+    def test_fragment_has_its_own_entry(self):
+        """Infinite scroll gets the cards alone, not the cached sections."""
+        self.client.get(reverse("polls:index"))
+        response = self.client.get(reverse("polls:index"), HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        self.assertNotContains(response, "Top Polls Today")
+        self.assertContains(response, "Cached question")
+
+    @override_settings(POLLS_PAGE_CACHE_BUCKET=0)
+    def test_disabled(self):
+        """With a bucket of 0 nothing is cached or counted."""
+        self.client.get(reverse("polls:index"))
+        self.client.get(reverse("polls:index"))
+        self.assertEqual(page_cache.get_stats(), {"hits": 0, "misses": 0})
+
+    def test_bucket_ends_entry(self):
+        """Keys roll over at the end of a time bucket."""
+        request = self.client.get(reverse("polls:index")).wsgi_request
+        key, left = page_cache.make_key("index", request, now=120.5)
+        later, _ = page_cache.make_key("index", request, now=180.5)
+        self.assertNotEqual(key, later)
+        self.assertAlmostEqual(left, 59.5)
+
+    def test_key_ignores_unread_parameters(self):
+        """Parameters the listing doesn't read share its entry, and stay out of the next page link."""
+        factory = RequestFactory()
+        plain = factory.get(reverse("polls:search_poll"), {"q": "poll"})
+        tracked = factory.get(reverse("polls:search_poll"), {"utm_source": "mail", "q": "poll", "_": "1"})
+        other = factory.get(reverse("polls:search_poll"), {"q": "other"})
+        key = page_cache.make_key("search", plain, now=0)[0]
+        self.assertEqual(page_cache.make_key("search", tracked, now=0)[0], key)
+        self.assertNotEqual(page_cache.make_key("search", other, now=0)[0], key)
+
+        for i in range(3):
+            create_question(f"Paged question {i}", day=-1)
+        with override_settings(POLLS_PAGE_SIZE=1):
+            response = self.client.get(reverse("polls:index"), {"utm_source": "mail"})
+        self.assertNotIn("utm_source", response.context["next_page_url"])
+
+
+@with_cache
+class PollCardCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="card_user", password="aaa123321aaa")
+        cls.voted = create_question("Voted question", day=-1)
+        cls.choice = cls.voted.choice_set.create(choice_text="Choice")
+        cls.other = create_question("Other question", day=-2)
+
+    def setUp(self):
+        cache.clear()
+
+    def card_key(self, question):
+        question.refresh_from_db()
+        return make_template_fragment_key("poll_card", [question.id, question.stats_version, False])
+
+    def test_vote_renders_one_card(self):
+        """A vote makes the card of its poll stale and leaves the others cached."""
+        self.client.get(reverse("polls:index"))
+        voted_key, other_key = self.card_key(self.voted), self.card_key(self.other)
+        self.assertIsNotNone(cache.get(voted_key))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Vote.objects.cast(self.user, self.voted.id, self.choice.id)
+        self.assertNotEqual(self.card_key(self.voted), voted_key)
+        self.assertEqual(self.card_key(self.other), other_key)
+
+        cache.set(other_key, "cached other card")
+        response = self.client.get(reverse("polls:index"))
+        self.assertContains(response, "cached other card")
+        self.assertContains(response, "1 Participants")
+
+    def test_edit_bumps_version(self):
+        """Saving a question bumps its stats_version in the same UPDATE."""
+        version = Question.objects.get(pk=self.other.pk).stats_version
+        self.other.question_text = "Edited question"
+        self.other.save()
+        self.assertEqual(self.other.stats_version, version + 1)
+        self.other.save(update_fields=["question_text"])
+        self.assertEqual(Question.objects.get(pk=self.other.pk).stats_version, version + 2)
+
+    def test_tag_changes_bump_version(self):
+        """Adding, renaming and clearing tags make the card of the question stale."""
+        tag = Tag.objects.create(tag_text="Sports")
+        keys = {self.card_key(self.other)}
+        self.other.tags.add(tag)
+        keys.add(self.card_key(self.other))
+        tag.tag_text = "Games"
+        tag.save()
+        keys.add(self.card_key(self.other))
+        tag.question_set.clear()
+        keys.add(self.card_key(self.other))
+        self.assertEqual(len(keys), 4)
+
+    def test_countdown_is_rendered_by_the_browser(self):
+        """Cards carry the end date for countdown.js."""
+        self.other.end_date = self.other.pub_date + timezone.timedelta(days=3)
+        self.other.save()
+        response = self.client.get(reverse("polls:index"))
+        self.assertContains(response, f'data-end-date="{self.other.end_date.isoformat()}"')
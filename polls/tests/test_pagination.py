@@ -0,0 +1,54 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Question
+
+
+@override_settings(POLLS_PAGE_SIZE=2)
+class KeysetPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.questions = [
+            Question.objects.create(question_text=f"Question {i}", pub_date=now - timezone.timedelta(hours=i))
+            for i in range(5)
+        ]
+
+    def collect_pages(self, url):
+        """Follow next_page_url from `url` and return the questions of every page."""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            if "latest_question_list" in response.context:
+                pages.append(list(response.context["latest_question_list"]["all_poll"]))
+            else:
+                pages.append(list(response.context["results"]))
+            url = response.context["next_page_url"]
+        return pages
+
+    def test_index_pages_follow_cursor(self):
+        """Index pages are newest first and the cursor walks every poll exactly once."""
+        pages = self.collect_pages(reverse("polls:index"))
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(sum(pages, []), self.questions)
+
+    def test_search_with_empty_query_is_paginated(self):
+        pages = self.collect_pages(reverse("polls:search_poll") + "?q=")
+        self.assertEqual(sum(pages, []), self.questions)
+
+    def test_pages_split_equal_publish_dates(self):
+        """Polls sharing a pub_date are ordered by id and never skipped or repeated."""
+        Question.objects.update(pub_date=timezone.now() - timezone.timedelta(days=1))
+        pages = self.collect_pages(reverse("polls:index"))
+        self.assertEqual(sum(pages, []), sorted(self.questions, key=lambda question: -question.pk))
+
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.client.get(reverse("polls:index"), {"cursor": "not-a-cursor"})
+        self.assertEqual(list(response.context["latest_question_list"]["all_poll"]), self.questions[:2])
+
+    def test_fragment_request_renders_cards_only(self):
+        response = self.client.get(reverse("polls:index"), headers={"X-Requested-With": "XMLHttpRequest"})
+        self.assertTemplateUsed(response, "polls/includes/index_poll_cards.html")
+        self.assertTemplateNotUsed(response, "polls/index.html")
+        self.assertContains(response, "data-next-page")
@@ -0,0 +1,46 @@
+import re
+import unittest
+
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+from django.contrib.auth.models import User
+
+from ..models import Question, Vote
+from ..pagination import rows_after
+from ..views import IndexView
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite specific")
+class HotQueryPlanTest(TestCase):
+    """Check with EXPLAIN QUERY PLAN that the hot listing and vote queries use an index."""
+
+    def assertUsesIndex(self, queryset, index):
+        """Assert the plan searches `index` (a name or the searched columns) and scans no polls table."""
+        plan = queryset.explain()
+        self.assertRegex(plan, rf"SEARCH polls_\w+ USING (COVERING )?INDEX .*{re.escape(index)}")
+        self.assertIsNone(re.search(r"SCAN polls_(question|vote)\b", plan), plan)
+
+    def test_active_window_listing(self):
+        queryset = Question.objects.active(timezone.now()).with_stats().order_by("-pub_date")
+        self.assertUsesIndex(queryset, "polls_question_window_idx")
+
+    def test_keyset_page_after_cursor(self):
+        """A deep keyset page seeks into the window index instead of scanning past earlier rows."""
+        now = timezone.now()
+        queryset = rows_after(Question.objects.active(now), now, 100)[:25]
+        self.assertUsesIndex(queryset, "polls_question_window_idx (pub_date<?)")
+
+    def test_trending_listing(self):
+        """The trending block reads the score range above the threshold from the trend index."""
+        queryset = IndexView(request=RequestFactory().get("/")).get_queryset()["trend_poll"]
+        self.assertUsesIndex(queryset, "polls_question_trend_idx (trend_score>?)")
+
+    def test_vote_lookup_by_user_and_question(self):
+        user = User.objects.create_user(username="plan_user", password="aaa123321aaa")
+        question = Question.objects.create(question_text="Plan question")
+        self.assertUsesIndex(Vote.objects.filter(user=user, question=question), "(question_id=? AND user_id=?)")
+
+    def test_participant_count(self):
+        question = Question.objects.create(question_text="Plan question")
+        self.assertUsesIndex(question.vote_set.all(), "(question_id=?)")
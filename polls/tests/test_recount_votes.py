@@ -0,0 +1,44 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.contrib.auth.models import User
+
+from .base import create_question
+from ..models import Choice, Vote
+
+
+class RecountVotesCommandTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.question = create_question(question_text="Recount question")
+        cls.choice1 = Choice.objects.create(question=cls.question, choice_text="Choice 1")
+        cls.choice2 = Choice.objects.create(question=cls.question, choice_text="Choice 2")
+        for i in range(3):
+            user = User.objects.create_user(username=f"recount_user_{i}", password="aaa123321aaa")
+            choice = cls.choice1 if i < 2 else cls.choice2
+            Vote.objects.create(user=user, question=cls.question, choice=choice)
+
+    def test_check_reports_drift(self):
+        """recount_votes --check fails when counters disagree with the Vote table."""
+        with self.assertRaises(CommandError):
+            call_command("recount_votes", "--check", stdout=StringIO())
+
+    def test_rebuild_fixes_drift(self):
+        """recount_votes rebuilds the counters from the Vote table."""
+        call_command("recount_votes", stdout=StringIO())
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 2)
+        self.assertEqual(self.choice2.votes, 1)
+        call_command("recount_votes", "--check", stdout=StringIO())
+
+    def test_rebuild_fixes_sentiment_drift(self):
+        """recount_votes rebuilds the up/down tallies from the SentimentVote table."""
+        user = User.objects.get(username="recount_user_0")
+        self.question.sentimentvote_set.create(user=user, vote_types=False)
+        call_command("recount_votes", stdout=StringIO())
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.up_vote_count, 0)
+        self.assertEqual(self.question.down_vote_count, 1)
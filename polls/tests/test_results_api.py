@@ -0,0 +1,61 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from ..models import Choice, Question, Vote
+from .base import create_question
+
+
+class ResultsJsonTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.question = create_question(question_text="Api Question", day=-1)
+        cls.choice1 = Choice.objects.create(question=cls.question, choice_text="Api Choice 1")
+        cls.choice2 = Choice.objects.create(question=cls.question, choice_text="Api Choice 2")
+        cls.user = User.objects.create_user(username="api_user", password="aaa123321aaa")
+        cls.other = User.objects.create_user(username="api_other", password="aaa123321aaa")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse("polls:results_json", args=(self.question.id,))
+
+    def test_results_json(self):
+        Vote.objects.cast(self.user, self.question.id, self.choice1.id)
+        Vote.objects.cast(self.other, self.question.id, self.choice1.id)
+        self.question.upvote(self.user)
+
+        response = self.client.get(self.url)
+        data = response.json()
+        self.assertEqual(data["participants"], 2)
+        self.assertEqual((data["up_votes"], data["down_votes"]), (1, 0))
+        self.assertEqual(data["choices"], [
+            {"id": self.choice1.id, "choice_text": "Api Choice 1", "votes": 2},
+            {"id": self.choice2.id, "choice_text": "Api Choice 2", "votes": 0},
+        ])
+        self.assertEqual(response["ETag"], f'"{self.question.id}-{data["version"]}"')
+
+    def test_unknown_question_is_404(self):
+        response = self.client.get(reverse("polls:results_json", args=(self.question.id + 100,)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_if_none_match_skips_vote_tables(self):
+        """A matching If-None-Match is answered with 304 from the question row alone."""
+        etag = self.client.get(self.url)["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([query for query in queries if "polls_vote" in query["sql"]
+                          or "polls_choice" in query["sql"]])
+
+    def test_votes_change_the_etag(self):
+        """Creating, switching and up/down votes all bump the version."""
+        etags = [self.client.get(self.url)["ETag"]]
+        Vote.objects.cast(self.user, self.question.id, self.choice1.id)
+        etags.append(self.client.get(self.url, headers={"If-None-Match": etags[-1]})["ETag"])
+        Vote.objects.cast(self.user, self.question.id, self.choice2.id)
+        etags.append(self.client.get(self.url)["ETag"])
+        Question.objects.get(pk=self.question.pk).downvote(self.user)
+        etags.append(self.client.get(self.url)["ETag"])
+        self.assertEqual(len(set(etags)), 4)
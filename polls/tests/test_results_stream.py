@@ -0,0 +1,104 @@
+import json
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from ..models import Choice, Vote
+from .base import create_question
+
+
+def read_event(events):
+    """Return the next (id, event, data) of a stream, skipping comments and retry hints."""
+    for chunk in events:
+        fields = dict(line.split(": ", 1) for line in chunk.decode().splitlines()
+                      if line and not line.startswith(":"))
+        if "event" in fields:
+            return fields["id"], fields["event"], json.loads(fields["data"])
+
+
+@override_settings(POLLS_RESULTS_STREAM=True, POLLS_RESULTS_STREAM_KEEPALIVE=1)
+class ResultsStreamTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.question = create_question(question_text="Live Question", day=-1)
+        cls.choice1 = Choice.objects.create(question=cls.question, choice_text="Live Choice 1")
+        cls.choice2 = Choice.objects.create(question=cls.question, choice_text="Live Choice 2")
+        cls.user = User.objects.create_user(username="live_user", password="aaa123321aaa")
+        cls.other = User.objects.create_user(username="live_other", password="aaa123321aaa")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+        self.url = reverse("polls:results_stream", args=(self.question.id,))
+
+    def open_stream(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        self.addCleanup(response.close)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        return iter(response.streaming_content)
+
+    def cast(self, user, choice):
+        with self.captureOnCommitCallbacks(execute=True):
+            Vote.objects.cast(user, self.question.id, choice.id)
+
+    def test_stream_requires_login(self):
+        self.client.logout()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_results_page_opens_the_stream(self):
+        response = self.client.get(reverse("polls:results", args=(self.question.id,)))
+        self.assertContains(response, f'data-results-stream="{self.url}"')
+
+    @override_settings(POLLS_RESULTS_STREAM=False)
+    def test_stream_off(self):
+        """Without the stream the page has no EventSource and the URL tells browsers not to reconnect."""
+        response = self.client.get(reverse("polls:results", args=(self.question.id,)))
+        self.assertNotContains(response, "data-results-stream")
+        self.assertNotContains(response, "results_stream.js")
+        self.assertEqual(self.client.get(self.url).status_code, 204)
+
+    def test_snapshot_then_deltas(self):
+        """A stream starts with the absolute counts and then pushes only what changed."""
+        self.cast(self.other, self.choice1)
+        events = self.open_stream()
+        _, event, data = read_event(events)
+        self.assertEqual(event, "snapshot")
+        self.assertEqual(data, {"c": {str(self.choice1.id): 1, str(self.choice2.id): 0}, "u": 0, "d": 0})
+
+        self.cast(self.user, self.choice2)
+        _, event, data = read_event(events)
+        self.assertEqual(event, "counts")
+        self.assertEqual(data, {"c": {str(self.choice2.id): 1}, "u": 0, "d": 0})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question.upvote(self.user)
+        self.assertEqual(read_event(events)[2], {"c": {}, "u": 1, "d": 0})
+
+    def test_resume_from_last_event_id(self):
+        """A reconnecting client only gets the events it missed."""
+        events = self.open_stream()
+        read_event(events)
+        self.cast(self.user, self.choice1)
+        last_event_id, _, _ = read_event(events)
+
+        self.cast(self.other, self.choice2)
+        self.cast(self.user, self.choice2)
+        resumed = self.open_stream(**{"Last-Event-ID": last_event_id})
+        self.assertEqual(read_event(resumed)[2], {"c": {str(self.choice2.id): 1}, "u": 0, "d": 0})
+        self.assertEqual(read_event(resumed)[2], {"c": {str(self.choice1.id): -1, str(self.choice2.id): 1},
+                                                  "u": 0, "d": 0})
+
+    def test_unknown_last_event_id_gets_snapshot(self):
+        events = self.open_stream(**{"Last-Event-ID": "stale-3"})
+        self.assertEqual(read_event(events)[1], "snapshot")
+
+    async def test_async_stream(self):
+        """Under ASGI the stream is an async iterator fed by the same broadcaster."""
+        response = await self.async_client.get(self.url)
+        events = aiter(response.streaming_content)
+        await anext(events)
+        fields = (await anext(events)).decode()
+        await events.aclose()
+        self.assertIn("event: snapshot", fields)
@@ -1,7 +1,15 @@
-from django.test import TestCase
+import unittest
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Question
+from ..models import Question, Tag
+from ..search import search_questions
 
 
 class SearchPollTest(TestCase):
@@ -21,3 +29,92 @@ class SearchPollTest(TestCase):
         data = {'q': ''}
         response = self.client.get(reverse("polls:search_poll"), data)
         self.assertQuerysetEqual(response.context['results'], Question.objects.all())
+
+    def test_search_query_count_is_constant(self):
+        """Search results render with a constant number of queries."""
+        for i in range(5):
+            Question.objects.create(question_text=f"what is poll {i}?")
+        # * One page of results and the tags of every card in one prefetch.
+        with self.assertNumQueries(2):
+            self.client.get(reverse("polls:search_poll"), {'q': 'what'})
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "Full-text search uses SQLite FTS5")
+class FullTextSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.title_match = Question.objects.create(question_text="Which programming language do you prefer?",
+                                                  short_description="Pick one")
+        cls.description_match = Question.objects.create(question_text="Best editor?",
+                                                        short_description="Pick the editor for programming")
+        cls.tag = Tag.objects.create(tag_text="football")
+        cls.tagged = Question.objects.create(question_text="Who wins the league?")
+        cls.tagged.tags.add(cls.tag)
+
+    def search(self, q):
+        return list(self.client.get(reverse("polls:search_poll"), {'q': q}).context['results'])
+
+    def test_prefix_match_ranked_by_field(self):
+        """Words match as prefixes and question_text matches rank above description matches."""
+        self.assertEqual(self.search("program"), [self.title_match, self.description_match])
+
+    def test_search_matches_tags(self):
+        self.assertEqual(self.search("foot"), [self.tagged])
+
+    def test_index_follows_edits_and_retagging(self):
+        """Edits, tag changes and tag renames are reflected without reindexing."""
+        self.description_match.question_text = "Best football boots?"
+        self.description_match.save()
+        self.tagged.tags.remove(self.tag)
+        self.assertEqual(self.search("football"), [self.description_match])
+
+        self.tagged.tags.add(self.tag)
+        self.tag.tag_text = "soccer"
+        self.tag.save()
+        self.assertEqual(self.search("soccer"), [self.tagged])
+
+    @override_settings(POLLS_PAGE_SIZE=1)
+    def test_ranked_results_are_paginated(self):
+        """Ranked results come one keyset page at a time, in rank order."""
+        response = self.client.get(reverse("polls:search_poll"), {'q': 'program'})
+        self.assertEqual(list(response.context['results']), [self.title_match])
+        self.assertContains(response, "Found 1+ Polls!")
+
+        response = self.client.get(response.context['next_page_url'])
+        self.assertEqual(list(response.context['results']), [self.description_match])
+        self.assertIsNone(response.context['next_page_url'])
+
+    def test_search_ignores_fts_syntax(self):
+        """FTS5 operators in user input are treated as plain words."""
+        self.assertEqual(self.search('"league" OR NOT*'), [])
+        self.assertEqual(self.search("league?"), [self.tagged])
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "Full-text search uses SQLite FTS5")
+class FixtureSearchTest(TestCase):
+    """The seed data links questions to tags before the tags are loaded."""
+
+    FIXTURES = [str(settings.BASE_DIR / "data" / name) for name in ("users.json", "polls.json", "vote.json")]
+    TAGS = ("Food", "Meme", "Singer", "Education", "Programming")
+
+    def assert_tags_found(self):
+        for tag in Tag.objects.filter(tag_text__in=self.TAGS):
+            self.assertCountEqual(search_questions(Question.objects.all(), tag.tag_text.lower()),
+                                  tag.question_set.all(), tag.tag_text)
+            self.assertTrue(tag.question_set.exists())
+
+    def test_loaddata(self):
+        call_command("loaddata", *self.FIXTURES, verbosity=0)
+        self.assert_tags_found()
+
+    def test_bulk_loaddata(self):
+        call_command("bulk_loaddata", *self.FIXTURES, verbosity=0, stdout=StringIO())
+        self.assert_tags_found()
+
+    def test_dropped_triggers_come_back(self):
+        """A rebuild of polls_question drops its triggers, the next migrate creates them again."""
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER polls_question_fts_insert")
+        emit_post_migrate_signal(verbosity=0, interactive=False, db="default")
+        question = Question.objects.create(question_text="Where do penguins live?")
+        self.assertEqual(list(search_questions(Question.objects.all(), "penguins")), [question])
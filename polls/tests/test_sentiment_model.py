@@ -1,6 +1,7 @@
 from django.test import TransactionTestCase, Client
 from django.contrib.auth.models import User
 
+from ..models import SentimentVote
 from .base import create_question
 
 
@@ -40,3 +41,43 @@ class UpDownVoteViewTest(TransactionTestCase):
         count_down = self.q1.sentimentvote_set.filter(vote_types=False).count()
         self.assertEqual(count_up, 1)
         self.assertEqual(count_down, 0)
+
+    def test_vote_updates_stored_tallies(self):
+        self.q1.upvote(self.user)
+        self.q1.refresh_from_db()
+        self.assertEqual(self.q1.up_vote_count, 1)
+        self.assertEqual(self.q1.down_vote_count, 0)
+
+    def test_change_vote_moves_stored_tallies(self):
+        self.q1.upvote(self.user)
+        self.q1.downvote(self.user)
+        self.q1.downvote(self.user)
+        self.q1.refresh_from_db()
+        self.assertEqual(self.q1.up_vote_count, 0)
+        self.assertEqual(self.q1.down_vote_count, 1)
+
+    def test_repeated_vote_is_one_statement(self):
+        """Voting the same way again only reads the vote, without a write or tally update."""
+        self.q1.upvote(self.user)
+        # * BEGIN, the lookup and COMMIT.
+        with self.assertNumQueries(3):
+            self.assertFalse(self.q1.upvote(self.user))
+
+    def test_set_sentiment_returns_previous_vote(self):
+        self.assertIsNone(SentimentVote.objects.set_sentiment(self.user, self.q1.pk, True))
+        self.assertTrue(SentimentVote.objects.set_sentiment(self.user, self.q1.pk, False))
+        self.assertFalse(SentimentVote.objects.set_sentiment(self.user, self.q1.pk, False))
+
+    def test_bulk_set_sentiment(self):
+        """The bulk variant creates and switches votes and moves the tallies by the net change."""
+        other = User.objects.create_user(username="other_user", password="12345abc")
+        self.q1.downvote(other)
+        changed = SentimentVote.objects.bulk_set_sentiment([
+            (self.q1.pk, self.user.pk, False),
+            (self.q1.pk, self.user.pk, True),
+            (self.q1.pk, other.pk, True),
+        ])
+        self.q1.refresh_from_db()
+        self.assertEqual(changed, 2)
+        self.assertEqual((self.q1.up_vote_count, self.q1.down_vote_count), (2, 0))
+        self.assertEqual(self.q1.sentimentvote_set.filter(vote_types=True).count(), 2)
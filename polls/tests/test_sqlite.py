@@ -0,0 +1,78 @@
+from unittest import mock
+
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .. import sqlite
+
+
+class PragmaTest(TransactionTestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    @override_settings(POLLS_SQLITE_TUNING=True)
+    def test_connection_is_tuned(self):
+        sqlite.tune_connection(sender=type(connection), connection=connection)
+        self.assertEqual(self.pragma("synchronous"), 1)  # NORMAL
+        self.assertEqual(self.pragma("temp_store"), 2)  # MEMORY
+        self.assertEqual(self.pragma("busy_timeout"), 5000)
+        self.assertEqual(self.pragma("cache_size"), sqlite.PRAGMAS["cache_size"])
+
+    def test_untuned_by_default(self):
+        """The profile is opt-in, the engine is the BEGIN IMMEDIATE capable backend either way."""
+        self.assertFalse(sqlite.is_enabled())
+        self.assertIsInstance(connections[DEFAULT_DB_ALIAS], sqlite.DatabaseWrapper)
+
+
+@override_settings(POLLS_SQLITE_TUNING=True)
+class ImmediateAtomicTest(TransactionTestCase):
+    def begins(self):
+        with CaptureQueriesContext(connection) as captured:
+            with sqlite.immediate_atomic():
+                with sqlite.immediate_atomic():
+                    pass
+        return [query["sql"] for query in captured if query["sql"].startswith("BEGIN")]
+
+    def test_begin_immediate(self):
+        """Only the outer block begins, nested ones are savepoints."""
+        self.assertEqual(self.begins(), ["BEGIN IMMEDIATE"])
+        # * The next plain atomic block is not affected.
+        with CaptureQueriesContext(connection) as captured:
+            with transaction.atomic():
+                pass
+        self.assertEqual(captured[0]["sql"], "BEGIN")
+
+    @override_settings(POLLS_SQLITE_TUNING=False)
+    def test_untuned_begin(self):
+        self.assertEqual(self.begins(), ["BEGIN"])
+
+
+@override_settings(POLLS_SQLITE_TUNING=True)
+@mock.patch("polls.sqlite.time.sleep")
+class WriteTransactionTest(TransactionTestCase):
+    def test_retries_lock_errors(self, sleep):
+        write = mock.Mock(side_effect=[OperationalError("database is locked"), "done"])
+        self.assertEqual(sqlite.write_transaction(write), "done")
+        self.assertEqual(write.call_count, 2)
+        sleep.assert_called_once()
+
+    def test_gives_up(self, sleep):
+        write = mock.Mock(side_effect=OperationalError("database is locked"))
+        with self.assertRaises(OperationalError):
+            sqlite.write_transaction(write, retries=2)
+        self.assertEqual(write.call_count, 3)
+
+    def test_other_errors_are_raised(self, sleep):
+        write = mock.Mock(side_effect=OperationalError("no such table: polls_vote"))
+        with self.assertRaises(OperationalError):
+            sqlite.write_transaction(write)
+        self.assertEqual(write.call_count, 1)
+
+    def test_no_retry_inside_a_transaction(self, sleep):
+        write = mock.Mock(side_effect=OperationalError("database is locked"))
+        with self.assertRaises(OperationalError), transaction.atomic():
+            sqlite.write_transaction(write)
+        self.assertEqual(write.call_count, 1)
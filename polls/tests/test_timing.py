@@ -0,0 +1,127 @@
+import threading
+
+from django.contrib.auth.models import User
+from django.template import engines
+from django.template.loader import get_template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .base import create_question
+from .. import timing
+from ..timing import Histogram, HistogramRegistry
+
+
+class HistogramTest(TestCase):
+    def test_percentiles(self):
+        """Percentiles are within one bucket, about 9%, of the exact value."""
+        histogram = Histogram()
+        for ms in range(1, 101):
+            histogram.record(ms)
+        self.assertEqual(histogram.count, 100)
+        self.assertAlmostEqual(histogram.percentile(0.5), 50, delta=50 * 0.1)
+        self.assertAlmostEqual(histogram.percentile(0.95), 95, delta=95 * 0.1)
+        self.assertEqual(histogram.percentile(1), 100)
+
+    def test_merge(self):
+        """Merging adds counts, so the merged percentiles match one histogram fed everything."""
+        first, second, both = Histogram(), Histogram(), Histogram()
+        for ms in (1, 2, 3):
+            first.record(ms)
+            both.record(ms)
+        for ms in (400, 500):
+            second.record(ms)
+            both.record(ms)
+        merged = Histogram().merge(first).merge(second)
+        self.assertEqual(merged.counts, both.counts)
+        self.assertEqual(merged.summary(), both.summary())
+
+    def test_threads_merge(self):
+        """Each thread records on its own, reads merge every thread."""
+        registry = HistogramRegistry()
+        timings = {part: 1.0 for part in timing.PARTS}
+
+        def work():
+            for _ in range(100):
+                registry.record("polls:index", timings)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(registry.merged()["polls:index"]["total"].count, 400)
+
+
+class ServerTimingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username="timing_staff", password="aaa123321aaa", is_staff=True)
+        cls.user = User.objects.create_user(username="timing_user", password="aaa123321aaa")
+        cls.question = create_question("Timed question", day=-1)
+
+    def setUp(self):
+        timing.registry.reset()
+
+    def test_server_timing_header(self):
+        """Responses to staff carry SQL, template and view time."""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("polls:index"))
+        header = response["Server-Timing"]
+        for part in ("sql;dur=", "template;dur=", "view;dur=", "total;dur="):
+            self.assertIn(part, header)
+        self.assertNotIn('desc="0 queries"', header)
+
+    def test_server_timing_is_for_staff_or_debug(self):
+        self.assertNotIn("Server-Timing", self.client.get(reverse("polls:index")))
+        self.client.force_login(self.user)
+        self.assertNotIn("Server-Timing", self.client.get(reverse("polls:index")))
+        with override_settings(DEBUG=True):
+            self.assertIn("Server-Timing", self.client.get(reverse("polls:index")))
+
+    def test_templates_are_timed_by_the_backend(self):
+        """Templates come from the timing backend, Django's Template class is left alone."""
+        self.assertIsInstance(engines["django"], timing.TimedDjangoTemplates)
+        self.assertIsInstance(get_template("polls/index.html"), timing.TimedTemplate)
+        timer = timing.RequestTimer()
+        token = timing._current.set(timer)
+        try:
+            engines["django"].from_string("{% for i in items %}{{ i }}{% endfor %}").render({"items": range(1000)})
+        finally:
+            timing._current.reset(token)
+        self.assertGreater(timer.template, 0)
+
+    def test_histograms_by_url_name(self):
+        self.client.get(reverse("polls:index"))
+        self.client.get(reverse("polls:index"))
+        histograms = timing.registry.merged()["polls:index"]
+        self.assertEqual(histograms["total"].count, 2)
+        self.assertGreater(histograms["template"].total, 0)
+        self.assertGreater(histograms["sql"].total, 0)
+
+    def test_timings_are_staff_only(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse("polls:request_timings")).status_code, 302)
+
+        self.client.get(reverse("polls:index"))
+        self.client.force_login(self.staff)
+        data = self.client.get(reverse("polls:request_timings")).json()
+        self.assertEqual(data["polls:index"]["total"]["count"], 1)
+        self.assertEqual(set(data["polls:index"]), set(timing.PARTS))
+
+
+@override_settings(ROOT_URLCONF="mysite.async_urls")
+class AsyncServerTimingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="timing_async", password="aaa123321aaa", is_staff=True)
+        cls.question = create_question("Timed async question", day=-1)
+
+    def setUp(self):
+        self.async_client.force_login(self.user)
+
+    async def test_async_views(self):
+        """Async views are timed too, with the SQL they run through sync_to_async."""
+        response = await self.async_client.get(reverse("polls:results", args=(self.question.pk,)))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("total;dur=", response["Server-Timing"])
+        self.assertNotIn('desc="0 queries"', response["Server-Timing"])
@@ -0,0 +1,95 @@
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from .base import create_question
+from .. import trending
+from ..models import Choice, Question
+
+
+class TrendScoreTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="trend_user", password="aaa123321aaa")
+
+    def test_new_question_starts_fresh(self):
+        """A new question starts at the fresh score."""
+        question = create_question(question_text="Fresh question")
+        self.assertAlmostEqual(question.trend_score, trending.FRESH_SCORE, places=2)
+
+    def test_sentiment_votes_update_score(self):
+        """Up votes add their weight, switching to a down vote removes it and adds the down weight."""
+        question = create_question(question_text="Sentiment question")
+        question.upvote(self.user)
+        question.refresh_from_db()
+        self.assertAlmostEqual(question.trend_score, trending.FRESH_SCORE + trending.UPVOTE_WEIGHT, places=2)
+
+        question.downvote(self.user)
+        question.refresh_from_db()
+        self.assertAlmostEqual(question.trend_score, trending.FRESH_SCORE + trending.DOWNVOTE_WEIGHT, places=2)
+
+    def test_choice_vote_updates_score(self):
+        """A new choice vote adds the choice vote weight."""
+        question = create_question(question_text="Choice question")
+        choice = Choice.objects.create(question=question, choice_text="Choice")
+        self.client.login(username="trend_user", password="aaa123321aaa")
+        self.client.post(reverse("polls:vote", args=(question.id,)), {"choice": choice.id})
+        question.refresh_from_db()
+        self.assertAlmostEqual(question.trend_score, trending.FRESH_SCORE + trending.CHOICE_VOTE_WEIGHT, places=2)
+
+    def test_decay_command_halves_score_after_half_life(self):
+        """decay_trend_scores halves a score last updated one half-life ago."""
+        question = create_question(question_text="Old question")
+        Question.objects.filter(pk=question.pk).update(trend_updated=time.time() - trending.TREND_HALF_LIFE)
+        call_command("decay_trend_scores", stdout=StringIO())
+        question.refresh_from_db()
+        self.assertAlmostEqual(question.trend_score, trending.FRESH_SCORE / 2, places=1)
+
+    def test_decay_skips_scheduled_question(self):
+        """A question scheduled for later keeps its fresh score until it opens."""
+        question = create_question(question_text="Scheduled question", day=5)
+        call_command("decay_trend_scores", stdout=StringIO())
+        question.refresh_from_db()
+        self.assertAlmostEqual(question.trend_score, trending.FRESH_SCORE, places=2)
+
+    def test_index_orders_trending_by_score(self):
+        """The trending block lists the highest score first."""
+        other_user = User.objects.create_user(username="trend_user_2", password="aaa123321aaa")
+        quiet = create_question(question_text="Quiet question")
+        popular = create_question(question_text="Popular question")
+        quiet.upvote(self.user)
+        popular.upvote(self.user)
+        popular.upvote(other_user)
+        response = self.client.get(reverse("polls:index"))
+        self.assertEqual(list(response.context["latest_question_list"]["trend_poll"]), [popular, quiet])
+
+    def test_new_question_is_trending(self):
+        """A new poll without votes shows in the trending block until it has decayed for a half-life."""
+        fresh = create_question(question_text="Fresh question")
+        stale = create_question(question_text="Stale question")
+        Question.objects.filter(pk=stale.pk).update(
+            trend_score=trending.TRENDING_THRESHOLD - 1)
+        response = self.client.get(reverse("polls:index"))
+        self.assertEqual(list(response.context["latest_question_list"]["trend_poll"]), [fresh])
+
+    def test_trending_score_matches_incremental_score(self):
+        """Rebuilding the score from the tallies gives the score the votes built up."""
+        question = create_question(question_text="Rebuilt question")
+        choice = Choice.objects.create(question=question, choice_text="Choice")
+        self.client.login(username="trend_user", password="aaa123321aaa")
+        self.client.post(reverse("polls:vote", args=(question.id,)), {"choice": choice.id})
+        question.upvote(self.user)
+        question.refresh_from_db()
+        self.assertAlmostEqual(question.trending_score(), question.trend_score, places=2)
+
+    def test_trending_decays_without_the_command(self):
+        """A stored score the decay command hasn't touched for two half-lives no longer trends."""
+        old = create_question(question_text="Old question")
+        Question.objects.filter(pk=old.pk).update(trend_updated=time.time() - 2 * trending.TREND_HALF_LIFE)
+        fresh = create_question(question_text="Fresh question")
+        response = self.client.get(reverse("polls:index"))
+        self.assertEqual(list(response.context["latest_question_list"]["trend_poll"]), [fresh])
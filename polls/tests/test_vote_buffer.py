@@ -0,0 +1,193 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from ..counters import find_choice_count_drift
+from ..models import Choice, Question, SentimentVote, Vote
+from ..vote_buffer import CHOICE, SENTIMENT, VoteBuffer, _lock, get_buffer, write_batch
+from .base import create_question
+
+
+class VoteBufferTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.question = create_question(question_text="Buffered Question", day=-1)
+        cls.choice1 = Choice.objects.create(question=cls.question, choice_text="Buffered Choice 1")
+        cls.choice2 = Choice.objects.create(question=cls.question, choice_text="Buffered Choice 2")
+        cls.user = User.objects.create_user(username="buffer_user", password="aaa123321aaa")
+
+    def setUp(self):
+        self.journal_dir = self.enterContext(tempfile.TemporaryDirectory())
+        # * No background thread, each test flushes the buffer itself.
+        self.enterContext(self.settings(POLLS_VOTE_WRITE_BEHIND=True, POLLS_VOTE_BUFFER_DIR=self.journal_dir,
+                                        POLLS_VOTE_FLUSH_INTERVAL=0))
+        self.client.force_login(self.user)
+
+    def test_vote_is_written_on_flush(self):
+        """A buffered vote only reaches the database when the buffer is flushed."""
+        self.client.post(reverse("polls:vote", args=(self.question.id,)), {"choice": self.choice1.id})
+        self.assertFalse(Vote.objects.exists())
+
+        self.assertEqual(get_buffer().flush(), 1)
+        self.choice1.refresh_from_db()
+        self.assertEqual(Vote.objects.get(user=self.user).choice, self.choice1)
+        self.assertEqual(self.choice1.votes, 1)
+
+    def test_user_sees_buffered_vote(self):
+        """The detail page shows the vote that is still in the buffer."""
+        self.client.post(reverse("polls:vote", args=(self.question.id,)), {"choice": self.choice2.id})
+        response = self.client.get(reverse("polls:detail", args=(self.question.id,)))
+        self.assertEqual(response.context["selected_choice"], self.choice2)
+        self.assertTrue(response.context["has_voted"])
+
+    def test_changed_vote_keeps_one_row(self):
+        """Only the latest vote of a user is written and the counters follow it."""
+        url = reverse("polls:vote", args=(self.question.id,))
+        self.client.post(url, {"choice": self.choice1.id})
+        get_buffer().flush()
+        self.client.post(url, {"choice": self.choice2.id})
+        get_buffer().flush()
+
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual(Vote.objects.filter(user=self.user).count(), 1)
+        self.assertEqual((self.choice1.votes, self.choice2.votes), (0, 1))
+
+    def test_flush_applies_deltas(self):
+        """A flush moves the counters by the batch, without counting the votes already stored."""
+        others = [User.objects.create_user(username=f"buffer_other_{i}") for i in range(3)]
+        Vote.objects.cast(others[0], self.question.id, self.choice1.id)
+        Vote.objects.cast(others[1], self.question.id, self.choice1.id)
+        batch = {
+            (CHOICE, self.question.id, others[0].id): self.choice2.id,  # moved
+            (CHOICE, self.question.id, others[1].id): self.choice1.id,  # unchanged
+            (CHOICE, self.question.id, others[2].id): self.choice2.id,  # new
+        }
+        with CaptureQueriesContext(connection) as captured:
+            write_batch(batch)
+        self.assertFalse([query for query in captured if "COUNT(" in query["sql"].upper()])
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual((self.choice1.votes, self.choice2.votes), (1, 2))
+        self.assertEqual(list(find_choice_count_drift()), [])
+
+    def test_invalid_choice_is_not_buffered(self):
+        other = create_question(question_text="Other Question", day=-1)
+        other_choice = Choice.objects.create(question=other, choice_text="Other Choice")
+        self.client.post(reverse("polls:vote", args=(self.question.id,)), {"choice": other_choice.id})
+        self.assertEqual(len(get_buffer()), 0)
+
+    def test_buffered_sentiment(self):
+        """Up and down votes are buffered, shown to the user and tallied on flush."""
+        self.client.post(reverse("polls:upvote", args=(self.question.id,)))
+        response = self.client.get(reverse("polls:results", args=(self.question.id,)))
+        self.assertEqual(response.context["user_voted"], "upvote")
+
+        self.client.post(reverse("polls:downvote", args=(self.question.id,)))
+        get_buffer().flush()
+        question = Question.objects.get(pk=self.question.pk)
+        self.assertEqual((question.up_vote_count, question.down_vote_count), (0, 1))
+        self.assertFalse(SentimentVote.objects.get(user=self.user).vote_types)
+
+    def test_replay_journal_of_dead_process(self):
+        """Votes journaled by a process that is gone are replayed and flushed."""
+        orphan = Path(self.journal_dir) / "votes-0.jsonl"
+        orphan.write_text(
+            json.dumps([CHOICE, self.question.id, self.user.id, self.choice1.id]) + "\n"
+            + json.dumps([SENTIMENT, self.question.id, self.user.id, True]) + "\n"
+            + '["choice", 1, '
+        )
+        buffer = VoteBuffer(self.journal_dir, flush_interval=0)
+        self.addCleanup(buffer.close)
+        self.assertFalse(orphan.exists())
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(Vote.objects.get(user=self.user).choice, self.choice1)
+        self.assertTrue(SentimentVote.objects.get(user=self.user).vote_types)
+
+
+class VoteBufferFlushTest(SimpleTestCase):
+    """Flushes racing with casts, with the database write replaced by a slow stand-in."""
+
+    def setUp(self):
+        self.journal_dir = self.enterContext(tempfile.TemporaryDirectory())
+        self.buffer = VoteBuffer(self.journal_dir, flush_interval=0)
+        self.addCleanup(self.buffer.close)
+        self.batches = []
+        self.enterContext(mock.patch("polls.vote_buffer.write_batch", side_effect=self.write_batch))
+
+    def assertLocked(self, path):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            self.assertFalse(_lock(fd), f"{path} is not locked")
+        finally:
+            os.close(fd)
+
+    def write_batch(self, batch):
+        # * Both journals stay locked while the batch is written, so a starting process replays neither.
+        for name in ("votes-%d.jsonl", "votes-%d.jsonl.flushing"):
+            self.assertLocked(Path(self.journal_dir) / (name % os.getpid()))
+        time.sleep(0.01)
+        self.batches.append(dict(batch))
+
+    def test_casts_during_flush(self):
+        """Every vote cast while batches are written ends up in exactly one batch."""
+        casts = 200
+
+        def cast(user_id):
+            for question_id in range(casts):
+                self.buffer.submit(CHOICE, question_id, user_id, question_id)
+
+        threads = [threading.Thread(target=cast, args=(user_id,)) for user_id in range(4)]
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            self.buffer.flush()
+        for thread in threads:
+            thread.join()
+        self.buffer.flush()
+
+        self.assertGreater(len(self.batches), 1)
+        written = [key for batch in self.batches for key in batch]
+        self.assertEqual(len(written), len(set(written)))
+        self.assertEqual(set(written), {(CHOICE, q, u) for q in range(casts) for u in range(4)})
+        self.assertEqual(list(Path(self.journal_dir).glob("*.flushing")), [])
+        self.assertEqual(Path(self.journal_dir, f"votes-{os.getpid()}.jsonl").read_text(), "")
+
+    def test_journals_are_locked_when_renamed(self):
+        """A journal never shows up under a name _replay() reads without its lock, not even mid-rotation."""
+        replace = os.replace
+
+        def checked_replace(source, destination):
+            replace(source, destination)
+            self.assertLocked(destination)
+
+        self.buffer.submit(CHOICE, 1, 1, 1)
+        with mock.patch("polls.vote_buffer.os.replace", side_effect=checked_replace) as patched:
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(patched.call_count, 2)
+
+    def test_starting_process_skips_live_journals(self):
+        """A buffer starting during a flush takes over no vote of the running one."""
+        self.buffer.submit(CHOICE, 1, 1, 1)
+        started = []
+
+        def write_batch(batch):
+            with mock.patch("polls.vote_buffer.os.getpid", return_value=0):
+                other = VoteBuffer(self.journal_dir, flush_interval=0)
+            started.append(len(other))
+            other.close()
+            self.batches.append(dict(batch))
+
+        with mock.patch("polls.vote_buffer.write_batch", side_effect=write_batch):
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(started, [0])
@@ -1,6 +1,7 @@
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 from .base import create_question
 from ..models import Vote, Choice
@@ -84,3 +85,74 @@ class VoteViewTest(TestCase):
 
         self.assertFalse(Vote.objects.filter(user=self.user, question=self.question, choice=self.choice1).exists())
         self.assertTrue(Vote.objects.filter(user=self.user, question=self.question, choice=self.choice2).exists())
+
+    def test_vote_updates_choice_counter(self):
+        """
+        Test that voting increments the stored counter of the selected choice.
+        """
+        self.client.login(username=self.user.username, password="aaa123321aaa")
+
+        self.client.post(reverse("polls:vote", args=(self.question.id,)), {"choice": self.choice1.id})
+
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 1)
+        self.assertEqual(self.choice2.votes, 0)
+
+    def test_change_vote_moves_choice_counter(self):
+        """
+        Test that changing the vote moves one count from the old choice to the new one.
+        """
+        self.client.login(username=self.user.username, password="aaa123321aaa")
+
+        self.client.post(reverse("polls:vote", args=(self.question.id,)), {"choice": self.choice1.id})
+        self.client.post(reverse("polls:vote", args=(self.question.id,)), {"choice": self.choice2.id})
+        self.client.post(reverse("polls:vote", args=(self.question.id,)), {"choice": self.choice2.id})
+
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 0)
+        self.assertEqual(self.choice2.votes, 1)
+
+
+class VoteCastTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.question = create_question(question_text="Cast Question", day=-1)
+        cls.choice1 = Choice.objects.create(question=cls.question, choice_text="Cast Choice 1")
+        cls.choice2 = Choice.objects.create(question=cls.question, choice_text="Cast Choice 2")
+        cls.user = User.objects.create_user(username="cast_user", password="aaa123321aaa")
+
+    def test_cast_reports_created_then_changed(self):
+        """cast reports a new vote, then the choice it replaced."""
+        first = Vote.objects.cast(self.user, self.question.id, self.choice1.id)
+        second = Vote.objects.cast(self.user, self.question.id, self.choice2.id)
+        self.assertTrue(first.created)
+        self.assertFalse(second.created)
+        self.assertEqual(second.previous_choice_id, self.choice1.id)
+        self.assertEqual(first.vote_id, second.vote_id)
+
+    def test_double_submit_keeps_one_vote(self):
+        """Submitting the same vote twice keeps one row and one count."""
+        Vote.objects.cast(self.user, self.question.id, self.choice1.id)
+        Vote.objects.cast(self.user, self.question.id, self.choice1.id)
+        self.choice1.refresh_from_db()
+        self.assertEqual(Vote.objects.filter(user=self.user, question=self.question).count(), 1)
+        self.assertEqual(self.choice1.votes, 1)
+
+    def test_cast_rejects_choice_of_other_question(self):
+        other = create_question(question_text="Other Question", day=-1)
+        other_choice = Choice.objects.create(question=other, choice_text="Other Choice")
+        self.assertIsNone(Vote.objects.cast(self.user, self.question.id, other_choice.id))
+        self.assertFalse(Vote.objects.exists())
+
+    def test_cast_rejects_closed_question(self):
+        self.question.end_date = timezone.now() - timezone.timedelta(hours=1)
+        self.question.save()
+        self.assertIsNone(Vote.objects.cast(self.user, self.question.id, self.choice1.id))
+        self.assertFalse(Vote.objects.exists())
+
+    def test_cast_query_budget(self):
+        """A new vote is the lookup of the old vote, one insert and the counter and trend updates."""
+        with self.assertNumQueries(6):
+            Vote.objects.cast(self.user, self.question.id, self.choice1.id)
@@ -0,0 +1,287 @@
+"""
+Per-request timing: how much of a request went to SQL, templates and the view.
+
+ServerTimingMiddleware starts a RequestTimer for every request and keeps it
+in a context variable, which follows the request into sync_to_async threads
+under ASGI. Two hooks add to the current timer:
+
+- every database connection gets an execute_wrapper when it is created,
+  timing each query, installed by install() from PollsConfig.ready() only
+  when the middleware is in MIDDLEWARE;
+- the TimedDjangoTemplates template backend, set as BACKEND in TEMPLATES,
+  times the outermost render of its templates. SQL run by lazy querysets
+  inside a template is counted as SQL, not as template time.
+
+Whatever is left of the total is view time. The three parts are sent in a
+Server-Timing header, so they show up in the browser's network panel, to
+staff users and when DEBUG is on, as they tell how the server spends its
+time. They are always recorded in histograms per URL name (e.g.
+"polls:index"). The total and the SQL load also go to the multi-process
+Prometheus metrics, see polls/metrics.py.
+
+Histograms have fixed log-spaced buckets, so recording is one list
+increment and two histograms merge by adding their counts. Each thread
+records into its own set, found through a thread local without a lock. The
+staff-only request_timings view merges the sets of every thread on read.
+"""
+
+import contextvars
+import math
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template.exceptions import TemplateDoesNotExist
+
+from . import metrics
+
+MIDDLEWARE = "polls.timing.ServerTimingMiddleware"
+PARTS = ("total", "sql", "template", "view")
+# * Bucket i holds durations up to SMALLEST_MS * 2 ** (i / SUB_BUCKETS), about 9% apart, up to ~70 minutes.
+SMALLEST_MS = 0.01
+SUB_BUCKETS = 8
+BUCKETS = 28 * SUB_BUCKETS
+
+_current = contextvars.ContextVar("polls_request_timer", default=None)
+
+
+class Histogram:
+    """
+    Latency histogram with fixed, log-spaced buckets.
+
+    Attributes:
+        count (int): Number of recorded durations.
+        total (float): Sum of the recorded durations in milliseconds.
+        max (float): Largest recorded duration in milliseconds.
+    """
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @staticmethod
+    def bucket(ms):
+        if ms <= SMALLEST_MS:
+            return 0
+        return min(math.ceil(math.log2(ms / SMALLEST_MS) * SUB_BUCKETS), BUCKETS - 1)
+
+    @staticmethod
+    def upper_bound(bucket):
+        return SMALLEST_MS * 2 ** (bucket / SUB_BUCKETS)
+
+    def record(self, ms):
+        self.counts[self.bucket(ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def merge(self, other):
+        """Add the durations of `other` to this histogram, return self."""
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentile(self, fraction):
+        """Return the upper bound of the bucket holding the `fraction` percentile, in milliseconds."""
+        if not self.count:
+            return 0.0
+        rank = max(math.ceil(fraction * self.count), 1)
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.upper_bound(bucket), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.5), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "max_ms": round(self.max, 3),
+        }
+
+
+class HistogramRegistry:
+    """The histograms of every thread, by URL name and part."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = defaultdict(lambda: {part: Histogram() for part in PARTS})
+            # * The only lock, taken once per thread.
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def record(self, name, timings):
+        histograms = self._shard()[name]
+        for part in PARTS:
+            histograms[part].record(timings[part])
+
+    def merged(self):
+        """Return {URL name: {part: Histogram}} over every thread."""
+        with self._lock:
+            shards = list(self._shards)
+        merged = defaultdict(lambda: {part: Histogram() for part in PARTS})
+        for shard in shards:
+            for name, histograms in list(shard.items()):
+                for part in PARTS:
+                    merged[name][part].merge(histograms[part])
+        return dict(merged)
+
+    def reset(self):
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+
+registry = HistogramRegistry()
+
+
+class RequestTimer:
+    """Milliseconds spent on SQL and templates in one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql = 0.0
+        self.queries = 0
+        self.template = 0.0
+        self.rendering = False
+
+    def finish(self):
+        """Return the total, sql, template and view times in milliseconds."""
+        total = (time.perf_counter() - self.started) * 1000
+        return {"total": total, "sql": self.sql, "template": self.template,
+                "view": max(total - self.sql - self.template, 0.0)}
+
+
+def time_query(execute, sql, params, many, context):
+    """execute_wrapper that adds the query time to the current request."""
+    timer = _current.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.sql += (time.perf_counter() - started) * 1000
+        timer.queries += 1
+
+
+def install_query_timer(sender, connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class TimedTemplate(Template):
+    """Template of TimedDjangoTemplates, adds its render time to the current request."""
+
+    def render(self, context=None, request=None):
+        timer = _current.get()
+        if timer is None or timer.rendering:
+            return super().render(context, request)
+        timer.rendering = True
+        started, sql = time.perf_counter(), timer.sql
+        try:
+            return super().render(context, request)
+        finally:
+            timer.rendering = False
+            timer.template += (time.perf_counter() - started) * 1000 - (timer.sql - sql)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend with TimedTemplate templates. Outside a timed request it costs one lookup."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def install():
+    """Add the SQL hook, once. Called from PollsConfig.ready() when MIDDLEWARE is configured."""
+    connection_created.connect(install_query_timer, dispatch_uid="polls.timing")
+    for connection in connections.all(initialized_only=True):
+        install_query_timer(None, connection)
+
+
+def show_server_timing(request):
+    """Return True when the Server-Timing header may be sent: with DEBUG on or to staff users."""
+    if settings.DEBUG:
+        return True
+    user = getattr(request, "user", None)
+    return bool(user and user.is_staff)
+
+
+def format_server_timing(timings, queries):
+    """Return the Server-Timing header value for the timings of a request."""
+    return (f'sql;dur={timings["sql"]:.1f};desc="{queries} queries", '
+            f'template;dur={timings["template"]:.1f}, view;dur={timings["view"]:.1f}, '
+            f'total;dur={timings["total"]:.1f}')
+
+
+class ServerTimingMiddleware:
+    """Time every request, record it by URL name and add a Server-Timing header for staff or DEBUG."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = RequestTimer()
+        token = _current.set(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timer, show_server_timing(request))
+
+    async def __acall__(self, request):
+        timer = RequestTimer()
+        token = _current.set(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        # * Reading request.user may load the session and the user from the database.
+        show = settings.DEBUG or await sync_to_async(show_server_timing)(request)
+        return self.finish(request, response, timer, show)
+
+    def finish(self, request, response, timer, show):
+        timings = timer.finish()
+        match = getattr(request, "resolver_match", None)
+        name = match.view_name if match else "unresolved"
+        registry.record(name, timings)
+        metrics.observe("polls_request_duration_seconds", timings["total"] / 1000, view=name)
+        metrics.inc("polls_db_queries_total", timer.queries, view=name)
+        metrics.inc("polls_db_query_seconds_total", timings["sql"] / 1000, view=name)
+        if show:
+            response["Server-Timing"] = format_server_timing(timings, timer.queries)
+        return response
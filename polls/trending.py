@@ -0,0 +1,72 @@
+"""
+Trend score engine for poll questions.
+
+A question's trend score is an exponentially decayed sum of activity. A new
+poll starts at FRESH_SCORE, every up vote, down vote and choice vote adds its
+weight, and the whole score halves every TREND_HALF_LIFE seconds. With the
+default half-life of a week, a poll nobody votes on drops from 100 to 75 after
+about three days and to 50 after a week, close to the old age buckets.
+
+Scores are stored on Question together with trend_updated, the Unix time the
+score was last decayed to. Votes update the score incrementally. The Trending
+block decays the stored scores to the current time as it reads them (see
+decayed_score()), so a poll stops trending even if nothing rewrites its row;
+the decay_trend_scores command only brings the stored values up to date.
+
+Decay only ever lowers a score, so a stored score below the threshold can
+never be trending. The Trending query first takes the indexed range
+trend_score >= TRENDING_THRESHOLD and then checks the decayed score.
+
+A poll counts as trending from TRENDING_THRESHOLD, half the fresh score: a
+new poll without votes shows in the Trending block for one half-life, votes
+keep it there longer and down votes push it out sooner.
+"""
+
+import time
+
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Greatest, Power
+
+TREND_HALF_LIFE = getattr(settings, "POLLS_TREND_HALF_LIFE", 7 * 24 * 60 * 60)
+
+FRESH_SCORE = 100.0
+TRENDING_THRESHOLD = FRESH_SCORE / 2
+UPVOTE_WEIGHT = 20.0
+DOWNVOTE_WEIGHT = -20.0
+CHOICE_VOTE_WEIGHT = 10.0
+
+
+def decay_factor(elapsed):
+    """Return the multiplier that decays a score over `elapsed` seconds."""
+    return 0.5 ** (max(elapsed, 0.0) / TREND_HALF_LIFE)
+
+
+def initial_score(pub_date, now=None):
+    """Return the score of a poll without votes, given its publish date."""
+    now = time.time() if now is None else now
+    return FRESH_SCORE * decay_factor(now - pub_date.timestamp())
+
+
+def decayed_score(now=None):
+    """Return an expression for the stored score decayed to `now`."""
+    now = time.time() if now is None else now
+    elapsed = Greatest(Value(now) - F("trend_updated"), Value(0.0))
+    return F("trend_score") * Power(Value(0.5), elapsed / Value(float(TREND_HALF_LIFE)))
+
+
+def decayed_updates(now=None, weight=0.0):
+    """
+    Return update() kwargs that decay the stored score to `now` and add `weight`.
+
+    Scores whose trend_updated lies in the future (polls scheduled to open
+    later) are left undecayed until that time comes.
+    """
+    now = time.time() if now is None else now
+    score = decayed_score(now)
+    if weight:
+        score = score + Value(weight)
+    return {
+        "trend_score": score,
+        "trend_updated": Greatest(F("trend_updated"), Value(now)),
+    }
@@ -1,16 +1,28 @@
 from django.urls import path
 
-from . import views
+from . import async_views, views
 
 app_name = "polls"
 urlpatterns = [
     path("", views.IndexView.as_view(), name="index"),
     path("<int:pk>/", views.DetailView.as_view(), name="detail"),
     path("<int:pk>/results/", views.ResultsView.as_view(), name="results"),
+    path("<int:pk>/results/stream/", views.results_stream, name="results_stream"),
+    path("<int:pk>/results.json", views.results_json, name="results_json"),
     path("<int:question_id>/vote/", views.vote, name="vote"),
     path("signup/", views.SignUpView.as_view(), name="signup"),
     path("upvote/<int:question_id>", views.up_down_vote, {'vote_type': 'upvote'}, name="upvote"),
     path("downvote/<int:question_id>", views.up_down_vote, {'vote_type': 'downvote'}, name="downvote"),
     path("search", views.search_poll, name="search_poll"),
-    path("create", views.create_poll, name="create_poll")
+    path("create", views.create_poll, name="create_poll"),
+    path("timings.json", views.request_timings, name="request_timings"),
+]
+
+# * Async versions of the vote and poll pages, served by mysite.async_urls when POLLS_ASYNC_VIEWS is on.
+async_urlpatterns = [
+    path("<int:pk>/", async_views.detail, name="detail"),
+    path("<int:pk>/results/", async_views.results, name="results"),
+    path("<int:question_id>/vote/", async_views.vote, name="vote"),
+    path("upvote/<int:question_id>", async_views.up_down_vote, {'vote_type': 'upvote'}, name="upvote"),
+    path("downvote/<int:question_id>", async_views.up_down_vote, {'vote_type': 'downvote'}, name="downvote"),
 ]
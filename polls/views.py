@@ -1,22 +1,63 @@
 import logging
 from typing import Any
 
-from django.http import Http404
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, QueryDict, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render, redirect
+from django.template.loader import render_to_string
 from django.views import generic
 from django.utils import timezone
 from django.urls import reverse_lazy, reverse
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.contrib.auth import authenticate, login
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
+from django.views.decorators.http import condition
 
+from . import metrics, page_cache, timing, trending, vote_buffer
+from .broadcast import broadcaster, is_stream_enabled
 from .forms import SignUpForm, PollSearchForm, PollCreateForm
-from .models import Choice, Question, Vote
+from .models import Choice, Question, SentimentVote, Vote
+from .pagination import paginate_keyset
+from .search import paginate_search
 
 
 logger = logging.getLogger("django")
+# * One record per vote, sampled with POLLS_VOTE_LOG_SAMPLE_RATE.
+vote_logger = logging.getLogger("django.polls.votes")
+
+
+def get_page_size():
+    """
+    Return the number of poll cards per keyset page.
+    """
+    return getattr(settings, "POLLS_PAGE_SIZE", 24)
+
+
+def is_fragment_request(request):
+    """
+    Return True when infinite scroll asks for the next page of cards only.
+    """
+    return request.headers.get("X-Requested-With") == "XMLHttpRequest"
+
+
+def get_next_page_url(request, page):
+    """
+    Return the URL of the page after `page`, keeping the other listing parameters.
+    Only the parameters that are part of the page cache key are kept, the link
+    is shared with every request for the same listing.
+    """
+    if not page.has_next:
+        return None
+    params = QueryDict(mutable=True)
+    for param, value in page_cache.get_listing_params(request):
+        params.appendlist(param, value)
+    params["cursor"] = page.next_cursor
+    return f"{request.path}?{params.urlencode()}"
 
 
 class IndexView(generic.ListView):
@@ -28,20 +69,48 @@ class IndexView(generic.ListView):
     def get_queryset(self):
         """
         Return the last published questions that is published and haven't ended yet.
+        The all polls list is one keyset page, see polls.pagination.
         """
         now = timezone.now()
-        all_poll_queryset = Question.objects.filter(
-            Q(pub_date__lte=now) & ((Q(end_date__gte=now) | Q(end_date=None)))
-        ).order_by("-pub_date")
+        active_queryset = Question.objects.active(now).with_stats().prefetch_related("tags")
+        self.page = paginate_keyset(active_queryset, self.request.GET.get("cursor"), get_page_size())
 
-        trend_poll_queryset = Question.objects.filter(
-            Q(pub_date__lte=now) & ((Q(end_date__gte=now) | Q(end_date=None))) & Q(trend_score__gte=100)
-        ).order_by("trend_score")[:3]
+        # * Scores decay as they are read, the stored ones only change when a vote or decay_trend_scores writes them.
+        trend_poll_queryset = active_queryset.filter(
+            trend_score__gte=trending.TRENDING_THRESHOLD
+        ).alias(current_score=trending.decayed_score()).filter(
+            current_score__gte=trending.TRENDING_THRESHOLD
+        ).order_by("-current_score")[:3]
 
-        queryset = {'all_poll': all_poll_queryset,
+        queryset = {'all_poll': self.page.object_list,
                     'trend_poll': trend_poll_queryset, }
         return queryset
 
+    def get(self, request, *args, **kwargs):
+        """
+        Serve the poll sections from the page cache, see polls/page_cache.py.
+        Only the navbar around them is rendered for each request.
+        """
+        def render_sections():
+            self.object_list = self.get_queryset()
+            return render_to_string(self.get_template_names(), self.get_context_data())
+
+        sections = page_cache.cached_render(request, "index", render_sections)
+        if is_fragment_request(request):
+            return HttpResponse(sections)
+        return render(request, self.template_name, {"poll_sections": sections})
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["next_page_url"] = get_next_page_url(self.request, self.page)
+        return context
+
+    def get_template_names(self):
+        """The shared poll sections, or only the cards of the next page for infinite scroll."""
+        if is_fragment_request(self.request):
+            return ["polls/includes/index_poll_cards.html"]
+        return ["polls/includes/index_sections.html"]
+
 
 class DetailView(LoginRequiredMixin, generic.DetailView):
     """
@@ -64,12 +133,13 @@ class DetailView(LoginRequiredMixin, generic.DetailView):
 
     def get_queryset(self):
         """
-        Excludes any questions that aren't published yet.
+        Excludes any questions that aren't published yet. The choices and the
+        user's vote are loaded with the question, see get_context_data().
         """
-        now = timezone.now()
-        return Question.objects.filter(
-            Q(pub_date__lte=now) & (Q(end_date__gte=now) | Q(end_date=None))
-        ).order_by("-pub_date")
+        user_choice = Vote.objects.filter(question=OuterRef("pk"), user=self.request.user.pk).values("choice_id")[:1]
+        return (Question.objects.active().order_by("-pub_date")
+                .annotate(user_choice_id=Subquery(user_choice))
+                .prefetch_related("choice_set"))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -84,24 +154,32 @@ class DetailView(LoginRequiredMixin, generic.DetailView):
         context["up_vote_count"] = question.up_vote_count
         context["down_vote_count"] = question.down_vote_count
 
-        user = self.request.user
-        selected_choice = None
-        has_voted = False
-
-        if user.is_authenticated:
-            try:
-                vote = question.vote_set.get(user=user)
-                selected_choice = vote.choice
-                has_voted = True
-            except Vote.DoesNotExist:
-                pass
+        # * A vote still waiting in the write-behind buffer wins over the stored one.
+        selected_choice_id = vote_buffer.buffered_choice(self.request.user, question.pk)
+        if selected_choice_id is None:
+            selected_choice_id = question.user_choice_id
+        selected_choice = next((choice for choice in question.choice_set.all() if choice.pk == selected_choice_id),
+                               None)
 
         context["selected_choice"] = selected_choice
-        context["has_voted"] = has_voted
+        context["has_voted"] = selected_choice is not None
 
         return context
 
 
+def get_results_queryset(user):
+    """
+    Load the question with its participant count, its choices and the
+    user's up/down vote, so the results page renders from a fixed number of queries.
+    Shared by ResultsView and the async results view.
+    """
+    user_sentiment = (SentimentVote.objects.filter(question=OuterRef("pk"), user=user.pk)
+                      .values("vote_types")[:1])
+    return (Question.objects.with_stats()
+            .annotate(user_sentiment=Subquery(user_sentiment))
+            .prefetch_related("choice_set"))
+
+
 class ResultsView(LoginRequiredMixin, generic.DetailView):
     """
     Provide a view for Result page, a Result for the poll contain poll participants
@@ -110,20 +188,90 @@ class ResultsView(LoginRequiredMixin, generic.DetailView):
     model = Question
     template_name = "polls/results.html"
 
+    def get_queryset(self):
+        return get_results_queryset(self.request.user)
+
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
 
-        user_voted = None
-        question = self.get_object()
-        if question.sentimentvote_set.filter(user=self.request.user, question=question, vote_types=True).exists():
-            user_voted = 'upvote'
-        elif question.sentimentvote_set.filter(user=self.request.user, question=question, vote_types=False).exists():
-            user_voted = 'downvote'
+        question = self.object
+        voted = vote_buffer.buffered_sentiment(self.request.user, question.pk)
+        if voted is None:
+            voted = question.user_sentiment
 
-        context['user_voted'] = user_voted
+        context['user_voted'] = None if voted is None else ('upvote' if voted else 'downvote')
+        context['results_stream'] = is_stream_enabled()
         return context
 
 
+def format_results_etag(pk, version):
+    return f'"{pk}-{version}"'
+
+
+def get_results_etag(request, pk):
+    """
+    Return the ETag of results_json() from Question.stats_version alone, so a
+    matching If-None-Match is answered with 304 without reading the vote tables.
+    """
+    version = Question.objects.filter(pk=pk).values_list("stats_version", flat=True).first()
+    return None if version is None else format_results_etag(pk, version)
+
+
+@login_required
+@condition(etag_func=get_results_etag)
+def results_json(request, pk):
+    """
+    Return the choices with their vote counts, the up/down tallies and the
+    participants of a poll as JSON, read from the stored counters in one query.
+    """
+    rows = list(Question.objects.filter(pk=pk).order_by("choice__id").values(
+        "question_text", "up_votes", "down_votes", "stats_version",
+        "choice__id", "choice__choice_text", "choice__vote_count",
+    ))
+    if not rows:
+        raise Http404("No question matches the given query.")
+
+    choices = [{"id": row["choice__id"], "choice_text": row["choice__choice_text"], "votes": row["choice__vote_count"]}
+               for row in rows if row["choice__id"] is not None]
+    question = rows[0]
+    response = JsonResponse({
+        "id": pk,
+        "question_text": question["question_text"],
+        "version": question["stats_version"],
+        # * Every Vote row is counted by exactly one choice.
+        "participants": sum(choice["votes"] for choice in choices),
+        "up_votes": question["up_votes"],
+        "down_votes": question["down_votes"],
+        "choices": choices,
+    })
+    # * Set from the row the body was built from, condition() keeps an ETag the view set.
+    response["ETag"] = format_results_etag(pk, question["stats_version"])
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+@login_required
+def results_stream(request, pk):
+    """
+    Stream live vote counts of a poll as Server-Sent Events, see polls/broadcast.py.
+    Browsers resume from the Last-Event-ID header when they reconnect.
+    Answers 204, which tells EventSource not to reconnect, when the stream is off.
+    """
+    if not is_stream_enabled():
+        return HttpResponse(status=204)
+    get_object_or_404(Question, pk=pk)
+    last_event_id = request.headers.get("Last-Event-ID")
+    if isinstance(request, ASGIRequest):
+        events = broadcaster.astream(pk, last_event_id)
+    else:
+        events = broadcaster.stream(pk, last_event_id)
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # * Stop nginx from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 class SignUpView(generic.CreateView):
     """
     View that responsible for Sign Up page.
@@ -147,42 +295,57 @@ def vote(request, question_id):
     in a specific question_id.
     """
     ip = get_client_ip(request)
-    question = get_object_or_404(Question, pk=question_id)
 
     if request.method == "POST":
         try:
-            selected_choice = question.choice_set.get(pk=request.POST["choice"])
-        except (KeyError, Choice.DoesNotExist):
-            logger.error(f"User {request.user.username} ({ip}) didn't select choice.")
-            messages.error(request, "You didn't select a choice.")
-            return redirect("polls:detail", question_id)
-
-        logger.info(f"User {request.user.username} ({ip}) select choice {selected_choice}")
-
-        if question.can_vote():
-            # ! Return 1. object element 2. boolean status of creation
-            vote, created = Vote.objects.update_or_create(
-                user=request.user,
-                question=question,
-                defaults={'choice': selected_choice}
-            )
-
-            if created:
-                logger.info(f"User {request.user.username} ({ip}) vote on choice {selected_choice}")
-                messages.success(request, "You voted successfully🥳")
-            else:
-                logger.info(f"User {request.user.username} ({ip}) update his answer to {selected_choice}")
-                messages.success(request, "You updated your vote🥳")
-
-            return redirect("polls:results", question_id)
-        else:
+            choice_id = int(request.POST["choice"])
+        except (KeyError, ValueError):
+            choice_id = None
+
+        # * One validated upsert, the question and choice are only loaded when it is rejected.
+        cast = vote_buffer.cast if vote_buffer.is_enabled() else Vote.objects.cast
+        result = cast(request.user, question_id, choice_id) if choice_id is not None else None
+
+        if result is None:
+            question = get_object_or_404(Question, pk=question_id)
+            if choice_id is None or not question.choice_set.filter(pk=choice_id).exists():
+                vote_logger.error("User %s (%s) didn't select choice.", request.user.username, ip)
+                messages.error(request, "You didn't select a choice.")
+                return redirect("polls:detail", question_id)
             messages.error(request, "You cannot vote on this question.")
             return redirect("polls:index")
+
+        metrics.inc("polls_votes_cast_total" if result.created else "polls_votes_changed_total")
+        if result.created:
+            vote_logger.info("User %s (%s) vote on choice %s in poll %s",
+                             request.user.username, ip, choice_id, question_id)
+            messages.success(request, "You voted successfully🥳")
+        else:
+            vote_logger.info("User %s (%s) update his answer to choice %s in poll %s",
+                             request.user.username, ip, choice_id, question_id)
+            messages.success(request, "You updated your vote🥳")
+
+        return redirect("polls:results", question_id)
     else:
+        get_object_or_404(Question, pk=question_id)
         messages.error(request, "Invalid request method.")
         return redirect("polls:index")
 
 
+def record_sentiment(question, user, up):
+    """
+    Record an up (True) or down (False) vote, through the write-behind buffer when it is on.
+    Return False if the user already had this vote.
+    """
+    if vote_buffer.is_enabled():
+        recorded = vote_buffer.set_sentiment(user, question.pk, up)
+    else:
+        recorded = question.upvote(user) if up else question.downvote(user)
+    if recorded:
+        metrics.inc("polls_sentiment_votes_total", type="up" if up else "down")
+    return recorded
+
+
 @login_required
 def up_down_vote(request, question_id, vote_type):
     """
@@ -192,10 +355,10 @@ def up_down_vote(request, question_id, vote_type):
 
     if request.method == "POST":
         if vote_type == "upvote":
-            if question.upvote(request.user):
+            if record_sentiment(question, request.user, True):
                 messages.success(request, "You upvoted this Poll😊")
         elif vote_type == "downvote":
-            if question.downvote(request.user):
+            if record_sentiment(question, request.user, False):
                 messages.success(request, "You downvoted this Poll😭")
 
     return redirect(reverse("polls:results", args=(question_id,)))
@@ -221,24 +384,32 @@ def search_poll(request):
     """
     form = PollSearchForm
 
-    results = []
     q = ''
-    now = timezone.now()
     if 'q' in request.GET:
         form = PollSearchForm(request.GET)
         if form.is_valid():
             q = form.cleaned_data['q']
-            # Case insensitive (icontains)
-            results = Question.objects.filter(
-                Q(question_text__icontains=q) & Q(pub_date__lte=now)
-                & ((Q(end_date__gte=now) | Q(end_date=None)))
-            )
-    # * If user search with empty string then show every poll.
-    if q == '':
-        results = Question.objects.filter(
-            Q(pub_date__lte=now) & ((Q(end_date__gte=now) | Q(end_date=None)))
-        ).order_by("-pub_date")
-    return render(request, 'polls/search.html', {'form': form, 'results': results, 'q': q})
+
+    def render_results():
+        now = timezone.now()
+        listed = Question.objects.active(now).with_stats().prefetch_related("tags")
+        if q:
+            # * Ranked full-text search over text, descriptions and tags, one keyset page at a time.
+            page = paginate_search(listed, q, request.GET.get("cursor"), get_page_size())
+        else:
+            # * If user search with empty string then show every poll, one keyset page at a time.
+            page = paginate_keyset(listed, request.GET.get("cursor"), get_page_size())
+        results = page.object_list
+        next_page_url = get_next_page_url(request, page)
+        template = ('polls/includes/search_poll_cards.html' if is_fragment_request(request)
+                    else 'polls/includes/search_results.html')
+        return render_to_string(template, {'results': results, 'q': q, 'next_page_url': next_page_url})
+
+    # * The results are shared through the page cache, the form and navbar are rendered per request.
+    poll_results = page_cache.cached_render(request, "search", render_results)
+    if is_fragment_request(request):
+        return HttpResponse(poll_results)
+    return render(request, 'polls/search.html', {'form': form, 'q': q, 'poll_results': poll_results})
 
 
 @login_required
@@ -255,24 +426,50 @@ def create_poll(request):
             user_choices = form.cleaned_data['user_choice']
             tags = form.cleaned_data['tags']
 
-            question = Question.objects.create(
-                question_text=question_text,
-                pub_date=pub_date,
-                end_date=end_date,
-                short_description=short_description,
-                long_description=long_description,
-            )
-
-            choices = user_choices.split(',')  # Split with comma
-            for choice_text in choices:
-                Choice.objects.create(question=question, choice_text=choice_text.strip())
-
-            # Add  tags to the question
-            question.tags.set(tags)
-            logger.info(f"User {request.user.username} ({ip}) create poll : {question_text}")
+            # * All or nothing, and one commit instead of one per row.
+            with transaction.atomic():
+                question = Question.objects.create(
+                    question_text=question_text,
+                    pub_date=pub_date,
+                    end_date=end_date,
+                    short_description=short_description,
+                    long_description=long_description,
+                )
+
+                choices = user_choices.split(',')  # Split with comma
+                Choice.objects.bulk_create([Choice(question=question, choice_text=choice_text.strip())
+                                            for choice_text in choices if choice_text.strip()])
+
+                # Add  tags to the question
+                question.tags.set(tags)
+            metrics.inc("polls_polls_created_total", source="form")
+            logger.info("User %s (%s) create poll : %s", request.user.username, ip, question_text)
             return redirect('polls:index')
 
     else:
         form = PollCreateForm()
 
     return render(request, 'polls/creation.html', {'form': form})
+
+
+def prometheus_metrics(request):
+    """
+    Return the vote, request, SQL and page cache metrics of every worker process
+    in the Prometheus text format. See polls/metrics.py.
+    """
+    if metrics.get_directory() is None:
+        raise Http404("Metrics are off.")
+    if not metrics.can_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@staff_member_required
+def request_timings(request):
+    """
+    Return the request timing histograms of this process per URL name as JSON,
+    with the total, SQL, template and view time of each. See polls/timing.py.
+    """
+    merged = timing.registry.merged()
+    return JsonResponse({name: {part: histogram.summary() for part, histogram in parts.items()}
+                         for name, parts in sorted(merged.items())})
@@ -0,0 +1,399 @@
+"""
+Write-behind buffer for poll votes.
+
+With POLLS_VOTE_WRITE_BEHIND on, the vote() and up_down_vote() views accept
+votes into a per-process buffer instead of committing one transaction per
+request. Every accepted vote is appended to a journal file first, so a vote
+survives a crash of the process, then kept in memory until a background
+thread writes the whole batch with one bulk upsert per vote table. A batch is
+flushed every POLLS_VOTE_FLUSH_INTERVAL milliseconds or as soon as
+POLLS_VOTE_FLUSH_SIZE votes are waiting.
+
+Only the latest vote of a user on a question is kept, so a batch holds at
+most one row per (question, user). Readers look the user's own vote up in
+the buffer before the database, see buffered_choice() and buffered_sentiment().
+Stored counters of other users' buffered votes catch up on the next flush.
+
+Journals are named after the process id. At startup, journals left behind by
+a process that is gone are replayed into the new buffer. Whether a journal is
+still in use is decided with an advisory file lock, held from before a
+journal file is visible until after it is removed, which needs fcntl. Without
+it (Windows) every journal in the directory is treated as left behind, so run
+one process per journal directory there.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, models
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import trending
+from .models import CastResult, Choice, Question, SentimentVote, Vote, notify_votes_changed
+from .sqlite import immediate_atomic
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger("django")
+
+CHOICE = "choice"
+SENTIMENT = "sentiment"
+
+
+def is_enabled():
+    """Return True when votes go through the write-behind buffer."""
+    return getattr(settings, "POLLS_VOTE_WRITE_BEHIND", False)
+
+
+def _lock(fd):
+    """Take the advisory lock on a journal, return False if another process holds it."""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+class VoteBuffer:
+    """
+    Journaled, in-memory buffer of pending votes.
+
+    Args:
+        directory (str): Directory holding the journal files.
+        flush_interval (int): Milliseconds between flushes. 0 disables the
+            background thread, callers then flush() themselves.
+        flush_size (int): Number of pending votes that triggers an early flush.
+        fsync (bool): fsync the journal after every vote. Without it a vote
+            survives a crash of the process but not of the machine.
+    """
+
+    def __init__(self, directory, flush_interval=200, flush_size=500, fsync=False):
+        self.directory = Path(directory)
+        self.flush_interval = flush_interval / 1000
+        self.flush_size = flush_size
+        self.fsync = fsync
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        # * (kind, question_id, user_id) -> choice id or vote_types
+        self._pending = {}
+        # * The batch being written, still visible to readers until it is committed.
+        self._flushing = {}
+        self._thread = None
+        self._closed = False
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._journal_path = self.directory / f"votes-{os.getpid()}.jsonl"
+        self._journal = self._open_journal()
+        self._replay()
+
+    def _open_journal(self):
+        """Create the journal locked under a name _replay() skips, then move it in place."""
+        new_path = self.directory / f".votes-{os.getpid()}.jsonl.new"
+        fd = os.open(new_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        _lock(fd)
+        if self._journal_path.exists():
+            # * Our own journal from before a restart with the same pid, keep its votes.
+            os.close(fd)
+            new_path.unlink()
+            fd = os.open(self._journal_path, os.O_WRONLY | os.O_APPEND)
+            _lock(fd)
+            return fd
+        os.replace(new_path, self._journal_path)
+        return fd
+
+    def _append(self, records):
+        data = "".join(json.dumps(record) + "\n" for record in records).encode()
+        os.write(self._journal, data)
+        if self.fsync:
+            os.fsync(self._journal)
+
+    def _replay(self):
+        """Load the journals of processes that are gone, then remove them."""
+        for path in sorted(self.directory.glob("votes-*.jsonl*")):
+            if path == self._journal_path:
+                continue
+            try:
+                fd = os.open(path, os.O_RDWR)
+            except FileNotFoundError:
+                continue
+            try:
+                # * Removed while we waited for it, its owner has written the votes.
+                if not _lock(fd) or os.fstat(fd).st_nlink == 0:
+                    continue
+                with open(fd, "r", closefd=False) as journal:
+                    records = []
+                    for line in journal:
+                        try:
+                            records.append(json.loads(line))
+                        except ValueError:
+                            # * The last line of a crashed process may be cut short.
+                            break
+                if records:
+                    self._append(records)
+                    for kind, question_id, user_id, value in records:
+                        self._pending[kind, question_id, user_id] = value
+                    logger.info("Replayed %d buffered vote(s) from %s", len(records), path.name)
+                path.unlink()
+            finally:
+                os.close(fd)
+
+    def submit(self, kind, question_id, user_id, value):
+        """
+        Accept a vote into the buffer.
+
+        Returns:
+            The value it replaces if the user already had a vote in the buffer,
+            else None.
+        """
+        key = (kind, question_id, user_id)
+        with self._lock:
+            self._append([[kind, question_id, user_id, value]])
+            previous = self._pending.get(key, self._flushing.get(key))
+            self._pending[key] = value
+            if len(self._pending) >= self.flush_size:
+                self._wakeup.notify()
+        self._ensure_thread()
+        return previous
+
+    def lookup(self, kind, question_id, user_id):
+        """Return the buffered value of a user's vote, None if nothing is buffered."""
+        key = (kind, question_id, user_id)
+        with self._lock:
+            return self._pending.get(key, self._flushing.get(key))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """
+        Write every pending vote to the database.
+
+        Returns:
+            int: The number of votes written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = self._flushing = self._pending
+                self._pending = {}
+                # * Votes accepted from now on go to a fresh journal. The old one is renamed
+                # * while its descriptor still holds the lock, so no starting process replays it.
+                flushing = self._journal
+                flushing_path = self._journal_path.with_suffix(".jsonl.flushing")
+                os.replace(self._journal_path, flushing_path)
+                self._journal = self._open_journal()
+
+            try:
+                write_batch(batch)
+            except Exception:
+                logger.exception("Failed to flush %d buffered vote(s), keeping them for the next flush", len(batch))
+                with self._lock:
+                    for key, value in batch.items():
+                        self._pending.setdefault(key, value)
+                    self._append([[*key, value] for key, value in self._pending.items()])
+                    self._flushing = {}
+                written = 0
+            else:
+                with self._lock:
+                    self._flushing = {}
+                written = len(batch)
+            # * Removed before the lock is released.
+            flushing_path.unlink()
+            os.close(flushing)
+            return written
+
+    def _ensure_thread(self):
+        if self._thread is not None or not self.flush_interval:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="polls-vote-flush", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._wakeup.wait_for(lambda: self._closed or len(self._pending) >= self.flush_size,
+                                      timeout=self.flush_interval)
+                if self._closed:
+                    return
+            close_old_connections()
+            self.flush()
+
+    def close(self):
+        """Stop the background thread, flush what is left and release the journal."""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._lock:
+            # * Keep the journal for the next start if the last flush failed, else remove it before the lock goes.
+            if not self._pending:
+                self._journal_path.unlink()
+            os.close(self._journal)
+
+
+def write_batch(batch):
+    """
+    Write a batch of buffered votes with one bulk upsert per vote table.
+
+    Votes whose choice or question has been deleted since they were accepted
+    are dropped. The choices of the existing votes are read first, so the
+    choice counters get +1/-1 deltas with one UPDATE, whatever the number of
+    votes already on the poll, and the trend score gets the weight of the new
+    votes. Up and down votes go through SentimentVote.objects.bulk_set_sentiment().
+    """
+    choice_votes = {(q, u): v for (kind, q, u), v in batch.items() if kind == CHOICE}
+    sentiments = {(q, u): v for (kind, q, u), v in batch.items() if kind == SENTIMENT}
+    weights = defaultdict(float)
+
+    # * BEGIN IMMEDIATE on SQLite, the batch reads before it writes. A locked database keeps the batch for later.
+    with immediate_atomic():
+        if choice_votes:
+            choice_questions = dict(Choice.objects.filter(pk__in=set(choice_votes.values()))
+                                    .values_list("pk", "question_id"))
+            choice_votes = {key: choice for key, choice in choice_votes.items()
+                            if choice_questions.get(choice) == key[0]}
+            existing = {(q, u): choice for q, u, choice in
+                        Vote.objects.filter(question_id__in={q for q, _ in choice_votes},
+                                            user_id__in={u for _, u in choice_votes})
+                        .values_list("question_id", "user_id", "choice_id")}
+            deltas = defaultdict(int)
+            for key, choice in choice_votes.items():
+                previous = existing.get(key)
+                if previous is None:
+                    weights[key[0]] += trending.CHOICE_VOTE_WEIGHT
+                elif previous != choice:
+                    deltas[previous] -= 1
+                else:
+                    continue
+                deltas[choice] += 1
+            Vote.objects.bulk_create(
+                [Vote(question_id=q, user_id=u, choice_id=choice) for (q, u), choice in choice_votes.items()],
+                update_conflicts=True, unique_fields=["question", "user"], update_fields=["choice"],
+            )
+
+        if sentiments:
+            live = set(Question.objects.filter(pk__in={q for q, _ in sentiments}).values_list("pk", flat=True))
+            SentimentVote.objects.bulk_set_sentiment((q, u, up) for (q, u), up in sentiments.items() if q in live)
+
+        if choice_votes:
+            question_ids = {q for q, _ in choice_votes}
+            by_delta = defaultdict(list)
+            for choice, delta in deltas.items():
+                if delta:
+                    by_delta[delta].append(choice)
+            if by_delta:
+                Choice.objects.filter(pk__in=[pk for pks in by_delta.values() for pk in pks]).update(
+                    vote_count=models.F("vote_count") + models.Case(
+                        *(models.When(pk__in=pks, then=models.Value(delta)) for delta, pks in by_delta.items()),
+                        default=models.Value(0),
+                    )
+                )
+            for question_id in question_ids:
+                Question.objects.filter(pk=question_id).update(
+                    stats_version=models.F("stats_version") + 1,
+                    **trending.decayed_updates(weight=weights[question_id]),
+                )
+            notify_votes_changed(question_ids)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Return the buffer of this process, created from the settings on first use."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = VoteBuffer(
+                    settings.POLLS_VOTE_BUFFER_DIR,
+                    flush_interval=getattr(settings, "POLLS_VOTE_FLUSH_INTERVAL", 200),
+                    flush_size=getattr(settings, "POLLS_VOTE_FLUSH_SIZE", 500),
+                    fsync=getattr(settings, "POLLS_VOTE_BUFFER_FSYNC", False),
+                )
+                atexit.register(_buffer.close)
+    return _buffer
+
+
+@receiver(setting_changed)
+def _reset_buffer(setting, **kwargs):
+    """Drop the buffer when the tests change its settings."""
+    global _buffer
+    if setting.startswith("POLLS_VOTE_") and _buffer is not None:
+        atexit.unregister(_buffer.close)
+        _buffer.close()
+        _buffer = None
+
+
+def cast(user, question_id, choice_id, now=None):
+    """
+    Buffered counterpart of Vote.objects.cast().
+
+    The choice is validated against the open question with one read, the vote
+    itself is only journaled. The returned CastResult has no vote id.
+    """
+    now = now or timezone.now()
+    valid = (Choice.objects.filter(pk=choice_id, question_id=question_id, question__pub_date__lte=now)
+             .filter(models.Q(question__end_date=None) | models.Q(question__end_date__gte=now))
+             .exists())
+    if not valid:
+        return None
+    previous = get_buffer().submit(CHOICE, question_id, user.pk, choice_id)
+    if previous is None:
+        previous = (Vote.objects.filter(question_id=question_id, user=user)
+                    .values_list("choice_id", flat=True).first())
+    return CastResult(None, previous is None, previous)
+
+
+def set_sentiment(user, question_id, up):
+    """
+    Buffered counterpart of Question.upvote() and downvote().
+
+    Returns:
+        bool: False if the user already had this vote, else True.
+    """
+    current = buffered_sentiment(user, question_id)
+    if current is None:
+        current = (SentimentVote.objects.filter(question_id=question_id, user=user)
+                   .values_list("vote_types", flat=True).first())
+    if current is up:
+        return False
+    get_buffer().submit(SENTIMENT, question_id, user.pk, up)
+    return True
+
+
+def buffered_choice(user, question_id):
+    """Return the choice id of the user's buffered vote, None if there is none or buffering is off."""
+    if not is_enabled() or not user.is_authenticated:
+        return None
+    return get_buffer().lookup(CHOICE, question_id, user.pk)
+
+
+def buffered_sentiment(user, question_id):
+    """Return the user's buffered up (True) or down (False) vote, None if there is none or buffering is off."""
+    if not is_enabled() or not user.is_authenticated:
+        return None
+    return get_buffer().lookup(SENTIMENT, question_id, user.pk)
@@ -63,4 +63,5 @@ python manage.py migrate
 python manage.py loaddata data/users.json
 python manage.py loaddata data/polls.json
 python manage.py loaddata data/vote.json
+python manage.py recount_votes
 python manage.py runserver --insecure
\ No newline at end of file
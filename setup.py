@@ -146,6 +146,7 @@ def main():
         subprocess.run([python_command, "manage.py", "loaddata", "data/users.json"])
         subprocess.run([python_command, "manage.py", "loaddata", "data/polls.json"])
         subprocess.run([python_command, "manage.py", "loaddata", "data/vote.json"])
+        subprocess.run([python_command, "manage.py", "recount_votes"])
 
         start_server = input("Do you want to start the Django server? (yes/no): ").lower()
         if start_server == "yes":
@@ -172,6 +173,7 @@ def main():
             subprocess.run([python_command_in_venv, "manage.py", "loaddata", "data/users.json"], check=True)
             subprocess.run([python_command_in_venv, "manage.py", "loaddata", "data/polls.json"], check=True)
             subprocess.run([python_command_in_venv, "manage.py", "loaddata", "data/vote.json"], check=True)
+            subprocess.run([python_command_in_venv, "manage.py", "recount_votes"], check=True)
 
             start_server = input("Do you want to start the Django server? (yes/no): ").strip().lower()
             if start_server == "yes":